@@ -0,0 +1,96 @@
+"""Cached users and roles for request authentication.
+
+Every page load calls ``check_auth``, and the write endpoints check the
+caller's role. Sessions are read from the cache (``settings.SESSION_ENGINE``),
+``CachedModelBackend`` serves the signed-in ``User`` from the cache, and
+``user_roles`` caches the artisan and admin flags, so an authenticated
+request that only needs to know who is calling and what they may do runs no
+query in the common case.
+
+Both entries are dropped whenever a ``User`` or ``UserProfile`` is saved or
+deleted (see ``MarketConfig.ready``). Writes that bypass signals, such as
+``QuerySet.update()``, show up after ``USER_CACHE_TIMEOUT`` seconds. The
+cached ``User`` carries the password hash that sessions are checked against,
+so the cache must be trusted as much as the database.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import aget_or_create_user_profile, get_or_create_user_profile
+
+USER_KEY = 'auth:user:{user_id}'
+ROLES_KEY = 'auth:user:{user_id}:roles'
+
+Roles = namedtuple('Roles', 'is_artisan is_admin')
+ANONYMOUS = Roles(is_artisan=False, is_admin=False)
+
+
+def _timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 600)
+
+
+def _roles_for(user, profile):
+    return Roles(is_artisan=profile.is_artisan, is_admin=user.is_staff or user.is_superuser)
+
+
+def user_roles(user):
+    """The artisan and admin flags of ``user``; ``ANONYMOUS`` when signed out."""
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = ROLES_KEY.format(user_id=user.id)
+    roles = cache.get(key)
+    if roles is None:
+        roles = _roles_for(user, get_or_create_user_profile(user))
+        cache.set(key, roles, _timeout())
+    return roles
+
+
+async def auser_roles(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    key = ROLES_KEY.format(user_id=user.id)
+    roles = await cache.aget(key)
+    if roles is None:
+        roles = _roles_for(user, await aget_or_create_user_profile(user))
+        await cache.aset(key, roles, _timeout())
+    return roles
+
+
+class CachedModelBackend(ModelBackend):
+    """``ModelBackend`` that loads the signed-in user from the cache."""
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            # None for unknown and inactive users, which are not cached.
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, _timeout())
+        return user
+
+
+def forget_user(user_id):
+    """Drop the cached user and roles of ``user_id``."""
+    cache.delete_many([USER_KEY.format(user_id=user_id), ROLES_KEY.format(user_id=user_id)])
+
+
+def _forget_after_write(sender, user_id):
+    forget_user(user_id)
+    # And again once the write commits: a request may have cached the old
+    # row in between.
+    transaction.on_commit(lambda: forget_user(user_id), using=router.db_for_write(sender))
+
+
+def user_changed(sender, instance, **kwargs):
+    """``post_save``/``post_delete`` receiver for ``User``."""
+    _forget_after_write(sender, instance.pk)
+
+
+def profile_changed(sender, instance, **kwargs):
+    """``post_save``/``post_delete`` receiver for ``UserProfile``."""
+    _forget_after_write(sender, instance.user_id)
@@ -1,7 +1,7 @@
 from django.contrib import admin
-from .models import Product, CartItem, Order
+from .models import Product, CartItem, Order, Job
 
 admin.site.register(Product)
 admin.site.register(CartItem)
 admin.site.register(Order)
-
+admin.site.register(Job)
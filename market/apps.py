@@ -1,7 +1,40 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def _ensure_search_index(using, **kwargs):
+    from django.db import connections
+    from .search import ensure_index
+
+    ensure_index(connections[using])
 
 
 class MarketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'market'
 
+    def ready(self):
+        # Schema changes can rebuild market_product and drop the FTS triggers.
+        post_migrate.connect(_ensure_search_index, sender=self)
+
+        from .middleware import install_query_timer
+        from .sqlite import configure_connection
+
+        connection_created.connect(configure_connection)
+        # PerformanceMiddleware counts queries in whichever thread runs them.
+        connection_created.connect(install_query_timer)
+
+        from django.contrib.auth.models import User
+
+        from .accounts import profile_changed, user_changed
+        from .catalog import product_changed
+        from .models import Product, UserProfile
+
+        # Cached users and roles (market.accounts) and catalog pages
+        # (market.catalog) follow every saved change, the admin's and
+        # cascading deletes included.
+        for signal in (post_save, post_delete):
+            signal.connect(user_changed, sender=User)
+            signal.connect(profile_changed, sender=UserProfile)
+            signal.connect(product_changed, sender=Product)
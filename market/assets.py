@@ -0,0 +1,186 @@
+"""Static assets of the single-page frontend, hashed and precompressed.
+
+``templates/index.html`` links ``market/css/market.css`` and
+``market/js/market.js`` from ``static/``. ``collectstatic`` stores them
+through ``ManifestStorage`` (``settings.STORAGES['staticfiles']``), which
+names every file after a hash of its content (``market.1a2b3c4d5e6f.css``)
+and writes ``.br`` and ``.gz`` siblings of the compressible ones, so no
+request compresses anything. ``static_asset`` serves ``STATIC_ROOT`` with
+the smallest variant the client accepts; a hashed name never changes, so it
+is cached for a year as immutable. Brotli variants need the ``brotli``
+package; without it only gzip ones are written.
+
+Unless ``BOOTSTRAP_EMBED`` is on, the index page has no per-request
+content. ``shell`` renders it once per process, compresses it and gives it
+an ETag, so a repeat visit revalidates with a ``304`` instead of
+downloading the page again. The ETag covers the hashed asset URLs, so a
+deploy that changes an asset changes it too.
+"""
+import gzip
+import hashlib
+import mimetypes
+from collections import namedtuple
+from functools import cached_property
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Unhashed names may change under the same URL.
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico')
+# Smaller files fit in a packet either way.
+MIN_COMPRESS_BYTES = 256
+
+Shell = namedtuple('Shell', 'variants etag')
+
+_shells = {}
+
+
+def _encoders():
+    """``(content coding, file suffix, compress)`` in order of preference."""
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11)
+    # mtime=0 so collecting the same file twice writes the same bytes.
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress(data):
+    """``{content coding: bytes}`` of ``data``, keeping only variants that save something."""
+    variants = {}
+    if len(data) >= MIN_COMPRESS_BYTES:
+        for coding, _, encode in _encoders():
+            compressed = encode(data)
+            if len(compressed) < len(data) * 0.95:
+                variants[coding] = compressed
+    return variants
+
+
+def accepted_codings(header):
+    """Content codings named in an ``Accept-Encoding`` header, without ``q=0`` ones."""
+    codings = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        q = params.strip().lower()
+        if q.startswith('q=') and not q[2:].strip('0.').strip():
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def choose(header, available):
+    """The preferred content coding in ``available`` accepted by ``header``, or ``None``."""
+    codings = accepted_codings(header)
+    for coding, _, _ in _encoders():
+        if coding in available and (coding in codings or '*' in codings):
+            return coding
+    return None
+
+
+class ManifestStorage(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` that also writes brotli and gzip variants."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # An unchanged file's hashed copy has the same bytes as the original.
+        compressed = {}
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE):
+                with self.open(name) as fh:
+                    data = fh.read()
+                digest = hashlib.sha256(data).digest()
+                if digest not in compressed:
+                    compressed[digest] = compress(data)
+                variants = compressed[digest]
+                for coding, suffix, _ in _encoders():
+                    if self.exists(name + suffix):
+                        self.delete(name + suffix)
+                    if coding in variants:
+                        self._save(name + suffix, ContentFile(variants[coding]))
+                        yield name, name + suffix, True
+
+    @cached_property
+    def hashed_names(self):
+        """Names that carry a content hash, as loaded from the manifest."""
+        return frozenset(self.hashed_files.values())
+
+
+Asset = namedtuple('Asset', 'path content_type coding cache_control')
+
+
+def find(name, accept_encoding):
+    """The file serving static ``name`` to a client sending ``accept_encoding``.
+
+    Returns an ``Asset``, or ``None`` when ``STATIC_ROOT`` has no such file.
+    """
+    try:
+        path = Path(safe_join(settings.STATIC_ROOT, name))
+    except SuspiciousFileOperation:
+        return None
+    if not path.is_file():
+        return None
+    content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+    hashed = name in getattr(staticfiles_storage, 'hashed_names', ())
+    cache_control = IMMUTABLE if hashed else REVALIDATE
+    coding = None
+    if name.endswith(COMPRESSIBLE):
+        available = {
+            coding: path.with_name(path.name + suffix)
+            for coding, suffix, _ in _encoders() if path.with_name(path.name + suffix).is_file()
+        }
+        coding = choose(accept_encoding, available)
+        if coding is not None:
+            path = available[coding]
+    return Asset(path, content_type, coding, cache_control)
+
+
+def shell(template_name, context=None):
+    """The page ``template_name`` rendered with ``context`` as a ``Shell``.
+
+    ``variants`` maps content codings (``None`` for none) to bodies. Rendered
+    once per process and context; under ``DEBUG`` on every call,
+    uncompressed, so template edits show at once. ``context`` values must be
+    hashable and the same for every request.
+    """
+    if settings.DEBUG:
+        body = render_to_string(template_name, context).encode()
+        return Shell({None: body}, _etag(body))
+    key = (template_name, frozenset((context or {}).items()))
+    page = _shells.get(key)
+    if page is None:
+        body = render_to_string(template_name, context).encode()
+        page = _shells[key] = Shell({None: body, **compress(body)}, _etag(body))
+    return page
+
+
+def compress_for(header, body):
+    """``(content coding, bytes)`` of a per-request ``body`` for ``Accept-Encoding: header``.
+
+    Uses fast settings, since this runs on every request.
+    """
+    if len(body) >= MIN_COMPRESS_BYTES:
+        codings = accepted_codings(header)
+        if brotli is not None and 'br' in codings:
+            return 'br', brotli.compress(body, quality=5)
+        if 'gzip' in codings:
+            return 'gzip', gzip.compress(body, compresslevel=6, mtime=0)
+    return None, body
+
+
+def _etag(body):
+    # Weak: the compressed variants differ in bytes but not in content.
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
@@ -0,0 +1,167 @@
+"""Async variants of the read endpoints, served in ASGI mode.
+
+``get_products``, ``get_cart``, ``get_orders``, ``bootstrap`` and
+``check_auth`` answer with the same JSON, status codes and ETags as their
+``market.views`` counterparts; ``catalog_events`` only streams here. DRF
+3.14 only dispatches synchronous views, so these are plain Django async
+views. Queries go through the async ORM and cache access through the ``a*``
+cache methods, so a request holds a thread only while a query actually runs
+and idle keep-alive connections hold none.
+
+``urls.py`` routes to them when ``settings.ASYNC_VIEWS`` is on, which
+``village_market/asgi.py`` does by default. Endpoints listed in
+``settings.FAST_JSON_ENDPOINTS`` answer through ``market.fastjson`` here too.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import auth
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
+
+from . import accounts, catalog, events, fastjson
+from .models import cart_line_total, open_cart_items, order_history
+from .views import (
+    _auth_data, _bootstrap_body, _bootstrap_cart, _cart_body, _cart_data, _decode_cursor, _is_admin,
+    _is_owner_view, _lean_cart_rows, _order_data, _order_history_items, _parse_page_size, _products_body,
+    _products_etag, _products_page,
+)
+
+# What DRF's JSONRenderer emits by default: compact and UTF-8, so a page has
+# the same bytes, and therefore the same ETag, from either variant.
+_JSON_DUMPS_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False, 'allow_nan': False}
+
+
+def _json(data, status=200, headers=None):
+    return JsonResponse(data, status=status, headers=headers, safe=False, json_dumps_params=_JSON_DUMPS_PARAMS)
+
+
+def api_view(http_method_names):
+    """Async stand-in for DRF's ``@api_view``: reject other methods with 405."""
+    allowed = {method.upper() for method in http_method_names}
+    if 'GET' in allowed:
+        allowed.add('HEAD')
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                return _json(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=405, headers={'Allow': ', '.join(sorted(allowed))},
+                )
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def _auser(request):
+    # Resolving the lazy request.user reads the session and the user row, and
+    # Django 4.2 has no request.auser(), so resolve it off the event loop.
+    request.user = await sync_to_async(auth.get_user)(request)
+    return request.user
+
+
+async def _aproducts_rows(user, listing, cursor, limit, version, overlay_version, lean=False):
+    if not user.is_authenticated:
+        return await catalog.apage_rows(catalog.PUBLIC, listing, cursor, limit, version, lean)
+    if _is_admin(user):
+        return await catalog.apage_rows(catalog.ADMIN, listing, cursor, limit, version, lean)
+    return catalog.merge_overlay(
+        await catalog.apage_rows(catalog.PUBLIC, listing, cursor, limit, version, lean),
+        await catalog.aowner_overlay(user.id, listing, overlay_version, lean),
+        listing,
+        cursor,
+        limit,
+    )
+
+
+@api_view(['GET'])
+async def get_products(request):
+    """Async ``market.views.get_products``."""
+    try:
+        limit = _parse_page_size(request.GET.get('limit'))
+        listing = catalog.Listing.from_params(request.GET)
+        cursor = _decode_cursor(request.GET.get('cursor'), listing)
+    except ValueError as e:
+        return _json({'success': False, 'error': str(e)}, status=400)
+
+    user = await _auser(request)
+    version = await catalog.acatalog_version()
+    overlay_version = await catalog.aowner_version(user.id) if _is_owner_view(user) else None
+    etag = _products_etag('json', user, listing, cursor, limit, version, overlay_version)
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    lean = fastjson.enabled('get_products')
+    rows = await _aproducts_rows(user, listing, cursor, limit, version, overlay_version, lean)
+    if lean:
+        return fastjson.response(request, _products_body, user, listing, rows, limit, headers={'ETag': etag})
+    return _json(_products_page(user, listing, rows, limit), headers={'ETag': etag})
+
+
+@api_view(['GET'])
+async def get_cart(request):
+    """Async ``market.views.get_cart``."""
+    user = await _auser(request)
+    if fastjson.enabled('get_cart'):
+        cart_items = open_cart_items(user, request.GET.get('session_id', 'default'))
+        rows = [row async for row in _lean_cart_rows(cart_items)]
+        return fastjson.response(request, _cart_body, rows)
+
+    cart_items = (
+        open_cart_items(user, request.GET.get('session_id', 'default'))
+        .select_related('product')
+        .annotate(line_total=cart_line_total())
+    )
+    return _json(_cart_data([item async for item in cart_items]))
+
+
+@api_view(['GET'])
+async def get_orders(request):
+    """Async ``market.views.get_orders``."""
+    user = await _auser(request)
+    orders = order_history(user, request.GET.get('session_id', 'default')).prefetch_related(_order_history_items())
+    return _json([_order_data(order) async for order in orders])
+
+
+@api_view(['GET'])
+async def bootstrap(request):
+    """Async ``market.views.bootstrap``."""
+    try:
+        limit = _parse_page_size(request.GET.get('limit'))
+        listing = catalog.Listing.from_params(request.GET)
+    except ValueError as e:
+        return _json({'success': False, 'error': str(e)}, status=400)
+
+    session_id = request.GET.get('session_id', 'default')
+    user = await _auser(request)
+    roles = await accounts.auser_roles(user)
+    version, overlay_version = await catalog.aversions(user.id if _is_owner_view(user) else None)
+    lean = fastjson.enabled('bootstrap')
+    rows = await _aproducts_rows(user, listing, None, limit, version, overlay_version, lean)
+    cart_rows = [row async for row in _bootstrap_cart(user, session_id, lean)]
+    body = fastjson.timed(request, _bootstrap_body, user, roles, listing, rows, limit, cart_rows, session_id, lean)
+    return HttpResponse(body, content_type='application/json')
+
+
+@api_view(['GET'])
+async def catalog_events(request):
+    """Stream catalog and moderation changes as Server-Sent Events (see ``market.events``)."""
+    user = await _auser(request)
+    roles = await accounts.auser_roles(user)
+    stream = events.stream(
+        user.id if user.is_authenticated else None, roles.is_admin, request.headers.get('Last-Event-ID'))
+    # X-Accel-Buffering stops nginx from holding events back.
+    return StreamingHttpResponse(
+        stream, content_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api_view(['GET'])
+async def check_auth(request):
+    """Async ``market.views.check_auth``."""
+    user = await _auser(request)
+    return _json(_auth_data(user, await accounts.auser_roles(user)))
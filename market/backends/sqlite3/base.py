@@ -0,0 +1,36 @@
+"""Django's SQLite backend with a configurable ``BEGIN``.
+
+Django 4.2 always starts transactions with a deferred ``BEGIN``. This backend
+reads three extra ``OPTIONS``:
+
+* ``transaction_mode``: ``DEFERRED``, ``IMMEDIATE`` or ``EXCLUSIVE``, as in
+  Django 5.1;
+* ``begin_retries``: how many times to retry a ``BEGIN`` that timed out
+  waiting for the lock (default 0);
+* ``begin_backoff``: seconds before the first retry, doubled each time
+  (default 0.05).
+"""
+from django.db.backends.sqlite3 import base
+
+from market import sqlite
+
+EXTRA_OPTIONS = ('transaction_mode', 'begin_retries', 'begin_backoff')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for key in EXTRA_OPTIONS:
+            kwargs.pop(key, None)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        options = self.settings_dict['OPTIONS']
+        mode = options.get('transaction_mode')
+        if mode is None:
+            return super()._start_transaction_under_autocommit()
+        sqlite.begin(
+            self, mode.upper(),
+            retries=options.get('begin_retries', 0),
+            backoff=options.get('begin_backoff', 0.05),
+        )
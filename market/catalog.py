@@ -0,0 +1,450 @@
+"""Versioned cache for the product catalog served by ``get_products``.
+
+The catalog has three visibility classes: anonymous shoppers see approved
+products, a signed-in non-admin also sees their own pending submissions, and
+admins see everything. Cached pages are stored under a catalog version number
+that every product write bumps, so a write never has to find and delete stale
+entries: ``product_changed`` does it for saved and deleted rows, wherever they
+come from, and writers that bypass model signals call
+``bump_catalog_version`` themselves. A non-admin's pending rows
+live in a small per-owner overlay with its own version and are merged into
+the shared approved page at request time.
+
+Functions prefixed with ``a`` are the async counterparts used by
+``market.async_views``; they share keys and rows with the sync ones.
+
+Pages are cached as dicts from ``serialize_product`` or, for the fast JSON
+path (``lean=True``), as ``LeanRow``s: ``values_list`` tuples encoded by
+``market.fastjson`` once, when the page is fetched, so a cache hit only
+joins strings.
+"""
+import hashlib
+import time
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import fastjson, images, routers
+from .models import Product
+
+CATALOG_VERSION_KEY = 'catalog:version'
+OWNER_VERSION_KEY = 'catalog:owner:{user_id}:version'
+# Present for REPLICA_PIN_SECONDS after any catalog write.
+RECENT_WRITE_KEY = 'catalog:recent-write'
+
+PUBLIC = 'public'
+OWNER = 'owner'
+ADMIN = 'admin'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted counter never restarts at a
+        # number whose pages may still be sitting in the cache.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def catalog_version():
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def owner_version(user_id):
+    return _get_version(OWNER_VERSION_KEY.format(user_id=user_id))
+
+
+async def acatalog_version():
+    return await _aget_version(CATALOG_VERSION_KEY)
+
+
+async def aowner_version(user_id):
+    return await _aget_version(OWNER_VERSION_KEY.format(user_id=user_id))
+
+
+def versions(owner_id=None):
+    """``(catalog_version(), owner_version(owner_id))`` in one cache round trip.
+
+    The owner version is ``None`` without ``owner_id``.
+    """
+    keys = [CATALOG_VERSION_KEY]
+    if owner_id is not None:
+        keys.append(OWNER_VERSION_KEY.format(user_id=owner_id))
+    found = cache.get_many(keys)
+    found = [found[key] if key in found else _get_version(key) for key in keys]
+    return found[0], (found[1] if owner_id is not None else None)
+
+
+async def aversions(owner_id=None):
+    keys = [CATALOG_VERSION_KEY]
+    if owner_id is not None:
+        keys.append(OWNER_VERSION_KEY.format(user_id=owner_id))
+    found = await cache.aget_many(keys)
+    found = [found[key] if key in found else await _aget_version(key) for key in keys]
+    return found[0], (found[1] if owner_id is not None else None)
+
+
+def bump_catalog_version(*owner_ids):
+    """Invalidate every cached catalog page.
+
+    Pass the ids of owners whose pending submissions changed as well so their
+    overlays are rebuilt on the next read; ``None`` entries are ignored.
+    """
+    _bump_version(CATALOG_VERSION_KEY)
+    for owner_id in set(owner_ids):
+        if owner_id is not None:
+            _bump_version(OWNER_VERSION_KEY.format(user_id=owner_id))
+    if routers.replicas():
+        cache.set(RECENT_WRITE_KEY, True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def product_changed(sender, instance, using, **kwargs):
+    """``post_save``/``post_delete`` receiver for ``Product``.
+
+    Bumps the versions once the write commits, so no read in between caches
+    the old rows under the new version. The owner's overlay is bumped too:
+    the row may have just left it on approval.
+    """
+    owner_id = instance.user_id
+    transaction.on_commit(lambda: bump_catalog_version(owner_id), using=using)
+
+
+def serialize_product(p):
+    """Serialize a product row without the per-viewer ``owned`` flag."""
+    return {
+        'id': p.id,
+        'name': p.name,
+        'price': float(p.price),
+        'img': p.img,
+        'thumbnail': images.url_for(p.thumbnail),
+        'owner': p.user.username if p.user_id else None,
+        'is_approved': p.is_approved,
+        'approved_at': p.approved_at.isoformat() if p.approved_at else None,
+        'approved_by': p.approved_by.username if p.approved_by else None,
+        'created_at': p.created_at.isoformat(),
+    }
+
+
+# values_list() columns of a lean row, encoded as the serialize_product key
+# of the same position.
+ROW_COLUMNS = (
+    'id', 'name', 'price', 'img', 'thumbnail_url', 'user__username', 'is_approved', 'approved_at',
+    'approved_by__username', 'created_at',
+)
+ROW_FIELDS = (
+    ('id', 'int'),
+    ('name', 'str'),
+    ('price', 'float'),
+    ('img', 'str'),
+    ('thumbnail', 'str?'),
+    ('owner', 'str?'),
+    ('is_approved', 'bool'),
+    ('approved_at', 'datetime?'),
+    ('approved_by', 'str?'),
+    ('created_at', 'datetime'),
+)
+_OWNER_COLUMN = ROW_COLUMNS.index('user__username')
+# The object is left open for the per-viewer "owned" member.
+_encode_row = fastjson.compile_encoder(ROW_FIELDS, close=False)
+
+# A cached row of the fast JSON path: the encoded object without its closing
+# brace, the owner's username, and the row's cursor value (as cursor_for
+# returns it) and id.
+LeanRow = namedtuple('LeanRow', 'json owner value id')
+
+# sort key -> (model field, descending). Each one is backed by an index on
+# (field, id) for the public and admin classes and on (user, field, id) for
+# the owner filter; see Product.Meta.indexes.
+SORTS = {
+    'name': ('name', False),
+    'price': ('price', False),
+    '-price': ('price', True),
+    'created_at': ('created_at', False),
+    '-created_at': ('created_at', True),
+}
+DEFAULT_SORT = 'name'
+
+# Range filters can only seek the index of the column they bound, so each
+# one is accepted only together with a sort on that column.
+_RANGE_FILTER_SORT_FIELD = {
+    'min_price': 'price',
+    'max_price': 'price',
+    'created_after': 'created_at',
+}
+
+
+class Listing:
+    """A validated sort order and set of filters for a catalog page."""
+
+    def __init__(self, sort=DEFAULT_SORT, min_price=None, max_price=None, owner=None, created_after=None):
+        self.sort = sort
+        self.field, self.descending = SORTS[sort]
+        self.min_price = min_price
+        self.max_price = max_price
+        self.owner = owner
+        self.created_after = created_after
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a listing from query parameters, raising ``ValueError``."""
+        sort = params.get('sort') or DEFAULT_SORT
+        if sort not in SORTS:
+            raise ValueError(f'Unsupported sort: {sort}. Use one of {", ".join(SORTS)}.')
+
+        filters = {}
+        for name in ('min_price', 'max_price'):
+            raw = params.get(name)
+            if raw not in (None, ''):
+                try:
+                    value = Decimal(raw)
+                except InvalidOperation:
+                    raise ValueError(f'{name} must be a number')
+                if not value.is_finite() or value < 0:
+                    raise ValueError(f'{name} must be zero or more')
+                filters[name] = value
+        if params.get('owner'):
+            filters['owner'] = params['owner']
+        raw = params.get('created_after')
+        if raw:
+            created_after = parse_datetime(raw)
+            if created_after is None:
+                day = parse_date(raw)
+                if day is None:
+                    raise ValueError('created_after must be an ISO 8601 date or datetime')
+                created_after = datetime.combine(day, datetime.min.time())
+            if timezone.is_naive(created_after):
+                created_after = timezone.make_aware(created_after)
+            filters['created_after'] = created_after
+
+        field = SORTS[sort][0]
+        for name in filters:
+            needed = _RANGE_FILTER_SORT_FIELD.get(name)
+            if needed and needed != field:
+                raise ValueError(f'{name} can only be combined with sort={needed} or sort=-{needed}')
+        return cls(sort, **filters)
+
+    def key(self):
+        """Stable text identifying this listing, for cache keys and ETags."""
+        return repr((self.sort, self.min_price, self.max_price, self.owner,
+                     self.created_after.isoformat() if self.created_after else None))
+
+    def filter(self, queryset):
+        if self.min_price is not None:
+            queryset = queryset.filter(price__gte=self.min_price)
+        if self.max_price is not None:
+            queryset = queryset.filter(price__lte=self.max_price)
+        if self.owner is not None:
+            queryset = queryset.filter(user__username=self.owner)
+        if self.created_after is not None:
+            queryset = queryset.filter(created_at__gt=self.created_after)
+        return queryset
+
+    def after(self, queryset, cursor):
+        """Keep rows that come after ``cursor`` (a ``(value, id)`` pair)."""
+        if cursor is None:
+            return queryset
+        value, last_id = cursor
+        field = self.field
+        # Spelled with a leading inclusive bound so SQLite can seek the index
+        # instead of evaluating the OR against every row before the cursor.
+        if self.descending:
+            return queryset.filter(
+                Q(**{f'{field}__lte': value}), Q(**{f'{field}__lt': value}) | Q(id__lt=last_id))
+        return queryset.filter(
+            Q(**{f'{field}__gte': value}), Q(**{f'{field}__gt': value}) | Q(id__gt=last_id))
+
+    def order_by(self):
+        if self.descending:
+            return (f'-{self.field}', '-id')
+        return (self.field, 'id')
+
+    def row_key(self, row):
+        """Sort key of a serialized or lean row, comparable with a parsed cursor."""
+        # Through the cursor, so a serialized row's float price becomes the
+        # Decimal a parsed cursor holds; float(x) and Decimal(x) do not compare equal.
+        return self.parse_cursor(*self.cursor_for(row))
+
+    def cursor_for(self, row):
+        """JSON-safe ``(value, id)`` cursor pointing at a serialized or lean row."""
+        if isinstance(row, LeanRow):
+            return row.value, row.id
+        value = row[self.field]
+        if self.field == 'price':
+            value = str(value)
+        return value, row['id']
+
+    def lean_row(self, values):
+        """Encode a ``ROW_COLUMNS`` tuple as a ``LeanRow``."""
+        value = values[ROW_COLUMNS.index(self.field)]
+        # The text serialize_product's value gives, so cursors are the same.
+        if self.field == 'price':
+            value = str(float(value))
+        elif self.field == 'created_at':
+            value = value.isoformat()
+        return LeanRow(_encode_row(values), values[_OWNER_COLUMN], value, values[0])
+
+    def parse_cursor(self, value, pk):
+        """Turn a decoded ``(value, id)`` cursor back into comparable values."""
+        try:
+            if self.field == 'price':
+                value = Decimal(value)
+                if not value.is_finite():
+                    raise ValueError
+            elif self.field == 'created_at':
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError
+            elif not isinstance(value, str):
+                raise ValueError
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError('Invalid cursor')
+        return value, pk
+
+
+def visible_products(visibility):
+    """Products shown to a shared visibility class, before paging."""
+    queryset = Product.objects.all()
+    if visibility == PUBLIC:
+        queryset = queryset.filter(is_approved=True)
+    return queryset
+
+
+def pending_products(user_id):
+    """Pending submissions owned by ``user_id`` (the per-owner overlay)."""
+    return Product.objects.filter(user_id=user_id, is_approved=False)
+
+
+def page_queryset(queryset, listing, cursor=None, limit=None):
+    """Filter and order ``queryset`` for ``listing``; slice ``limit + 1`` rows after ``cursor``."""
+    queryset = listing.after(listing.filter(queryset.select_related('user', 'approved_by')), cursor)
+    queryset = queryset.order_by(*listing.order_by())
+    if limit is not None:
+        queryset = queryset[:limit + 1]
+    return queryset
+
+
+def lean_page_queryset(queryset, listing, cursor=None, limit=None):
+    """``page_queryset`` reading only ``ROW_COLUMNS``, as tuples."""
+    queryset = listing.after(listing.filter(queryset), cursor).order_by(*listing.order_by())
+    queryset = queryset.annotate(thumbnail_url=images.url_expression()).values_list(*ROW_COLUMNS)
+    if limit is not None:
+        queryset = queryset[:limit + 1]
+    return queryset
+
+
+def _fetch_rows(queryset, listing, cursor=None, limit=None, lean=False):
+    # Rows are cached under the current version until the next write, so they
+    # must not come from a replica that may not have seen the last one yet.
+    recent_write = routers.reading_from_replica() and cache.get(RECENT_WRITE_KEY, False)
+    with routers.use_primary(recent_write):
+        if lean:
+            return [listing.lean_row(values) for values in lean_page_queryset(queryset, listing, cursor, limit)]
+        return [serialize_product(p) for p in page_queryset(queryset, listing, cursor, limit)]
+
+
+async def _afetch_rows(queryset, listing, cursor=None, limit=None, lean=False):
+    recent_write = routers.reading_from_replica() and await cache.aget(RECENT_WRITE_KEY, False)
+    with routers.use_primary(recent_write):
+        if lean:
+            queryset = lean_page_queryset(queryset, listing, cursor, limit)
+            return [listing.lean_row(values) async for values in queryset]
+        return [serialize_product(p) async for p in page_queryset(queryset, listing, cursor, limit)]
+
+
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _page_key(visibility, listing, cursor, limit, version, lean):
+    return f'catalog:{version}:{visibility}:{_digest(listing.key(), cursor)}:{limit}' + (':lean' if lean else '')
+
+
+def _overlay_key(user_id, listing, version, lean):
+    return f'catalog:owner:{user_id}:{version}:pending:{_digest(listing.key())}' + (':lean' if lean else '')
+
+
+def page_rows(visibility, listing, cursor, limit, version, lean=False):
+    """Return up to ``limit + 1`` rows after ``cursor`` for a shared class.
+
+    ``visibility`` is ``PUBLIC`` (approved only) or ``ADMIN`` (everything).
+    The extra row tells the caller whether another page exists. ``lean``
+    returns ``ROW_COLUMNS`` tuples instead of serialized dicts.
+    """
+    key = _page_key(visibility, listing, cursor, limit, version, lean)
+    rows = cache.get(key)
+    if rows is None:
+        rows = _fetch_rows(visible_products(visibility), listing, cursor, limit, lean)
+        cache.set(key, rows, _timeout())
+    return rows
+
+
+async def apage_rows(visibility, listing, cursor, limit, version, lean=False):
+    key = _page_key(visibility, listing, cursor, limit, version, lean)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = await _afetch_rows(visible_products(visibility), listing, cursor, limit, lean)
+        await cache.aset(key, rows, _timeout())
+    return rows
+
+
+def owner_overlay(user_id, listing, version, lean=False):
+    """Return the pending products of ``user_id`` that match ``listing``, in order."""
+    key = _overlay_key(user_id, listing, version, lean)
+    rows = cache.get(key)
+    if rows is None:
+        rows = _fetch_rows(pending_products(user_id), listing, lean=lean)
+        cache.set(key, rows, _timeout())
+    return rows
+
+
+async def aowner_overlay(user_id, listing, version, lean=False):
+    key = _overlay_key(user_id, listing, version, lean)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = await _afetch_rows(pending_products(user_id), listing, lean=lean)
+        await cache.aset(key, rows, _timeout())
+    return rows
+
+
+def merge_overlay(rows, overlay, listing, cursor, limit):
+    """Merge an owner's pending rows into a public page in listing order."""
+    if cursor is not None:
+        if listing.descending:
+            overlay = [r for r in overlay if listing.row_key(r) < cursor]
+        else:
+            overlay = [r for r in overlay if listing.row_key(r) > cursor]
+    merged = sorted(rows + overlay, key=listing.row_key, reverse=listing.descending)
+    return merged[:limit + 1]
+
+
+def etag_for(*parts):
+    """Build a strong ETag from the inputs that fully determine a response."""
+    digest = hashlib.sha1(':'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest}"'
@@ -0,0 +1,345 @@
+"""Server-Sent Events for catalog and moderation changes.
+
+``add_product``, ``approve_product``, ``delete_product`` and the bulk
+moderation endpoints publish an event per product once their transaction
+commits:
+
+* ``product.added`` and ``product.approved`` carry the product as
+  ``get_products`` serializes it, without the per-viewer ``owned`` flag;
+* ``product.deleted`` carries its ``id``.
+
+Pending products go only to admins and their owner, as in the catalog
+itself. ``catalog_events`` streams them from the ASGI application; a
+connection holds a queue, not a thread. A client reconnecting with
+``Last-Event-ID`` is sent what it missed from a short backlog, or a
+``reset`` event when that is gone, after which it reloads the catalog once.
+
+Events go through ``settings.EVENT_BROADCASTER``. ``LocalBroadcaster``
+reaches the streams of its own process. With several workers,
+``CacheBroadcaster`` passes events through the shared cache (see
+``CACHES``), which every worker with open streams polls.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.module_loading import import_string
+
+from . import catalog
+from .models import Product
+
+logger = logging.getLogger('market.events')
+
+# Events kept for clients that reconnect.
+BACKLOG = 256
+# Events queued for one slow client before it is sent a reset instead.
+QUEUE_SIZE = 256
+# A comment line this often keeps proxies from closing idle streams.
+HEARTBEAT_SECONDS = 15
+# How long browsers wait before reconnecting.
+RETRY_MS = 3000
+
+Event = namedtuple('Event', 'id frame public owner_id')
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def _frame(event_id, name, data):
+    payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return f'id: {event_id}\nevent: {name}\ndata: {payload}\n\n'.encode()
+
+
+def _reset_frame(last_id):
+    return f'id: {last_id}\nevent: reset\ndata: {{}}\n\n'.encode()
+
+
+class Subscription:
+    """The queue of one stream, filtered to what its user may see."""
+
+    def __init__(self, user_id, is_admin):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def wants(self, event):
+        return event.public or self.is_admin or (self.user_id is not None and event.owner_id == self.user_id)
+
+    def offer(self, event):
+        """Queue ``event``; safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            # Too far behind to catch up event by event: have it reload.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = None
+        self.queue.put_nowait(event)
+
+
+class LocalBroadcaster:
+    """Delivers events to the streams of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._backlog = deque(maxlen=BACKLOG)
+        # Seeded from the clock so ids never repeat across restarts.
+        self.last_id = time.time_ns()
+
+    def publish(self, events):
+        """Send ``(name, data, public, owner_id)`` tuples to subscribers."""
+        for name, data, public, owner_id in events:
+            with self._lock:
+                self.last_id += 1
+                event_id = self.last_id
+            self._deliver(Event(event_id, _frame(event_id, name, data), public, owner_id))
+
+    def _deliver(self, event):
+        with self._lock:
+            self.last_id = max(self.last_id, event.id)
+            self._backlog.append(event)
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.offer(event)
+
+    def subscribe(self, subscription, last_event_id=None):
+        """Start delivering to ``subscription``.
+
+        Returns ``(missed, last_id)``: the backlog after ``last_event_id``,
+        or ``None`` when it no longer reaches back that far, and the id of
+        the latest event.
+        """
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is None or last_event_id == self.last_id:
+                return [], self.last_id
+            ids = [event.id for event in self._backlog]
+            if last_event_id not in ids:
+                return None, self.last_id
+            return list(self._backlog)[ids.index(last_event_id) + 1:], self.last_id
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+
+class CacheBroadcaster(LocalBroadcaster):
+    """Passes events between worker processes through the shared cache.
+
+    ``publish`` stores each event under a number from ``cache.incr``. A
+    thread in every process with open streams polls for new numbers every
+    ``EVENTS_POLL_INTERVAL`` seconds and delivers them locally, so events
+    keep one id across workers. Needs a cache the workers share; with the
+    local memory cache it only reaches the publishing process.
+    """
+
+    SEQUENCE_KEY = 'events:sequence'
+    EVENT_KEY = 'events:{id}'
+    # Seconds an event waits in the cache for the pollers.
+    EVENT_TIMEOUT = 60
+
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+
+    def publish(self, events):
+        for name, data, public, owner_id in events:
+            try:
+                event_id = cache.incr(self.SEQUENCE_KEY)
+            except ValueError:
+                self._sequence()
+                event_id = cache.incr(self.SEQUENCE_KEY)
+            cache.set(self.EVENT_KEY.format(id=event_id), (name, data, public, owner_id), self.EVENT_TIMEOUT)
+
+    def _sequence(self):
+        latest = cache.get(self.SEQUENCE_KEY)
+        if latest is None:
+            # Seeded from the clock, like catalog versions, so an evicted
+            # counter never restarts at a number already used.
+            cache.add(self.SEQUENCE_KEY, time.time_ns(), timeout=None)
+            latest = cache.get(self.SEQUENCE_KEY)
+        return latest
+
+    def subscribe(self, subscription, last_event_id=None):
+        with self._lock:
+            if self._poller is None:
+                self.last_id = self._sequence()
+                self._poller = threading.Thread(target=self._poll, name='event-poller', daemon=True)
+                self._poller.start()
+        return super().subscribe(subscription, last_event_id)
+
+    def _skip_to(self, event_id):
+        """Give up on the events before ``event_id``; streams are told to reload."""
+        with self._lock:
+            self.last_id = event_id
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(None)
+
+    def _poll(self):
+        interval = getattr(settings, 'EVENTS_POLL_INTERVAL', 0.5)
+        # Numbers taken but not yet stored, and when they were first seen.
+        waiting = {}
+        while True:
+            time.sleep(interval)
+            try:
+                latest = self._sequence()
+                if latest <= self.last_id:
+                    continue
+                if latest - self.last_id > BACKLOG:
+                    # A reseeded counter, or more events than a reconnect could replay.
+                    logger.warning('Skipping %d events', latest - BACKLOG - self.last_id)
+                    self._skip_to(latest - BACKLOG)
+                keys = {self.EVENT_KEY.format(id=n): n for n in range(self.last_id + 1, latest + 1)}
+                found = cache.get_many(list(keys))
+                for key, event_id in keys.items():
+                    if key in found:
+                        name, data, public, owner_id = found[key]
+                        self._deliver(Event(event_id, _frame(event_id, name, data), public, owner_id))
+                    elif time.monotonic() - waiting.setdefault(event_id, time.monotonic()) < self.EVENT_TIMEOUT:
+                        # Its publisher has not stored it yet; try again.
+                        break
+                    else:
+                        logger.warning('Event %s never arrived', event_id)
+                        self._skip_to(event_id)
+                    waiting.pop(event_id, None)
+            except Exception:
+                logger.exception('Polling for events failed')
+
+
+def broadcaster():
+    """The ``settings.EVENT_BROADCASTER`` of this process."""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                _broadcaster = import_string(settings.EVENT_BROADCASTER)()
+    return _broadcaster
+
+
+def _publish_on_commit(events):
+    if events:
+        transaction.on_commit(lambda: broadcaster().publish(events), using=router.db_for_write(Product))
+
+
+def products_saved(name, products):
+    """Publish ``name`` for ``products``, with ``user`` and ``approved_by`` loaded."""
+    _publish_on_commit([
+        (name, catalog.serialize_product(product), product.is_approved, product.user_id)
+        for product in products
+    ])
+
+
+def products_deleted(found):
+    """Publish ``product.deleted`` for ``{id: (is_approved, owner_id)}``."""
+    _publish_on_commit([
+        ('product.deleted', {'id': pk}, is_approved, owner_id) for pk, (is_approved, owner_id) in found.items()
+    ])
+
+
+def _parse_id(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+async def stream(user_id, is_admin, last_event_id=None):
+    """The ``text/event-stream`` body of one client, ending after ``EVENTS_STREAM_SECONDS``.
+
+    ``user_id`` is ``None`` for guests, who only see approved products.
+    """
+    subscription = Subscription(user_id, is_admin)
+    source = broadcaster()
+    missed, last_id = source.subscribe(subscription, _parse_id(last_event_id))
+    try:
+        # The id lets a client that has seen no event yet resume from here.
+        yield f'id: {last_id}\nretry: {RETRY_MS}\n\n'.encode()
+        if missed is None:
+            yield _reset_frame(last_id)
+        else:
+            for event in missed:
+                if subscription.wants(event):
+                    yield event.frame
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + getattr(settings, 'EVENTS_STREAM_SECONDS', 300)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield b': ping\n\n'
+                continue
+            yield event.frame if event is not None else _reset_frame(source.last_id)
+    finally:
+        source.unsubscribe(subscription)
+
+
+class CancelOnDisconnect:
+    """ASGI middleware that ends a streaming request once its client is gone.
+
+    Django 4.2 does not listen for ``http.disconnect`` while it streams a
+    response, and uvicorn drops writes to a closed connection silently, so
+    without this an event stream would outlive its client until
+    ``EVENTS_STREAM_SECONDS`` ran out.
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        request = await receive()
+        if request['type'] == 'http.disconnect':
+            return
+        if request.get('more_body'):
+            # Event streams are GETs without a body; pass anything else on.
+            return await self.app(scope, _prepend(request, receive), send)
+
+        gone = asyncio.Event()
+
+        async def replay():
+            nonlocal request
+            if request is not None:
+                message, request = request, None
+                return message
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        handler = asyncio.ensure_future(self.app(scope, replay, send))
+
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            gone.set()
+            handler.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not gone.is_set():
+                raise
+        finally:
+            watcher.cancel()
+
+
+def _prepend(message, receive):
+    pending = [message]
+
+    async def prepended():
+        return pending.pop() if pending else await receive()
+    return prepended
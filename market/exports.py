@@ -0,0 +1,174 @@
+"""Streaming NDJSON and CSV exports of the catalog and of order lines.
+
+Rows are read from ``values()`` querysets with ``iterator(chunk_size=...)``
+(``aiterator`` in ASGI mode), encoded one at a time and flushed in blocks of
+about ``BLOCK_SIZE`` characters, so memory stays flat however many rows an
+export has. Prices and totals are written as exact decimal strings with two
+places. CSV cells holding user-supplied text that a spreadsheet would read as
+a formula are prefixed with ``'``.
+"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models.functions import Coalesce
+
+from .models import CartItem, Product, cart_line_total
+
+# Rows fetched from the database per round trip.
+CHUNK_SIZE = 2000
+# Characters of encoded rows collected before a block is sent.
+BLOCK_SIZE = 64 * 1024
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# (column, values() key) in output order.
+PRODUCT_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('price', 'price'),
+    ('img', 'img'),
+    ('owner', 'user__username'),
+    ('is_approved', 'is_approved'),
+    ('approved_at', 'approved_at'),
+    ('approved_by', 'approved_by__username'),
+    ('created_at', 'created_at'),
+)
+
+ORDER_LINE_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('ordered_at', 'order__created_at'),
+    ('customer', 'order__user__username'),
+    ('line_id', 'id'),
+    ('product_id', 'product_id'),
+    ('artisan', 'product__user__username'),
+    ('name', 'line_name'),
+    ('price', 'line_price'),
+    ('quantity', 'quantity'),
+    ('line_total', 'line_total'),
+)
+
+
+def _values(queryset, columns):
+    return queryset.values(*(key for _, key in columns))
+
+
+def products(owner_id=None):
+    """Every product, or those of ``owner_id``, in id order."""
+    queryset = Product.objects.all()
+    if owner_id is not None:
+        queryset = queryset.filter(user_id=owner_id)
+    return _values(queryset.order_by('id'), PRODUCT_COLUMNS)
+
+
+def order_lines(artisan_id=None):
+    """Every ordered line, or the lines of ``artisan_id``'s products.
+
+    All lines are walked in order id order; an artisan's are grouped by
+    product, in catalog order, which their owner index returns presorted.
+    """
+    queryset = CartItem.objects.filter(order__isnull=False).annotate(
+        # Snapshots taken at add-to-cart time, as in get_orders.
+        line_name=Coalesce('product_name', 'product__name'),
+        line_price=Coalesce('product_price', 'product__price'),
+        line_total=cart_line_total(),
+    )
+    if artisan_id is None:
+        queryset = queryset.order_by('order_id', 'id')
+    else:
+        # 'product' sorts by Product.Meta.ordering, (name, id).
+        queryset = queryset.filter(product__user_id=artisan_id).order_by('product', 'id')
+    return _values(queryset, ORDER_LINE_COLUMNS)
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # SQLite returns computed decimals (coalesced prices, line totals)
+        # unquantized; every exported decimal is an amount of money.
+        return f'{value:.2f}'
+    return value
+
+
+# Leading characters that make a spreadsheet evaluate a cell.
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    # Only text from the database: formatted numbers and dates are safe.
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return _text(value)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, Decimal)):
+        return _text(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class _NDJSONEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self.encode = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_json_default).encode
+
+    def header(self):
+        return ''
+
+    def row(self, row):
+        return self.encode({name: row[key] for name, key in self.columns}) + '\n'
+
+
+class _CSVEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self.line = ''
+        self.writer = csv.writer(self)
+
+    def write(self, line):
+        # csv.writer output target; keeps the last formatted line.
+        self.line = line
+
+    def header(self):
+        self.writer.writerow([name for name, _ in self.columns])
+        return self.line
+
+    def row(self, row):
+        self.writer.writerow([_csv_cell(row[key]) for _, key in self.columns])
+        return self.line
+
+
+_ENCODERS = {'ndjson': _NDJSONEncoder, 'csv': _CSVEncoder}
+
+
+def stream(queryset, columns, fmt):
+    """Yield ``queryset`` encoded as ``fmt``, in blocks of text."""
+    encoder = _ENCODERS[fmt](columns)
+    block, size = [encoder.header()], 0
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        line = encoder.row(row)
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block)
+            block, size = [], 0
+    yield ''.join(block)
+
+
+async def astream(queryset, columns, fmt):
+    """``stream`` for ASGI, which consumes streaming responses asynchronously."""
+    encoder = _ENCODERS[fmt](columns)
+    block, size = [encoder.header()], 0
+    async for row in queryset.aiterator(chunk_size=CHUNK_SIZE):
+        line = encoder.row(row)
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block)
+            block, size = [], 0
+    yield ''.join(block)
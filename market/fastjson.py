@@ -0,0 +1,105 @@
+"""Fast-path JSON for the hot read endpoints.
+
+The regular path builds model instances, turns each one into a dict of
+Python values and hands the lot to DRF's ``JSONRenderer``, which walks the
+dicts again through ``json.JSONEncoder``. Here rows are read as tuples with
+``values_list()`` and each one is encoded by a function compiled once per
+column layout, so a row costs one string build and no intermediate dict.
+The body is assembled as ``str``, encoded once and handed to the response
+as bytes.
+
+The output is byte for byte what ``JSONRenderer`` emits with DRF's default
+settings (compact, UTF-8, ``\\u2028``/``\\u2029`` escaped), so clients and
+ETags cannot tell the two paths apart. ``settings.FAST_JSON_ENDPOINTS``
+names the endpoints that take it.
+
+DRF renders a response after the view returns, where
+``PerformanceMiddleware`` times it; a fast-path body is built in the view,
+so ``timed`` records that time for the middleware's ``render`` figure.
+"""
+import time
+from json.encoder import encode_basestring
+
+from django.conf import settings
+from django.http import HttpResponse
+
+# Column kind -> expression encoding the value ``{v}``, as JSONRenderer would
+# encode the value the regular serializer produces for it. Decimals go out as
+# floats, datetimes as their isoformat(). A trailing ``?`` allows NULL;
+# ``float0`` is a decimal that the regular path reports as 0.0 when NULL.
+KINDS = {
+    'int': '_str({v})',
+    'int?': "('null' if {v} is None else _str({v}))",
+    'str': '_string({v})',
+    'str?': "('null' if {v} is None else _string({v}))",
+    'float': '_repr(_float({v}))',
+    'float0': "('0.0' if {v} is None else _repr(_float({v})))",
+    'bool': "('true' if {v} else 'false')",
+    'datetime': '_string({v}.isoformat())',
+    'datetime?': "('null' if {v} is None else _string({v}.isoformat()))",
+}
+
+_NAMESPACE = {'_str': int.__repr__, '_string': encode_basestring, '_repr': float.__repr__, '_float': float}
+
+
+def enabled(endpoint):
+    """Whether ``endpoint`` (a url name) serves its fast-path JSON."""
+    return endpoint in settings.FAST_JSON_ENDPOINTS
+
+
+def string(value):
+    """``value`` as a JSON string, or ``null``."""
+    return 'null' if value is None else encode_basestring(value)
+
+
+def compile_encoder(fields, close=True):
+    """Compile a function encoding a row tuple as a JSON object.
+
+    ``fields`` is a sequence of ``(key, kind)`` pairs in row order, with kinds
+    from ``KINDS``. The function returns ``str``; with ``close=False`` the
+    object is left open so the caller can append members and the ``}``.
+    """
+    names = [f'_{n}' for n in range(len(fields))]
+    parts = []
+    for n, (key, kind) in enumerate(fields):
+        literal = ('{' if n == 0 else ',') + encode_basestring(key) + ':'
+        parts.append(literal.replace('\\', '\\\\').replace('{', '{{').replace('}', '}}'))
+        parts.append('{' + KINDS[kind].format(v=names[n]) + '}')
+    if close:
+        parts.append('}}')
+    # A one-column row still needs the trailing comma to unpack.
+    source = (
+        f'def encode(row):\n'
+        f'    {", ".join(names)}, = row\n'
+        f"    return f'''{''.join(parts)}'''\n"
+    )
+    namespace = dict(_NAMESPACE)
+    exec(source, namespace)
+    encode = namespace['encode']
+    encode.source = source
+    return encode
+
+
+def render(parts):
+    """Join encoded ``parts`` into the UTF-8 body JSONRenderer would produce."""
+    body = ''.join(parts)
+    # JSONRenderer always escapes these so the output is valid JavaScript.
+    if '\u2028' in body or '\u2029' in body:
+        body = body.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return body.encode()
+
+
+def timed(request, build, *args):
+    """``build(*args)``, with the time it took recorded as ``request``'s render time."""
+    started = time.perf_counter()
+    try:
+        return build(*args)
+    finally:
+        # The middleware sees the HttpRequest that a DRF Request wraps.
+        getattr(request, '_request', request)._render_duration = time.perf_counter() - started
+
+
+def response(request, body, *args, status=200, headers=None):
+    """An ``application/json`` response carrying ``render(body(*args))``, timed."""
+    content = timed(request, lambda: render(body(*args)))
+    return HttpResponse(content, status=status, headers=headers, content_type='application/json')
@@ -0,0 +1,326 @@
+"""Product image thumbnails, served locally instead of the remote originals.
+
+``Product.img`` is whatever URL the artisan typed, often a full-size shop
+image. When a product is added or approved its image is fetched once, cut
+to a ``THUMBNAIL_SIZE`` WebP and stored in ``settings.IMAGE_CACHE_DIR`` under
+a key derived from the source bytes, which is saved as
+``Product.thumbnail``. Catalog rows carry the thumbnail URL and
+``product_image`` serves the file with immutable cache headers.
+
+The cache is bounded by ``settings.IMAGE_CACHE_MAX_BYTES``: the least
+recently served files are evicted first. A product whose thumbnail was
+evicted is redirected to its original while the thumbnail is rebuilt.
+
+Fetching is a background job (``market.jobs``) queued with the writing
+transaction, so a restart does not lose it. ``settings.IMAGE_FETCHER``
+is the dotted path of a callable taking a URL and returning its bytes or
+raising ``ImageError``; point it at a fixture in tests, or set it to ``None``
+to turn the pipeline off.
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import re
+import socket
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Concat
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from . import catalog, jobs
+from .models import Product
+
+logger = logging.getLogger('market.images')
+
+# Card images are shown 200px high at up to ~300px wide; 480x320 covers
+# that at 1.5x. Changing the size or encoding needs a new SPEC so old keys
+# are not reused.
+THUMBNAIL_SIZE = (480, 320)
+THUMBNAIL_QUALITY = 80
+SPEC = b'webp:480x320:q80'
+CONTENT_TYPE = 'image/webp'
+
+FETCH_TIMEOUT = 10
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+MAX_SOURCE_PIXELS = 50_000_000
+
+KEY_RE = re.compile(r'[0-9a-f]{64}')
+# Files served less than this long ago are not touched again.
+_TOUCH_INTERVAL = 3600
+PRUNE_LOCK_KEY = 'images:prune'
+PRUNE_INTERVAL = 60
+
+
+class ImageError(Exception):
+    """An image could not be fetched or decoded."""
+
+
+def _check_address(host, address):
+    if not ipaddress.ip_address(address.split('%')[0]).is_global:
+        raise ImageError(f'{host} resolves to a non-public address')
+
+
+def _connect_public(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """``socket.create_connection`` that only connects to public addresses.
+
+    The name is resolved once and the socket connects to an address that
+    was checked, so DNS cannot answer the check and the connection
+    differently.
+    """
+    host, port = address
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError) as e:
+        raise ImageError(f'Cannot resolve {host}: {e}')
+    if not getattr(settings, 'IMAGE_FETCH_ALLOW_PRIVATE', False):
+        for info in infos:
+            _check_address(host, info[4][0])
+    error = None
+    for family, type_, proto, _, sockaddr in infos:
+        sock = socket.socket(family, type_, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            error = e
+            sock.close()
+    raise error
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    # The certificate and SNI still go by the host name.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _connect_public
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: a proxy would resolve the name itself, past the address check.
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _CheckedRedirects,
+)
+
+
+def _check_url(url):
+    """Refuse anything but http(s) URLs; the URLs come from users.
+
+    Their hosts are checked for public addresses when connecting.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ImageError(f'Not an http(s) URL: {url}')
+
+
+def fetch_url(url):
+    """The default fetcher: GET ``url`` over http(s), up to ``MAX_SOURCE_BYTES``."""
+    _check_url(url)
+    request = urllib.request.Request(url, headers={'User-Agent': 'village-market-thumbnailer'})
+    try:
+        with _opener.open(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_SOURCE_BYTES + 1)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise ImageError(f'Cannot fetch {url}: {e}')
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ImageError(f'{url} is larger than {MAX_SOURCE_BYTES} bytes')
+    return data
+
+
+def fetcher():
+    path = getattr(settings, 'IMAGE_FETCHER', None)
+    return import_string(path) if path else None
+
+
+def make_thumbnail(source):
+    """Cover-crop image bytes to ``THUMBNAIL_SIZE`` and encode them as WebP."""
+    try:
+        with Image.open(io.BytesIO(source)) as image:
+            if image.width * image.height > MAX_SOURCE_PIXELS:
+                raise ImageError(f'{image.width}x{image.height} is too many pixels')
+            # JPEGs decode straight at a fraction of their size.
+            image.draft('RGB', (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+            thumbnail = ImageOps.fit(image, THUMBNAIL_SIZE, Image.LANCZOS)
+            out = io.BytesIO()
+            thumbnail.save(out, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f'Cannot decode image: {e}')
+    return out.getvalue()
+
+
+def _cache_dir():
+    return Path(settings.IMAGE_CACHE_DIR)
+
+
+def path_for(key):
+    return _cache_dir() / key[:2] / f'{key}.webp'
+
+
+def store(source):
+    """Thumbnail ``source`` bytes into the cache unless already there; returns the key."""
+    key = hashlib.sha256(SPEC + b'\0' + source).hexdigest()
+    path = path_for(key)
+    if not path.exists():
+        data = make_thumbnail(source)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so readers never see half a file.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if cache.add(PRUNE_LOCK_KEY, True, PRUNE_INTERVAL):
+            prune()
+    return key
+
+
+def read(key):
+    """Bytes of a cached thumbnail, or ``None`` if it is not (or no longer) cached."""
+    path = path_for(key)
+    try:
+        data = path.read_bytes()
+        # Eviction goes by modification time, so mark the file as used.
+        if path.stat().st_mtime < time.time() - _TOUCH_INTERVAL:
+            os.utime(path)
+    except FileNotFoundError:
+        return None
+    return data
+
+
+def prune(max_bytes=None):
+    """Evict the least recently served thumbnails until the cache is within budget.
+
+    Eviction stops at 90% of ``max_bytes`` (``IMAGE_CACHE_MAX_BYTES``) so the
+    next few stores do not prune again. Returns the number of files removed.
+    """
+    if max_bytes is None:
+        max_bytes = settings.IMAGE_CACHE_MAX_BYTES
+    files, total = [], 0
+    for entry in _scan(_cache_dir()):
+        stat = entry.stat()
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def _scan(root):
+    try:
+        shards = [entry for entry in os.scandir(root) if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    for shard in shards:
+        yield from (entry for entry in os.scandir(shard.path) if entry.name.endswith('.webp'))
+
+
+def url_for(key):
+    """URL of a thumbnail key, or ``None`` for a product without one."""
+    return reverse('product_image', args=[key]) if key else None
+
+
+def url_expression():
+    """Database expression for ``url_for(thumbnail)``, for ``values()`` rows."""
+    prefix, suffix = reverse('product_image', args=['0' * 64]).split('0' * 64)
+    return Case(
+        When(thumbnail='', then=Value(None)),
+        default=Concat(Value(prefix), 'thumbnail', Value(suffix)),
+        output_field=CharField(),
+    )
+
+
+@jobs.task
+def refresh(product_ids, force=False):
+    """Fetch and thumbnail the images of ``product_ids``; returns how many changed.
+
+    Products that already have a thumbnail are skipped unless ``force``.
+    Each distinct URL is fetched once; failures are logged and skipped.
+    """
+    fetch = fetcher()
+    if fetch is None:
+        return 0
+    products = Product.objects.filter(id__in=product_ids)
+    if not force:
+        products = products.filter(thumbnail='')
+    keys, changed = {}, []
+    for pk, url, old_key, owner_id, approved in products.values_list(
+            'id', 'img', 'thumbnail', 'user_id', 'is_approved'):
+        if url not in keys:
+            try:
+                keys[url] = store(fetch(url))
+            except ImageError as e:
+                logger.warning('No thumbnail for product %s: %s', pk, e)
+                keys[url] = None
+        if keys[url] and keys[url] != old_key:
+            changed.append((Product(id=pk, thumbnail=keys[url]), None if approved else owner_id))
+    if changed:
+        Product.objects.bulk_update([product for product, _ in changed], ['thumbnail'])
+        catalog.bump_catalog_version(*(owner_id for _, owner_id in changed))
+    return len(changed)
+
+
+def rebuild(product_id):
+    """Thumbnail ``product_id`` again after its file was evicted, at most once a minute."""
+    if cache.add(f'images:rebuild:{product_id}', True, PRUNE_INTERVAL):
+        schedule([product_id], force=True)
+
+
+def schedule(product_ids, force=False):
+    """Queue a job thumbnailing ``product_ids`` with the current transaction."""
+    if fetcher() is None:
+        return
+    product_ids = list(product_ids)
+    if product_ids:
+        jobs.enqueue(refresh, product_ids, force)
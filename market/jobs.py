@@ -0,0 +1,193 @@
+"""Durable background jobs, queued in the database.
+
+Work that need not hold up a response (thumbnailing images, adding orders
+to the sales rollups) is declared with ``@task`` and queued with
+``enqueue``. The ``Job`` row is written in the caller's transaction, so a
+job exists exactly when the change it follows has committed: a rolled-back
+request leaves none, and no commit can lose its job to a crash. A job
+queued outside a transaction is committed at once.
+
+``manage.py run_jobs`` claims due jobs in batches, one ``UPDATE`` each,
+and runs them on a pool of threads. A claim holds a job for ``LEASE``; a
+worker that dies mid-job loses it to the next claim once that runs out, so
+a task may run more than once. Tasks are idempotent, or declared
+``atomic``, which commits their work together with the removal of the job.
+A task that raises is retried with exponential backoff up to its
+``max_attempts`` and then kept as ``failed`` for ``run_jobs
+--retry-failed``.
+
+There is no broker: workers poll every ``JOBS_POLL_INTERVAL`` seconds.
+With ``JOBS_EAGER`` jobs instead run in the request's process once its
+transaction commits, with no retries, so development needs no worker.
+``queue_stats`` feeds the queue depth and lag gauges of ``/api/metrics``.
+"""
+import logging
+import os
+import random
+import socket
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import routers
+from .models import Job
+
+logger = logging.getLogger('market.jobs')
+
+MAX_ATTEMPTS = 5
+# Retries wait RETRY_BASE, 2 x RETRY_BASE, ... up to RETRY_MAX seconds, plus
+# up to half as much again so failed jobs do not retry in lockstep.
+RETRY_BASE = 10
+RETRY_MAX = 3600
+# How long a claim holds a job before another worker may take it.
+LEASE = timedelta(minutes=5)
+
+Task = namedtuple('Task', 'name func atomic max_attempts')
+
+_tasks = {}
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the job while it ran; its work is rolled back."""
+
+
+def task(func=None, *, atomic=False, max_attempts=MAX_ATTEMPTS):
+    """Register ``func`` as a task, under its dotted path.
+
+    Its arguments must be JSON-serializable. With ``atomic`` it runs in a
+    transaction that also deletes its job.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _tasks[name] = Task(name, func, atomic, max_attempts)
+        func.task_name = name
+        return func
+    return register(func) if func is not None else register
+
+
+def _lookup(name):
+    if name not in _tasks:
+        try:
+            # Importing the module registers its tasks.
+            import_string(name)
+        except ImportError:
+            pass
+    return _tasks.get(name)
+
+
+def _using():
+    return router.db_for_write(Job)
+
+
+def enqueue(func, *args):
+    """Queue a call of the task ``func`` with ``args``."""
+    name = func.task_name
+    args = list(args)
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: _run_eagerly(_tasks[name], args), using=_using())
+        return
+    Job.objects.using(_using()).create(task=name, args=args)
+
+
+def _run_eagerly(task, args):
+    try:
+        if task.atomic:
+            with transaction.atomic(using=_using()):
+                task.func(*args)
+        else:
+            task.func(*args)
+    except Exception:
+        logger.exception('Job %s%s failed', task.name, tuple(args))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit):
+    """Take up to ``limit`` due jobs, oldest first, for ``worker``."""
+    using = _using()
+    now = timezone.now()
+    lease_until = now + LEASE
+    # Unique per claim, so the jobs just taken can be told apart.
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    due = Job.objects.using(using).filter(status=Job.QUEUED, run_at__lte=now)
+    # Read first, so an idle worker never takes the write lock.
+    ids = list(due.order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    # Filtering on due again skips rows another worker claimed in between.
+    claimed = due.filter(id__in=ids).update(run_at=lease_until, claimed_by=token, attempts=F('attempts') + 1)
+    if not claimed:
+        return []
+    return list(
+        Job.objects.using(using)
+        .filter(status=Job.QUEUED, run_at=lease_until, claimed_by=token)
+        .order_by('id')
+    )
+
+
+def _backoff(attempts):
+    delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+    return timedelta(seconds=delay * random.uniform(1, 1.5))
+
+
+def run(job):
+    """Run a claimed ``job``; returns whether it succeeded."""
+    using = _using()
+    mine = Job.objects.using(using).filter(pk=job.pk, claimed_by=job.claimed_by)
+    task = _lookup(job.task)
+    try:
+        if task is None:
+            raise LookupError(f'Unknown task {job.task}')
+        if task.atomic:
+            with transaction.atomic(using=using):
+                task.func(*job.args)
+                if not mine.delete()[0]:
+                    raise LeaseLost(job.pk)
+        else:
+            task.func(*job.args)
+            mine.delete()
+        return True
+    except LeaseLost:
+        logger.warning('Job %s was claimed again while it ran', job.pk)
+        return False
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        if task is None or job.attempts >= task.max_attempts:
+            logger.exception('Job %s %s%s failed for good', job.pk, job.task, tuple(job.args))
+            mine.update(status=Job.FAILED, claimed_by='', last_error=error)
+        else:
+            logger.warning('Job %s %s failed, attempt %d: %s', job.pk, job.task, job.attempts, error)
+            mine.update(run_at=timezone.now() + _backoff(job.attempts), claimed_by='', last_error=error)
+        return False
+    finally:
+        # Pool threads keep no connections between jobs.
+        connections.close_all()
+
+
+def retry_failed(task_name=None):
+    """Queue failed jobs again, with their attempts reset; returns how many."""
+    jobs = Job.objects.using(_using()).filter(status=Job.FAILED)
+    if task_name:
+        jobs = jobs.filter(task=task_name)
+    return jobs.update(status=Job.QUEUED, run_at=timezone.now(), attempts=0)
+
+
+def queue_stats():
+    """``{(task, status): (jobs, oldest run_at)}`` over the whole table."""
+    # Read from the primary: a replica would hide jobs queued since its copy.
+    with routers.use_primary():
+        rows = list(
+            Job.objects.values_list('task', 'status')
+            .annotate(jobs=Count('id'), oldest=Min('run_at'))
+            .order_by()
+        )
+    return {(name, status): (jobs, oldest) for name, status, jobs, oldest in rows}
+
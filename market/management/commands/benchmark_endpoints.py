@@ -0,0 +1,426 @@
+import io
+import json
+import platform
+import tempfile
+import time
+from contextlib import ExitStack
+from statistics import mean
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from PIL import Image
+
+from market import images, sales, urls as market_urls
+from market.models import CartItem, Order, Product, UserProfile
+
+ROLES = ('anonymous', 'customer', 'artisan', 'admin')
+GUEST_SESSION = 'session_benchmark'
+
+# Rows created per unit of --scales.
+SCALE_UNIT = {
+    'customers': 40,
+    'artisans': 8,
+    'products': 400,
+    'cart_lines_per_customer': 3,
+    'orders_per_customer': 3,
+    'items_per_order': 3,
+}
+
+
+class Bench:
+    """Users, clients and row pools shared by the scenarios of one scale."""
+
+    def __init__(self, scale):
+        self.scale = scale
+        self.counter = 0
+        self.users = {}
+        self.clients = {'anonymous': Client()}
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}-{self.counter}'
+
+    def product(self, approved=True, owner=None):
+        return Product.objects.create(
+            name=self.unique('Bench product'),
+            price=100,
+            img='https://example.com/bench.jpg',
+            user=owner or self.users['artisan'],
+            is_approved=approved,
+        )
+
+    def cart_line(self, user):
+        product = self.product()
+        return CartItem.objects.create(
+            product=product,
+            product_name=product.name,
+            product_price=product.price,
+            product_img=product.img,
+            user=user,
+        )
+
+
+def _request(method, path, data=None, fresh=False):
+    return {'method': method, 'path': path, 'data': data, 'fresh': fresh}
+
+
+def _json(method, path, data):
+    return {'method': method, 'path': path, 'data': data, 'fresh': False, 'json': True}
+
+
+# url name -> (query budget per request, roles, request builder). Builders may
+# create rows they need with the ORM; only the client call itself is measured.
+# Every route in market/urls.py must have an entry here.
+SCENARIOS = {
+    'get_products': (4, ROLES, lambda b, role, i: _request('get', '/api/products/?limit=24')),
+    'search_products': (4, ROLES, lambda b, role, i: _request('get', '/api/products/search/?q=basket')),
+    'add_product': (5, ('artisan', 'admin'), lambda b, role, i: _json('post', '/api/products/add/', {
+        'name': b.unique('New product'), 'price': '250', 'img': 'https://example.com/new.jpg',
+    })),
+    'approve_product': (6, ('admin',), lambda b, role, i: _request(
+        'post', f'/api/products/approve/{b.product(approved=False).id}/')),
+    'bulk_approve_products': (6, ('admin',), lambda b, role, i: _json(
+        'post', '/api/products/approve/bulk/', {'ids': [b.product(approved=False).id for _ in range(20)]})),
+    'delete_product': (10, ('artisan', 'admin'), lambda b, role, i: _request(
+        'delete', f'/api/products/delete/{b.product(owner=b.users[role]).id}/')),
+    'bulk_delete_products': (10, ('admin',), lambda b, role, i: _json(
+        'post', '/api/products/delete/bulk/', {'ids': [b.product().id for _ in range(20)]})),
+    'product_image': (0, ('anonymous',), lambda b, role, i: _request('get', f'/api/images/{b.image_key}.webp')),
+    'export_products': (4, ('artisan', 'admin'), lambda b, role, i: _request(
+        'get', '/api/products/export/' + ('?format=csv' if i % 2 else ''))),
+    'add_to_cart': (9, ('customer',), lambda b, role, i: _json(
+        'post', '/api/cart/add/', {'product_id': b.cart_product.id})),
+    'get_cart': (3, ('anonymous', 'customer'), lambda b, role, i: _request(
+        'get', f'/api/cart/?session_id={GUEST_SESSION}')),
+    'remove_from_cart': (6, ('customer',), lambda b, role, i: _request(
+        'delete', f'/api/cart/remove/{b.cart_line(b.users[role]).id}/')),
+    'place_order': (10, ('customer',), lambda b, role, i: (
+        b.cart_line(b.users[role]), _json('post', '/api/order/place/', {}))[1]),
+    'get_orders': (4, ('anonymous', 'customer'), lambda b, role, i: _request(
+        'get', f'/api/orders/?session_id={GUEST_SESSION}')),
+    'export_orders': (4, ('artisan', 'admin'), lambda b, role, i: _request(
+        'get', '/api/orders/export/' + ('?format=csv' if i % 2 else ''))),
+    'delete_order': (9, ('customer',), lambda b, role, i: _request(
+        'delete', f'/api/orders/delete/{Order.objects.create(total_amount=1, user=b.users[role]).id}/')),
+    'sales_dashboard': (5, ('artisan', 'admin'), lambda b, role, i: _request(
+        'get', f'/api/sales/dashboard/?artisan={b.users["artisan"].username}')),
+    'bootstrap': (4, ROLES, lambda b, role, i: _request('get', f'/api/bootstrap/?limit=24&session_id={GUEST_SESSION}')),
+    'catalog_events': (3, ROLES, lambda b, role, i: _request('get', '/api/events/')),
+    'check_auth': (3, ROLES, lambda b, role, i: _request('get', '/api/auth/check/')),
+    'metrics': (1, ('anonymous',), lambda b, role, i: _request('get', '/api/metrics')),
+}
+
+# Project-level views that are benchmarked alongside the API.
+PAGE_SCENARIOS = {
+    'index (GET)': (0, ('anonymous',), lambda b, role, i: _request('get', '/', fresh=True)),
+    'login (GET)': (0, ('anonymous',), lambda b, role, i: _request('get', '/login/', fresh=True)),
+    'login (POST)': (10, ('anonymous',), lambda b, role, i: _request(
+        'post', '/login/', {'username': b.users['customer'].username, 'password': 'benchmark'}, fresh=True)),
+    'register (GET)': (0, ('anonymous',), lambda b, role, i: _request('get', '/register/', fresh=True)),
+    'register (POST)': (15, ('anonymous',), lambda b, role, i: _request('post', '/register/', {
+        'username': b.unique('newuser'), 'email': 'new@example.com',
+        'password': 'benchmark', 'password2': 'benchmark',
+    }, fresh=True)),
+}
+
+# Statuses a scenario must answer with (default: 200 and 201). Anything else
+# fails the run: an error response times and counts the wrong code path.
+EXPECTED_STATUSES = {
+    'login (POST)': {302},
+    'register (POST)': {302},
+}
+DEFAULT_STATUSES = {200, 201}
+
+# Scenarios the test client cannot measure outside ASGI mode, and why.
+ASGI_ONLY = {
+    'catalog_events': 'only streamed in ASGI mode (MARKET_ASYNC_VIEWS=True); WSGI answers 204',
+}
+
+
+def _streamed_body(response):
+    if response.is_async:
+        # ASGI mode streams from async iterators.
+        async def collect():
+            return [chunk async for chunk in response.streaming_content]
+        return b''.join(async_to_sync(collect)())
+    return b''.join(response.streaming_content)
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every market endpoint against a scratch database at several '
+        'scale factors and fail when an endpoint exceeds its query budget or '
+        'answers with an unexpected status'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1,5', help='Comma-separated scale factors (default: 1,5)')
+        parser.add_argument('--requests', type=int, default=30, help='Requests per endpoint and role (default: 30)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Previous JSON report to compare this run against')
+        parser.add_argument('--only', help='Comma-separated endpoint names to run')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options['scales'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers.')
+        if not scales or min(scales) < 1:
+            raise CommandError('--scales needs at least one positive integer.')
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1.')
+
+        scenarios = dict(SCENARIOS, **PAGE_SCENARIOS)
+        missing = [p.name for p in market_urls.urlpatterns if p.name not in SCENARIOS]
+        if missing:
+            raise CommandError(f'No benchmark scenario for: {", ".join(missing)}')
+        if options['only']:
+            wanted = {name.strip() for name in options['only'].split(',')}
+            scenarios = {name: s for name, s in scenarios.items() if name in wanted}
+        if not settings.ASYNC_VIEWS:
+            for name, reason in ASGI_ONLY.items():
+                if scenarios.pop(name, None):
+                    self.stdout.write(self.style.WARNING(f'Skipping {name}: {reason}.'))
+
+        setup_test_environment()
+        # Replicas are test mirrors of the scratch database.
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # Hashing dominates login/register; benchmark the endpoints, not
+            # PBKDF2. Thumbnails are served from a scratch cache and never
+            # fetched, so adding and approving products stays off the network.
+            # Static assets keep their unhashed names, so the index page
+            # renders without a collectstatic run. Event streams end as soon
+            # as they have been opened.
+            with tempfile.TemporaryDirectory() as image_cache, override_settings(
+                PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                IMAGE_CACHE_DIR=image_cache,
+                IMAGE_FETCHER=None,
+                EVENTS_STREAM_SECONDS=0,
+                STORAGES=dict(settings.STORAGES, staticfiles={
+                    'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+                }),
+            ):
+                results = []
+                for scale in scales:
+                    results += self._run_scale(scale, scenarios, options['requests'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'scales': scales,
+                'requests': options['requests'],
+                'scale_unit': SCALE_UNIT,
+                'password_hasher': 'MD5 (benchmark only)',
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f'\nReport written to {options["output"]}')
+        if options['compare']:
+            self._compare(options['compare'], results)
+
+        failures = [
+            f"{r['endpoint']} as {r['role']} at scale {r['scale']} answered "
+            f"{', '.join(map(str, r['unexpected_statuses']))}"
+            for r in results if r['unexpected_statuses']
+        ]
+        over = [r for r in results if r['over_budget']]
+        if over:
+            failures.append('Query budget exceeded: ' + ', '.join(
+                f"{r['endpoint']} as {r['role']} at scale {r['scale']} "
+                f"({r['queries_max']} > {r['query_budget']})" for r in over))
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('\nAll endpoints answered as expected within their query budgets.'))
+
+    def _run_scale(self, scale, scenarios, requests):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        bench = self._seed(scale)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nScale {scale}: {User.objects.count()} users, {Product.objects.count()} products, '
+            f'{CartItem.objects.count()} cart rows, {Order.objects.count()} orders'
+        ))
+        self.stdout.write(f'{"endpoint":<24} {"role":<10} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                          f'{"queries":>8} {"budget":>6} {"bytes":>8}')
+
+        results = []
+        for name, (budget, roles, build) in scenarios.items():
+            for role in roles:
+                result = self._measure(bench, name, role, build, requests)
+                unexpected = sorted(set(result['statuses']) - EXPECTED_STATUSES.get(name, DEFAULT_STATUSES))
+                result.update(
+                    scale=scale, query_budget=budget, over_budget=result['queries_max'] > budget,
+                    unexpected_statuses=unexpected,
+                )
+                results.append(result)
+                failed = result['over_budget'] or unexpected
+                style = self.style.ERROR if failed else (lambda text: text)
+                self.stdout.write(style(
+                    f'{name:<24} {role:<10} {result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} '
+                    f'{result["p99_ms"]:>8.2f} {result["queries_max"]:>8} {budget:>6} {result["bytes_mean"]:>8.0f}'
+                    + (f'  status {", ".join(map(str, unexpected))}' if unexpected else '')
+                ))
+        return results
+
+    def _seed(self, scale):
+        """Create ``scale`` units of users, products, carts and orders."""
+        bench = Bench(scale)
+        password = make_password('benchmark')
+        counts = {k: v * scale for k, v in SCALE_UNIT.items() if k in ('customers', 'artisans', 'products')}
+
+        users = [User(username=f'customer{i}', password=password) for i in range(counts['customers'])]
+        users += [User(username=f'artisan{i}', password=password) for i in range(counts['artisans'])]
+        users.append(User(username='admin', password=password, is_staff=True, is_superuser=True))
+        User.objects.bulk_create(users)
+        users = {u.username: u for u in User.objects.all()}
+        UserProfile.objects.bulk_create(
+            UserProfile(user=u, is_artisan=name.startswith('artisan')) for name, u in users.items())
+
+        artisans = [users[f'artisan{i}'] for i in range(counts['artisans'])]
+        Product.objects.bulk_create(
+            Product(
+                name=f'Handwoven basket {i}' if i % 10 == 1 else f'Village craft {i}',
+                price=50 + i % 950,
+                img=f'https://example.com/products/{i}.jpg',
+                user=artisans[i % len(artisans)],
+                is_approved=i % 5 != 0,
+                approved_at=timezone.now() if i % 5 != 0 else None,
+            )
+            for i in range(counts['products'])
+        )
+        approved = list(Product.objects.filter(is_approved=True).order_by('id')[:50])
+
+        customers = [users[f'customer{i}'] for i in range(counts['customers'])]
+        lines = []
+        orders = Order.objects.bulk_create(
+            Order(total_amount=0, user=customer)
+            for customer in customers for _ in range(SCALE_UNIT['orders_per_customer'])
+        )
+        orders += Order.objects.bulk_create(
+            Order(total_amount=0, session_id=GUEST_SESSION) for _ in range(SCALE_UNIT['orders_per_customer'] * scale))
+        for n, order in enumerate(orders):
+            for k in range(SCALE_UNIT['items_per_order']):
+                product = approved[(n + k) % len(approved)]
+                lines.append(CartItem(
+                    product=product, product_name=product.name, product_price=product.price,
+                    product_img=product.img, user=order.user, session_id=order.session_id,
+                    order=order, ordered=True,
+                ))
+        for n, customer in enumerate(customers):
+            for k in range(SCALE_UNIT['cart_lines_per_customer']):
+                product = approved[(n + k) % len(approved)]
+                lines.append(CartItem(
+                    product=product, product_name=product.name, product_price=product.price,
+                    product_img=product.img, user=customer,
+                ))
+        for k in range(SCALE_UNIT['cart_lines_per_customer'] * scale):
+            product = approved[k % len(approved)]
+            lines.append(CartItem(
+                product=product, product_name=product.name, product_price=product.price,
+                product_img=product.img, session_id=GUEST_SESSION,
+            ))
+        CartItem.objects.bulk_create(lines, batch_size=1000)
+        sales.rebuild()
+
+        bench.users = {
+            'customer': customers[0],
+            'artisan': artisans[0],
+            'admin': users['admin'],
+        }
+        for role, user in bench.users.items():
+            bench.clients[role] = Client()
+            bench.clients[role].force_login(user, backend='market.accounts.CachedModelBackend')
+        bench.cart_product = approved[-1]
+        source = io.BytesIO()
+        Image.new('RGB', (1200, 900), (180, 120, 60)).save(source, 'JPEG')
+        bench.image_key = images.store(source.getvalue())
+        return bench
+
+    def _measure(self, bench, name, role, build, requests):
+        timings, queries, sizes, statuses = [], [], [], set()
+        for i in range(requests):
+            spec = build(bench, role, i)
+            client = Client() if spec['fresh'] else bench.clients[role]
+            call = getattr(client, spec['method'])
+            kwargs = {'content_type': 'application/json'} if spec.get('json') else {}
+            if spec['data'] is not None:
+                kwargs['data'] = spec['data']
+
+            with ExitStack() as stack:
+                # Count queries on every alias, replicas included.
+                captured = [stack.enter_context(CaptureQueriesContext(c)) for c in connections.all()]
+                started = time.perf_counter()
+                response = call(spec['path'], **kwargs)
+                if response.streaming:
+                    body = _streamed_body(response)
+                else:
+                    body = response.content
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(sum(len(c) for c in captured))
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+
+        timings.sort()
+        return {
+            'endpoint': name,
+            'role': role,
+            'requests': requests,
+            'statuses': sorted(statuses),
+            'p50_ms': round(_percentile(timings, 50), 3),
+            'p95_ms': round(_percentile(timings, 95), 3),
+            'p99_ms': round(_percentile(timings, 99), 3),
+            'queries_max': max(queries),
+            'queries_mean': round(mean(queries), 2),
+            'bytes_mean': round(mean(sizes), 1),
+        }
+
+    def _compare(self, path, results):
+        try:
+            with open(path, encoding='utf-8') as fh:
+                baseline = json.load(fh)['results']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Cannot read baseline report {path}: {e}')
+
+        previous = {(r['scale'], r['endpoint'], r['role']): r for r in baseline}
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nCompared with {path}'))
+        for r in results:
+            old = previous.get((r['scale'], r['endpoint'], r['role']))
+            if old is None:
+                continue
+            ratio = r['p95_ms'] / old['p95_ms'] if old['p95_ms'] else 1.0
+            query_delta = r['queries_max'] - old['queries_max']
+            if ratio < 1.2 and query_delta <= 0:
+                continue
+            style = self.style.ERROR if query_delta > 0 else self.style.WARNING
+            self.stdout.write(style(
+                f"scale {r['scale']} {r['endpoint']} as {r['role']}: p95 {old['p95_ms']:.2f} -> "
+                f"{r['p95_ms']:.2f} ms ({ratio:.2f}x), queries {old['queries_max']} -> {r['queries_max']}"
+            ))
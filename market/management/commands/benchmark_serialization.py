@@ -0,0 +1,190 @@
+import hashlib
+import json
+import platform
+import time
+import tracemalloc
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from market import catalog, fastjson
+from market.models import CartItem, Product, cart_line_total, open_cart_items
+from market.views import _cart_body, _cart_item_data, _lean_cart_rows, _products_body, _products_page
+
+PATHS = ('regular', 'fast')
+
+
+def _mark():
+    """Start measuring one request's allocations (a no-op unless tracemalloc runs)."""
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _peak_since(mark):
+    return tracemalloc.get_traced_memory()[1] - mark
+
+
+def _catalog_pages(path, listing, limit, version):
+    """Walk the public catalog page by page.
+
+    Returns the rows seen, a digest of the bodies and the largest peak of
+    memory allocated by a single page.
+    """
+    user = AnonymousUser()
+    lean = path == 'fast'
+    renderer = JSONRenderer()
+    cursor, rows_seen, digest, peak = None, 0, hashlib.sha1(), 0
+    while True:
+        mark = _mark()
+        rows = catalog.page_rows(catalog.PUBLIC, listing, cursor, limit, version, lean)
+        if lean:
+            body = fastjson.render(_products_body(user, listing, rows, limit))
+        else:
+            body = renderer.render(_products_page(user, listing, rows, limit))
+        peak = max(peak, _peak_since(mark))
+        rows_seen += len(rows[:limit])
+        digest.update(body)
+        if len(rows) <= limit:
+            return rows_seen, digest, peak
+        cursor = listing.row_key(rows[limit - 1])
+
+
+def _cart(path, user, repeat):
+    """Render ``user``'s cart ``repeat`` times; returns what ``_catalog_pages`` does."""
+    renderer = JSONRenderer()
+    rows_seen, digest, peak = 0, hashlib.sha1(), 0
+    for _ in range(repeat):
+        mark = _mark()
+        if path == 'fast':
+            rows = list(_lean_cart_rows(open_cart_items(user)))
+            body = fastjson.render(_cart_body(rows))
+        else:
+            items = open_cart_items(user).select_related('product').annotate(line_total=cart_line_total())
+            data = [_cart_item_data(item) for item in items]
+            body = renderer.render({'items': data, 'total': float(sum(item['line_total'] for item in data))})
+            rows = data
+        peak = max(peak, _peak_since(mark))
+        rows_seen += len(rows)
+        digest.update(body)
+    return rows_seen, digest, peak
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the regular (model instances + JSONRenderer) and fast (values_list '
+        '+ market.fastjson) serialization of the catalog and cart endpoints: rows '
+        'per second and peak memory allocated per request, on a scratch database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000, help='Approved products to page through (default: 20000)')
+        parser.add_argument('--page-size', type=int, default=100, help='Catalog page size (default: 100)')
+        parser.add_argument('--cart-lines', type=int, default=50, help='Lines in the benchmarked cart (default: 50)')
+        parser.add_argument('--repeat', type=int, default=200, help='Cart renders per path (default: 200)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if min(options['products'], options['page_size'], options['cart_lines'], options['repeat']) < 1:
+            raise CommandError('--products, --page-size, --cart-lines and --repeat must be positive.')
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            customer = self._seed(options['products'], options['cart_lines'])
+            results = self._run(customer, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f'\n{"scenario":<16} {"path":<8} {"rows":>8} {"rows/s":>10} {"speedup":>8} {"peak KiB/request":>17}')
+        for r in results:
+            self.stdout.write(
+                f'{r["scenario"]:<16} {r["path"]:<8} {r["rows"]:>8} {r["rows_per_second"]:>10.0f} '
+                f'{r["speedup"]:>7.2f}x {r["request_peak_kib"]:>17.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS('\nBoth paths produced identical JSON.'))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump({
+                    'meta': {
+                        'created_at': timezone.now().isoformat(),
+                        'python': platform.python_version(),
+                        'options': {k: options[k] for k in ('products', 'page_size', 'cart_lines', 'repeat')},
+                    },
+                    'results': results,
+                }, fh, indent=2)
+            self.stdout.write(f'\nReport written to {options["output"]}')
+
+    def _seed(self, products, cart_lines):
+        artisans = User.objects.bulk_create(User(username=f'artisan{i}') for i in range(20))
+        customer = User.objects.create(username='customer')
+        Product.objects.bulk_create(
+            (
+                Product(
+                    name=f'Village craft {i}',
+                    price=f'{50 + i % 950}.{i % 100:02d}',
+                    img=f'https://example.com/products/{i}.jpg',
+                    user=artisans[i % len(artisans)],
+                    is_approved=True,
+                    approved_at=timezone.now(),
+                    approved_by=artisans[0],
+                )
+                for i in range(products)
+            ),
+            batch_size=2000,
+        )
+        CartItem.objects.bulk_create(
+            CartItem(
+                product=product, product_name=product.name, product_price=product.price,
+                product_img=product.img, user=customer, quantity=1 + product.id % 3,
+            )
+            for product in Product.objects.order_by('id')[:cart_lines]
+        )
+        return customer
+
+    def _run(self, customer, options):
+        listing = catalog.Listing()
+        limit = options['page_size']
+        scenarios = {
+            # A fresh catalog version misses the cache on every page and fetches
+            # rows from the database; the same version again reads them cached.
+            'catalog (miss)': lambda path: _catalog_pages(path, listing, limit, time.time_ns()),
+            'catalog (hit)': lambda path: _catalog_pages(path, listing, limit, 1),
+            'cart': lambda path: _cart(path, customer, options['repeat']),
+        }
+
+        results = []
+        for scenario, run in scenarios.items():
+            measured = {}
+            for path in PATHS:
+                cache.clear()
+                run(path)  # warm-up
+                started = time.perf_counter()
+                rows, digest, _ = run(path)
+                elapsed = time.perf_counter() - started
+
+                # Allocations are traced in a separate, untimed pass.
+                tracemalloc.start()
+                _, _, peak = run(path)
+                tracemalloc.stop()
+                measured[path] = {
+                    'scenario': scenario,
+                    'path': path,
+                    'rows': rows,
+                    'sha1': digest.hexdigest(),
+                    'seconds': round(elapsed, 4),
+                    'rows_per_second': rows / elapsed,
+                    'request_peak_kib': peak / 1024,
+                }
+            if measured['regular']['sha1'] != measured['fast']['sha1']:
+                raise CommandError(f'{scenario}: the fast path produced different JSON.')
+            for path in PATHS:
+                measured[path]['speedup'] = measured[path]['rows_per_second'] / measured['regular']['rows_per_second']
+                results.append(measured[path])
+        return results
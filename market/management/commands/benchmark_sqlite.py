@@ -0,0 +1,210 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import time
+from statistics import mean
+
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ('default', 'production')
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def _setup_django(profile, path):
+    """Configure Django in a fresh process for ``profile`` on the file at ``path``.
+
+    Runs in spawned processes only: settings read SQLITE_PROFILE at import
+    time, so each profile needs interpreters that have not loaded them yet.
+    """
+    os.environ['SQLITE_PROFILE'] = profile
+    os.environ['DATABASE_REPLICA_FILES'] = ''
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = path
+    django.setup()
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+
+
+def _prepare(profile, path, users, products, orders):
+    _setup_django(profile, path)
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    call_command(
+        'generate_market_data', users=users, artisans=max(1, users // 10), products=products,
+        orders=orders, cart_items=0, verbosity=0,
+    )
+
+
+def _worker(profile, path, worker_id, seconds, write_ratio, barrier, results):
+    _setup_django(profile, path)
+    from django.contrib.auth.models import User
+    from django.db import close_old_connections
+    from django.test import Client
+
+    from market.models import Product
+
+    rng = random.Random(worker_id)
+    customers = list(User.objects.filter(profile__is_artisan=False).order_by('id').values_list('id', flat=True))
+    product_ids = list(Product.objects.filter(is_approved=True).values_list('id', flat=True)[:2000])
+    client = Client()
+    customer = User.objects.get(id=customers[worker_id % len(customers)])
+    client.force_login(customer, backend='market.accounts.CachedModelBackend')
+    # Only errors matter here; the load makes most requests "slow".
+    logging.getLogger('market.performance').setLevel(logging.ERROR)
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    # Warm up imports and caches outside the measured window.
+    client.get('/api/orders/')
+    client.get('/api/cart/')
+
+    stats = {'writes': [], 'reads': [], 'write_errors': 0, 'read_errors': 0, 'errors': {}}
+    barrier.wait(timeout=300)
+    deadline = time.perf_counter() + seconds
+    n = in_cart = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        write = rng.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if not write:
+                response = client.get('/api/orders/' if n % 2 else '/api/cart/')
+            elif in_cart < 3:
+                # Three cart additions, then a checkout.
+                response = client.post(
+                    '/api/cart/add/', {'product_id': rng.choice(product_ids)}, content_type='application/json')
+                in_cart += 1
+            else:
+                response = client.post('/api/order/place/', {}, content_type='application/json')
+                in_cart = 0
+            ok = response.status_code < 500
+            error = None if ok else f'HTTP {response.status_code}'
+        except Exception as e:  # the test client re-raises view errors
+            ok, error = False, f'{type(e).__name__}: {e}'
+        # What the request_finished handler does outside the test client:
+        # close the connection unless CONN_MAX_AGE keeps it open.
+        close_old_connections()
+        elapsed = (time.perf_counter() - started) * 1000
+        if ok:
+            stats['writes' if write else 'reads'].append(elapsed)
+        else:
+            stats['write_errors' if write else 'read_errors'] += 1
+            stats['errors'][error] = stats['errors'].get(error, 0) + 1
+    results.put(stats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare SQLite profiles (settings.SQLITE_PROFILE) under a mixed load of '
+        'concurrent cart writes, checkouts and history reads from several processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(PROFILES), help='Profiles to compare (default: default,production)')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes (default: 4)')
+        parser.add_argument('--seconds', type=float, default=10, help='Load duration per profile (default: 10)')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Share of requests that write (default: 0.3)')
+        parser.add_argument('--users', type=int, default=1000, help='Users in the scratch database (default: 1000)')
+        parser.add_argument('--products', type=int, default=20000, help='Products in the scratch database (default: 20000)')
+        parser.add_argument('--orders', type=int, default=20000, help='Orders in the scratch database (default: 20000)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        profiles = [p.strip() for p in options['profiles'].split(',') if p.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f'Unknown profiles: {", ".join(sorted(unknown))}')
+        if options['workers'] < 1 or options['seconds'] <= 0:
+            raise CommandError('--workers and --seconds must be positive.')
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio must be between 0 and 1.')
+        if options['users'] < 2 * options['workers']:
+            raise CommandError('--users must be at least twice --workers.')
+
+        # Settings are read once per interpreter, so every profile runs in
+        # freshly spawned processes.
+        context = multiprocessing.get_context('spawn')
+        report = []
+        with tempfile.TemporaryDirectory() as scratch:
+            for profile in profiles:
+                path = os.path.join(scratch, f'{profile}.sqlite3')
+                self.stdout.write(f'Preparing {profile} database...')
+                prepare = context.Process(target=_prepare, args=(
+                    profile, path, options['users'], options['products'], options['orders']))
+                prepare.start()
+                prepare.join()
+                if prepare.exitcode:
+                    raise CommandError(f'Preparing the {profile} database failed.')
+                report.append(self._run(context, profile, path, options))
+
+        self.stdout.write(
+            f'\n{"profile":<12} {"writes/s":>9} {"write err":>9} {"write p95":>10} '
+            f'{"read p50":>9} {"read p95":>9} {"read p99":>9} {"read err":>9}'
+        )
+        for r in report:
+            self.stdout.write(
+                f'{r["profile"]:<12} {r["writes_per_second"]:>9.1f} {r["write_errors"]:>9} '
+                f'{r["write_p95_ms"]:>10.1f} {r["read_p50_ms"]:>9.1f} {r["read_p95_ms"]:>9.1f} '
+                f'{r["read_p99_ms"]:>9.1f} {r["read_errors"]:>9}'
+            )
+            for error, count in sorted(r['errors'].items(), key=lambda e: -e[1])[:3]:
+                self.stdout.write(f'    {count} x {error[:100]}')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump({'options': {k: options[k] for k in (
+                    'workers', 'seconds', 'write_ratio', 'users', 'products', 'orders')}, 'results': report}, fh, indent=2)
+            self.stdout.write(f'\nReport written to {options["output"]}')
+
+    def _run(self, context, profile, path, options):
+        self.stdout.write(f'Running {profile}: {options["workers"]} workers for {options["seconds"]:g}s')
+        barrier = context.Barrier(options['workers'])
+        results = context.Queue()
+        workers = [
+            context.Process(target=_worker, args=(
+                profile, path, n, options['seconds'], options['write_ratio'], barrier, results))
+            for n in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            stats = [results.get(timeout=options['seconds'] + 300) for _ in workers]
+        except queue.Empty:
+            raise CommandError(f'A {profile} worker failed; see its traceback above.')
+        for worker in workers:
+            worker.join()
+
+        writes = sorted(t for s in stats for t in s['writes'])
+        reads = sorted(t for s in stats for t in s['reads'])
+        errors = {}
+        for s in stats:
+            for error, count in s['errors'].items():
+                errors[error] = errors.get(error, 0) + count
+        return {
+            'profile': profile,
+            'writes': len(writes),
+            'writes_per_second': len(writes) / options['seconds'],
+            'write_errors': sum(s['write_errors'] for s in stats),
+            'write_p95_ms': _percentile(writes, 95),
+            'reads': len(reads),
+            'reads_per_second': len(reads) / options['seconds'],
+            'read_errors': sum(s['read_errors'] for s in stats),
+            'read_mean_ms': mean(reads) if reads else 0.0,
+            'read_p50_ms': _percentile(reads, 50),
+            'read_p95_ms': _percentile(reads, 95),
+            'read_p99_ms': _percentile(reads, 99),
+            'errors': errors,
+        }
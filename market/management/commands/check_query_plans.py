@@ -0,0 +1,109 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from market import catalog, exports, fastjson, sales
+from market.models import Job, Product, open_cart_items, order_history
+from market.views import _lean_cart_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN on the main query of each market endpoint and '
+        'fail if any of them scans a table instead of using an index'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN checks are only available on SQLite.')
+
+        # An unsaved user is enough to build the user-scoped queries.
+        user = User(id=1, username='plan-check')
+        guest = AnonymousUser()
+        today = timezone.localdate()
+
+        # The queries each endpoint runs with the current FAST_JSON_ENDPOINTS.
+        page_queryset = catalog.lean_page_queryset if fastjson.enabled('get_products') else catalog.page_queryset
+        cart_rows = _lean_cart_rows if fastjson.enabled('get_cart') else (lambda cart_items: cart_items)
+
+        # (label, queryset, whether the market table must be seeked, not walked)
+        queries = []
+        for label, listing, cursor in self._listings():
+            queries += [
+                (f'get_products (public, {label})', page_queryset(
+                    catalog.visible_products(catalog.PUBLIC), listing, cursor, 24), cursor is not None),
+                (f'get_products (admin, {label})', page_queryset(
+                    catalog.visible_products(catalog.ADMIN), listing, cursor, 24), cursor is not None),
+                (f'get_products (owner overlay, {label})', page_queryset(
+                    catalog.pending_products(user.id), listing), True),
+            ]
+        queries += [
+            ('get_cart (user)', cart_rows(open_cart_items(user)), True),
+            ('get_cart (guest)', cart_rows(open_cart_items(guest, 'session_plan_check')), True),
+            ('get_orders (user)', order_history(user), True),
+            ('get_orders (guest)', order_history(guest, 'session_plan_check'), True),
+            # The admin product export walks the whole table by design.
+            ('export_products (artisan)', exports.products(user.id), True),
+            ('export_orders (admin)', exports.order_lines(), True),
+            ('export_orders (artisan)', exports.order_lines(user.id), True),
+            ('product_image (evicted)', Product.objects.filter(thumbnail='0' * 64).order_by('id')[:1], True),
+            # Per-product totals group the same window and are left out.
+            ('sales_dashboard (days)', sales.dashboard_rows(user.id, today - timedelta(days=29), today)[0], True),
+            # Not an endpoint, but every idle worker runs it each poll.
+            ('run_jobs (claim)', Job.objects.filter(
+                status=Job.QUEUED, run_at__lte=timezone.now()).order_by('run_at', 'id').values('id')[:4], True),
+        ]
+
+        failures = []
+        for label, queryset, seek in queries:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as db_cursor:
+                db_cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in db_cursor.fetchall()]
+
+            problems = [step for step in plan if self._is_full_scan(step)]
+            if seek and not any(step.startswith('SEARCH market_') for step in plan):
+                problems.append('no index seek on the market table')
+            style = self.style.ERROR if problems else self.style.SUCCESS
+            self.stdout.write(style(f'{label}:'))
+            for step in plan:
+                self.stdout.write(f'    {step}')
+            if problems:
+                failures.append(label)
+
+        if failures:
+            raise CommandError(f'Queries without a usable index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS(f'\nAll {len(queries)} endpoint queries use an index.'))
+
+    @staticmethod
+    def _listings():
+        """Yield ``(label, listing, cursor)`` for every supported sort and filter."""
+        samples = {
+            'name': 'm',
+            'price': Decimal('500'),
+            'created_at': timezone.now(),
+        }
+        for sort, (field, _) in catalog.SORTS.items():
+            listing = catalog.Listing(sort)
+            yield f'sort={sort}', listing, None
+            yield f'sort={sort}, next page', listing, (samples[field], 1)
+            yield f'sort={sort}, owner', catalog.Listing(sort, owner='plan-check'), None
+        for sort in ('price', '-price'):
+            yield f'sort={sort}, price range', catalog.Listing(
+                sort, min_price=Decimal('100'), max_price=Decimal('1000')), None
+        for sort in ('created_at', '-created_at'):
+            yield f'sort={sort}, created_after', catalog.Listing(
+                sort, created_after=timezone.now()), None
+
+    @staticmethod
+    def _is_full_scan(step):
+        # "SCAN market_product" reads the whole table; "SCAN ... USING INDEX"
+        # walks an index in order and stops at the LIMIT. A temp B-tree means
+        # the ORDER BY is not served by an index and every match is sorted.
+        if step.startswith('SCAN ') and ' USING ' not in step:
+            return True
+        return 'USE TEMP B-TREE' in step
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market import images
+from market.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Fetch and thumbnail product images that have no local thumbnail yet, '
+        'such as products loaded outside the API. Use --all to refetch every image.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refetch images that already have a thumbnail')
+        parser.add_argument('--batch-size', type=int, default=100, help='Products per batch (default: 100)')
+
+    def handle(self, *args, **options):
+        if images.fetcher() is None:
+            raise CommandError('IMAGE_FETCHER is not set.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        products = Product.objects.order_by('id')
+        if not options['all']:
+            products = products.filter(thumbnail='')
+        ids = list(products.values_list('id', flat=True))
+
+        started = time.perf_counter()
+        changed = 0
+        for start in range(0, len(ids), options['batch_size']):
+            changed += images.refresh(ids[start:start + options['batch_size']], force=options['all'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(ids)} products, {changed} thumbnails updated in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,369 @@
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+from math import gcd
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from market import catalog, sales, search
+from market.models import CartItem, Order, Product, UserProfile
+
+# Rows are generated in fixed blocks, each from its own RNG, so a resumed run
+# (or one with a different --batch-size) produces exactly the same rows.
+BLOCK_SIZE = 1000
+
+# Timestamps are spread over --days from this fixed start.
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+ADJECTIVES = [
+    'Handwoven', 'Hand-painted', 'Carved', 'Embroidered', 'Block-printed', 'Glazed',
+    'Braided', 'Hammered', 'Knitted', 'Dyed', 'Etched', 'Polished', 'Rustic', 'Miniature',
+]
+MATERIALS = [
+    'Bamboo', 'Terracotta', 'Jute', 'Cotton', 'Wool', 'Brass', 'Coconut Shell', 'Teak',
+    'Mango Wood', 'Clay', 'Silk', 'Palm Leaf', 'Cane', 'Copper', 'Khadi', 'Stone',
+]
+ITEMS = [
+    'Basket', 'Necklace', 'Bowl Set', 'Bag', 'Socks', 'Water Pot', 'Spice Box', 'Shawl',
+    'Lamp', 'Wall Hanging', 'Coaster Set', 'Tray', 'Earrings', 'Doormat', 'Planter', 'Toy',
+]
+# Most cart lines are for a single piece.
+QUANTITIES = (1, 1, 1, 1, 2, 2, 3)
+# Price points in rupees; cheaper goods are listed more often.
+PRICES = [150, 250, 350, 450, 650, 700, 850, 950, 1100, 1200, 1600, 2400, 3500]
+PRICE_WEIGHTS = list(accumulate([8, 10, 12, 12, 10, 9, 8, 7, 6, 5, 4, 2, 1]))
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a deterministic synthetic dataset (users with profiles, products, '
+        'orders and open carts). The same --seed and sizes always produce the same '
+        'rows, and an interrupted run continues where it stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument('--users', type=int, default=50000, help='Users to create (default: 50000)')
+        parser.add_argument('--artisans', type=int, default=5000, help='How many of the users are artisans (default: 5000)')
+        parser.add_argument('--products', type=int, default=200000, help='Products to create (default: 200000)')
+        parser.add_argument('--approved', type=float, default=0.8, help='Share of approved products (default: 0.8)')
+        parser.add_argument('--orders', type=int, default=500000, help='Orders to create (default: 500000)')
+        parser.add_argument('--max-items', type=int, default=5, help='Most cart items per order (default: 5)')
+        parser.add_argument('--cart-items', type=int, default=100000, help='Open cart items to create (default: 100000)')
+        parser.add_argument('--days', type=int, default=365, help='Days of history to spread rows over (default: 365)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows per transaction (default: 50000)')
+        parser.add_argument('--password', default='password', help="Password for every generated user (default: 'password')")
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if not 0 <= options['artisans'] <= options['users']:
+            raise CommandError('--artisans must be between 0 and --users.')
+        if options['products'] and not options['artisans']:
+            raise CommandError('Products need at least one artisan.')
+        if (options['orders'] or options['cart_items']) and options['users'] == options['artisans']:
+            raise CommandError('Orders and carts need at least one customer (--users greater than --artisans).')
+        if not 0 <= options['approved'] <= 1:
+            raise CommandError('--approved must be between 0 and 1.')
+        if options['max_items'] < 1 or options['days'] < 1:
+            raise CommandError('--max-items and --days must be at least 1.')
+
+        # Generated usernames carry the seed, so datasets from different seeds
+        # can share a database and resume counts never mix them up.
+        self.tag = f'gen{options["seed"]}_'
+        self.span = options['days'] * 86400
+        self.inserted = 0
+        self.index_seconds = 0.0
+        self._timestamp = self._timestamp_adapter()
+        started = time.perf_counter()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                # Index pages of the large tables stay in memory between batches.
+                cursor.execute('PRAGMA cache_size = -262144')
+
+        self._restore_indexes(Product, Order, CartItem)
+        self._generate_users()
+        self._generate_products()
+        inserted = self.inserted
+        self._generate_orders()
+        orders_loaded = self.inserted > inserted
+        self._generate_cart_items()
+
+        if self.inserted:
+            catalog.bump_catalog_version()
+        elapsed = time.perf_counter() - started - self.index_seconds
+        rate = f'{self.inserted / elapsed:,.0f}' if elapsed > 0 else '-'
+        self.stdout.write(self.style.SUCCESS(
+            f'\nInserted {self.inserted} rows in {elapsed:.2f}s ({rate} rows/s), '
+            f'then built indexes in {self.index_seconds:.2f}s.'
+        ))
+        if orders_loaded:
+            # Orders are written directly, not through place_order, which keeps
+            # the sales rollups up to date.
+            started = time.perf_counter()
+            with transaction.atomic():
+                rows = sales.rebuild()
+            self.stdout.write(f'Rebuilt {rows} sales rollup rows in {time.perf_counter() - started:.2f}s.')
+
+    def _rng(self, kind, block):
+        return random.Random(f'{self.options["seed"]}:{kind}:{block}')
+
+    def _rows(self, kind, start, stop, make_row):
+        """Yield ``make_row(index, rng)`` for ``start <= index < stop``."""
+        for block in range(start // BLOCK_SIZE, (stop + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            rng = self._rng(kind, block)
+            first = block * BLOCK_SIZE
+            for index in range(first, min(first + BLOCK_SIZE, stop)):
+                row = make_row(index, rng)
+                if index >= start:
+                    yield row
+
+    @staticmethod
+    def _timestamp_adapter():
+        """Return a function turning seconds since ``EPOCH`` into a DB value.
+
+        Backends that store datetimes as naive text (SQLite, MySQL) get the
+        string directly: ``adapt_datetimefield_value`` spends most of its time
+        on timezone conversion, which would dominate the generator's CPU time.
+        """
+        adapt = connection.ops.adapt_datetimefield_value
+        naive = EPOCH.astimezone(connection.timezone).replace(tzinfo=None) if connection.timezone else None
+        if naive is None or adapt(EPOCH) != str(naive):
+            return lambda seconds: adapt(EPOCH + timedelta(seconds=seconds))
+        return lambda seconds: str(naive + timedelta(seconds=seconds))
+
+    @staticmethod
+    def _index_statements(models, sql_for, present):
+        """SQL from ``sql_for(index, model, editor)`` for each of the models'
+        ``Meta.indexes`` whose presence in the database equals ``present``.
+
+        The statements are run directly rather than inside ``schema_editor()``,
+        whose exit runs a foreign key check over the whole SQLite database.
+        """
+        editor = connection.schema_editor()
+        statements = []
+        with connection.cursor() as cursor:
+            for model in models:
+                existing = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                statements += [
+                    str(sql_for(index, model, editor))
+                    for index in model._meta.indexes if (index.name in existing) == present
+                ]
+        return statements
+
+    def _restore_indexes(self, *models, rebuild_search=False):
+        """Create any of the models' ``Meta.indexes`` (and the search index)
+        that are missing, e.g. after a run was killed while loading."""
+        started = time.perf_counter()
+        statements = self._index_statements(models, lambda i, m, e: i.create_sql(m, e), present=False)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        if Product in models:
+            search.ensure_index(rebuild=rebuild_search)
+        self.index_seconds += time.perf_counter() - started
+
+    @contextmanager
+    def _deferred_indexes(self, *models):
+        """Drop the models' ``Meta.indexes`` (and the search index) while
+        loading and build them once at the end, which is several times faster
+        than updating them row by row."""
+        statements = self._index_statements(models, lambda i, m, e: i.remove_sql(m, e), present=True)
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        if Product in models:
+            search.drop_index()
+        try:
+            yield
+        finally:
+            self._restore_indexes(*models, rebuild_search=True)
+
+    def _insert(self, model, fields, rows):
+        """Insert value tuples with one ``executemany``, bypassing per-object
+        preparation in ``bulk_create``; values must already be DB-ready."""
+        columns = [model._meta.get_field(name).column for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(c) for c in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        self.inserted += len(rows)
+
+    def _phase(self, label, done, target, insert_batch, models=()):
+        if done >= target:
+            self.stdout.write(f'{label}: {done} already generated')
+            return
+        self.stdout.write(f'{label}: generating {target - done} (resuming at {done})' if done else
+                          f'{label}: generating {target}')
+        started, inserted = time.perf_counter(), self.inserted
+        # Rebuilding indexes only pays off when the load is at least as big as
+        # what the table already holds.
+        defer = models and target - done >= models[0].objects.count()
+        with self._deferred_indexes(*models) if defer else nullcontext():
+            for start in range(done, target, self.options['batch_size']):
+                stop = min(start + self.options['batch_size'], target)
+                with transaction.atomic():
+                    insert_batch(start, stop)
+                if self.options['verbosity'] >= 2:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'  {stop}/{target} ({(self.inserted - inserted) / elapsed:,.0f} rows/s)')
+
+    def _user_ids(self):
+        return list(
+            User.objects.filter(username__startswith=self.tag).order_by('username').values_list('id', flat=True)
+        )
+
+    def _generate_users(self):
+        # A fixed salt keeps the hash, and so the dataset, identical between runs.
+        password = make_password(self.options['password'], salt=f'market{self.tag}salt'.replace('_', ''))
+        artisans = self.options['artisans']
+
+        def make_row(i, rng):
+            joined = self._timestamp(int(self.span * i / max(self.options['users'], 1)))
+            return (f'{self.tag}{i:07d}', f'{self.tag}{i:07d}@example.com', password,
+                    False, False, True, '', '', joined)
+
+        def insert_batch(start, stop):
+            self._insert(User, ['username', 'email', 'password', 'is_superuser', 'is_staff', 'is_active',
+                                'first_name', 'last_name', 'date_joined'],
+                         list(self._rows('user', start, stop, make_row)))
+            ids = User.objects.filter(
+                username__gte=f'{self.tag}{start:07d}', username__lt=f'{self.tag}{stop:07d}',
+            ).order_by('username').values_list('id', flat=True)
+            self._insert(UserProfile, ['user', 'is_artisan'],
+                         [(user_id, start + n < artisans) for n, user_id in enumerate(ids)])
+
+        done = User.objects.filter(username__startswith=self.tag).count()
+        self._phase('Users', done, self.options['users'], insert_batch)
+
+    def _generate_products(self):
+        artisan_ids = self._user_ids()[:self.options['artisans']]
+        total = self.options['products']
+        approved_share = self.options['approved']
+
+        # rng.random() scaled by hand is several times cheaper than choice()
+        # and randrange(), which matters at millions of rows.
+        def make_row(i, rng):
+            r = rng.random
+            name = (f'{ADJECTIVES[int(r() * len(ADJECTIVES))]} {MATERIALS[int(r() * len(MATERIALS))]} '
+                    f'{ITEMS[int(r() * len(ITEMS))]} No. {i + 1}')
+            price = Decimal(rng.choices(PRICES, cum_weights=PRICE_WEIGHTS)[0] + 5 * int(r() * 20))
+            # A few busy workshops list most of the catalog.
+            owner = artisan_ids[int(len(artisan_ids) * r() ** 2)]
+            created = int(self.span * i / total)
+            approved = r() < approved_share
+            approved_at = self._timestamp(created + 3600 + int(r() * 2 * 86400)) if approved else None
+            # No thumbnail yet; fetch_thumbnails makes them.
+            return (name, price, f'https://picsum.photos/seed/{self.tag}{i}/400/400', self._timestamp(created),
+                    owner, approved, approved_at, '')
+
+        def insert_batch(start, stop):
+            self._insert(Product, ['name', 'price', 'img', 'created_at', 'user', 'is_approved', 'approved_at',
+                                   'thumbnail'],
+                         list(self._rows('product', start, stop, make_row)))
+
+        done = Product.objects.filter(user__username__startswith=self.tag).count()
+        self._phase('Products', done, total, insert_batch, [Product])
+
+    @cached_property
+    def _catalog(self):
+        """Approved generated products as ``(id, name, price, img)``, by id."""
+        return list(
+            Product.objects.filter(user__username__startswith=self.tag, is_approved=True)
+            .order_by('id').values_list('id', 'name', 'price', 'img')
+        )
+
+    def _generate_orders(self):
+        if not self.options['orders']:
+            return
+        customer_ids = self._user_ids()[self.options['artisans']:]
+        products = self._catalog
+        if not products:
+            raise CommandError('Orders need approved products; generate some first.')
+        total = self.options['orders']
+        max_items = self.options['max_items']
+
+        def make_row(i, rng):
+            r = rng.random
+            customer = customer_ids[int(r() * len(customer_ids))]
+            placed = int(r() * self.span)
+            # Popular products sell far more often than the long tail.
+            items = [
+                (products[int(len(products) * r() ** 3)], QUANTITIES[int(r() * len(QUANTITIES))])
+                for _ in range(1 + int(r() * max_items))
+            ]
+            return customer, placed, items
+
+        def insert_batch(start, stop):
+            orders = list(self._rows('order', start, stop, make_row))
+            last_id = Order.objects.aggregate(last=Max('id'))['last'] or 0
+            # Not rollup_pending: the rollups are rebuilt once all orders are in.
+            self._insert(Order, ['user', 'total_amount', 'created_at', 'rollup_pending'], [
+                (customer, sum(product[2] * quantity for product, quantity in items), self._timestamp(placed), False)
+                for customer, placed, items in orders
+            ])
+            order_ids = Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+            lines = []
+            for order_id, (customer, placed, items) in zip(order_ids, orders):
+                added = self._timestamp(placed - 600)
+                lines += [
+                    (product_id, name, price, img, quantity, added, customer, True, order_id)
+                    for (product_id, name, price, img), quantity in items
+                ]
+            self._insert(
+                CartItem,
+                ['product', 'product_name', 'product_price', 'product_img', 'quantity', 'created_at',
+                 'user', 'ordered', 'order'],
+                lines,
+            )
+
+        done = Order.objects.filter(user__username__startswith=self.tag).count()
+        self._phase('Orders', done, total, insert_batch, [Order, CartItem])
+
+    def _generate_cart_items(self):
+        if not self.options['cart_items']:
+            return
+        customer_ids = self._user_ids()[self.options['artisans']:]
+        products = self._catalog
+        if not products:
+            raise CommandError('Carts need approved products; generate some first.')
+        total = self.options['cart_items']
+        if total > len(customer_ids) * len(products):
+            raise CommandError('--cart-items exceeds one line per customer and product.')
+
+        # Line i goes to customer i % customers; a stride coprime with the
+        # catalog size keeps every customer's products distinct, as the open
+        # cart constraint requires.
+        stride = 7919
+        while gcd(stride, len(products)) != 1:
+            stride += 1
+
+        def make_row(i, rng):
+            slot, customer = divmod(i, len(customer_ids))
+            product_id, name, price, img = products[(customer * 104729 + slot * stride) % len(products)]
+            return (product_id, name, price, img, QUANTITIES[int(rng.random() * len(QUANTITIES))],
+                    self._timestamp(self.span - int(rng.random() * 14 * 86400)),
+                    customer_ids[customer], False)
+
+        def insert_batch(start, stop):
+            self._insert(
+                CartItem,
+                ['product', 'product_name', 'product_price', 'product_img', 'quantity', 'created_at',
+                 'user', 'ordered'],
+                list(self._rows('cart', start, stop, make_row)),
+            )
+
+        done = CartItem.objects.filter(user__username__startswith=self.tag, order__isnull=True).count()
+        self._phase('Cart items', done, total, insert_batch, [CartItem])
@@ -0,0 +1,169 @@
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils import timezone
+
+from market import catalog
+from market.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Import products from a CSV or JSONL file (or stdin). Rows need name, '
+        'price and img; names that already exist are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' to read from stdin")
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help='Input format (default: guessed from the file extension, csv for stdin)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per transaction (default: 1000)')
+        parser.add_argument('--owner', help='Username to record as the owner of the imported products')
+        parser.add_argument('--approve', action='store_true', help='Publish imported products immediately')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(username=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['owner']}' does not exist.")
+
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        approved_at = timezone.now() if options['approve'] else None
+
+        self.validate_url = URLValidator()
+        created = skipped = invalid = 0
+        started = time.perf_counter()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            rows = self._read(stream, fmt)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+
+                products = {}
+                for line_no, row in batch:
+                    try:
+                        name, price, img = self._validate(row)
+                    except ValueError as e:
+                        invalid += 1
+                        self.stderr.write(f'Line {line_no}: {e}')
+                        continue
+                    if name in products:
+                        skipped += 1
+                        continue
+                    products[name] = Product(
+                        name=name,
+                        price=price,
+                        img=img,
+                        user=owner,
+                        is_approved=approved_at is not None,
+                        approved_at=approved_at,
+                    )
+
+                with transaction.atomic():
+                    existing = set(
+                        Product.objects.filter(name__in=list(products)).values_list('name', flat=True)
+                    )
+                    new = [p for name, p in products.items() if name not in existing]
+                    Product.objects.bulk_create(new, batch_size=batch_size)
+
+                created += len(new)
+                skipped += len(existing)
+                if options['verbosity'] >= 2:
+                    read = created + skipped + invalid
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'{read} rows read, {created} created ({self._rate(read, elapsed)} rows/s)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Also when a later batch failed: the earlier ones are committed.
+            # Pending imports change their owner's overlay too.
+            if created:
+                catalog.bump_catalog_version(owner.id if owner is not None else None)
+
+        elapsed = time.perf_counter() - started
+        total = created + skipped + invalid
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nImported {created} new products from {total} rows in {elapsed:.2f}s '
+                f'({self._rate(total, elapsed)} rows/s); '
+                f'{skipped} duplicates skipped, {invalid} invalid rows.'
+            )
+        )
+
+    def _read(self, stream, fmt):
+        """Yield ``(line_no, row)`` pairs without loading the whole input."""
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                row = e
+            yield line_no, row
+
+    def _validate(self, row):
+        if isinstance(row, Exception):
+            raise ValueError(f'invalid JSON ({row})')
+        if not isinstance(row, dict):
+            raise ValueError('expected an object with name, price and img')
+
+        name = str(row.get('name') or '').strip()
+        img = str(row.get('img') or '').strip()
+        if not name or row.get('price') in (None, '') or not img:
+            raise ValueError('name, price and img are required')
+        if len(name) > Product._meta.get_field('name').max_length:
+            raise ValueError('name is too long')
+
+        try:
+            price = Decimal(str(row['price']))
+        except InvalidOperation:
+            raise ValueError(f"invalid price {row['price']!r}")
+        if not price.is_finite() or price <= 0:
+            raise ValueError('price must be greater than zero')
+        field = Product._meta.get_field('price')
+        try:
+            price = price.quantize(Decimal(1).scaleb(-field.decimal_places))
+        except InvalidOperation:
+            # More digits than the context precision, such as 1e30.
+            raise ValueError('price is too large')
+        if price.adjusted() >= field.max_digits - field.decimal_places:
+            raise ValueError('price is too large')
+
+        if len(img) > Product._meta.get_field('img').max_length:
+            raise ValueError('img is too long')
+        try:
+            self.validate_url(img)
+        except ValidationError:
+            raise ValueError(f'invalid image URL {img!r}')
+        return name, price, img
+
+    @staticmethod
+    def _rate(rows, elapsed):
+        return f'{rows / elapsed:,.0f}' if elapsed > 0 else '-'
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from market.models import Product
+from market.search import ensure_index, is_available
+
+
+class Command(BaseCommand):
+    help = 'Recreate the product full-text search index and its sync triggers'
+
+    def handle(self, *args, **options):
+        if not is_available(connection):
+            raise CommandError('Full-text search needs the SQLite database backend.')
+        ensure_index(connection, rebuild=True)
+        self.stdout.write(
+            self.style.SUCCESS(f'Search index rebuilt for {Product.objects.count()} products.')
+        )
@@ -0,0 +1,88 @@
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from market import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (thumbnails, sales rollups) on a pool of threads '
+        'until stopped with SIGINT or SIGTERM, which lets running jobs finish.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Jobs run at once (default: JOBS_WORKERS)',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=None,
+            help='Seconds between looks for due jobs when idle (default: JOBS_POLL_INTERVAL)',
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+        parser.add_argument(
+            '--retry-failed', nargs='?', const='', metavar='TASK',
+            help='Queue failed jobs (of TASK, a dotted path) again and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed'] is not None:
+            count = jobs.retry_failed(options['retry_failed'] or None)
+            self.stdout.write(self.style.SUCCESS(f'Queued {count} failed jobs again.'))
+            return
+
+        workers = options['workers'] or getattr(settings, 'JOBS_WORKERS', 4)
+        poll_interval = options['poll_interval'] or getattr(settings, 'JOBS_POLL_INTERVAL', 1.0)
+        if workers < 1:
+            raise CommandError('--workers must be at least 1.')
+
+        if isinstance(caches['default'], LocMemCache):
+            # Jobs bump the catalog version (market.catalog) in this process's
+            # cache, which the web processes never read.
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process, so web processes keep serving catalog pages '
+                'from before the changes jobs make for up to CATALOG_CACHE_TIMEOUT. Point '
+                'DJANGO_CACHE_BACKEND at a shared cache, or run jobs with JOBS_EAGER=True.'
+            ))
+
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+
+        worker = jobs.worker_name()
+        self.stdout.write(f'{worker} running jobs on {workers} threads.')
+        started = time.perf_counter()
+        done = failed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs') as executor:
+            while not stopping.is_set():
+                # One claim fills every idle thread; nothing waits in the
+                # executor holding a lease.
+                claimed = jobs.claim(worker, workers - len(running)) if len(running) < workers else []
+                running |= {executor.submit(jobs.run, job) for job in claimed}
+                if not running and options['once']:
+                    break
+                if claimed and len(running) < workers:
+                    continue
+                finished, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                if not finished and not running:
+                    stopping.wait(poll_interval)
+                for future in finished:
+                    done += 1
+                    failed += not future.result()
+            if running:
+                self.stdout.write(f'Waiting for {len(running)} running jobs.')
+            for future in wait(running).done:
+                done += 1
+                failed += not future.result()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {done} jobs, {failed} failed, in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from market import routers
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database, schema included, into every replica in '
+        'settings.DATABASE_REPLICAS. Run once to create the replicas, or with '
+        '--interval to keep them in sync.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Seconds between copies; 0 copies once and exits (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        aliases = routers.replicas()
+        if not aliases:
+            raise CommandError('No replicas are configured; set DATABASE_REPLICA_FILES.')
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f"'{alias}' is not SQLite; replicas of other databases are kept in sync by the server."
+                )
+
+        source = connections[DEFAULT_DB_ALIAS]
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                source.ensure_connection()
+                target = connections[alias]
+                target.ensure_connection()
+                # The backup API copies a consistent snapshot page by page;
+                # readers of the replica see either the old or the new copy.
+                source.connection.backup(target.connection)
+                if options['interval'] == 0 or options['verbosity'] >= 2:
+                    self.stdout.write(
+                        f'Copied {DEFAULT_DB_ALIAS} to {alias} in {(time.perf_counter() - started) * 1000:.0f}ms'
+                    )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
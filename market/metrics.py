@@ -0,0 +1,111 @@
+"""In-process request metrics, exposed in the Prometheus text format.
+
+Each worker process keeps its own counters; Prometheus sums them when every
+worker is scraped. Nothing here touches the database.
+"""
+import threading
+from collections import defaultdict
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _EndpointStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'db_duration')
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_duration = 0.0
+
+
+_lock = threading.Lock()
+_stats = defaultdict(_EndpointStats)
+
+
+def observe(endpoint, method, duration, queries, db_duration):
+    """Record one request; durations are in seconds."""
+    with _lock:
+        stats = _stats[(endpoint, method)]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                stats.buckets[i] += 1
+        stats.count += 1
+        stats.duration += duration
+        stats.queries += queries
+        stats.db_duration += db_duration
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def _labels(endpoint, method, **extra):
+    return _format_labels([('endpoint', endpoint), ('method', method), *extra.items()])
+
+
+def _format_labels(pairs):
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+
+
+def render_prometheus():
+    """Return all metrics in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = sorted(
+            (key, list(s.buckets), s.count, s.duration, s.queries, s.db_duration)
+            for key, s in _stats.items()
+        )
+
+    lines = [
+        '# HELP market_request_duration_seconds Wall time of market requests.',
+        '# TYPE market_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), buckets, count, duration, _, _ in snapshot:
+        for bound, n in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f'market_request_duration_seconds_bucket{{{_labels(endpoint, method, le=bound)}}} {n}')
+        lines.append(f'market_request_duration_seconds_bucket{{{_labels(endpoint, method, le="+Inf")}}} {count}')
+        lines.append(f'market_request_duration_seconds_sum{{{_labels(endpoint, method)}}} {duration:.6f}')
+        lines.append(f'market_request_duration_seconds_count{{{_labels(endpoint, method)}}} {count}')
+
+    lines += [
+        '# HELP market_request_queries_total ORM queries issued while serving requests.',
+        '# TYPE market_request_queries_total counter',
+    ]
+    for (endpoint, method), _, _, _, queries, _ in snapshot:
+        lines.append(f'market_request_queries_total{{{_labels(endpoint, method)}}} {queries}')
+
+    lines += [
+        '# HELP market_request_db_seconds_total Time spent in SQL while serving requests.',
+        '# TYPE market_request_db_seconds_total counter',
+    ]
+    for (endpoint, method), _, _, _, _, db_duration in snapshot:
+        lines.append(f'market_request_db_seconds_total{{{_labels(endpoint, method)}}} {db_duration:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+def render_jobs(stats, now):
+    """Background job gauges from ``market.jobs.queue_stats()``, in the same format.
+
+    ``market_jobs_lag_seconds`` is how long the oldest due job of each task
+    has waited for a worker; jobs held by a worker or waiting to be retried
+    are not due yet.
+    """
+    stats = sorted(stats.items())
+    lines = [
+        '# HELP market_jobs Background jobs in the queue, by task and status.',
+        '# TYPE market_jobs gauge',
+    ]
+    for (task, status), (jobs, _) in stats:
+        lines.append(f'market_jobs{{{_format_labels([("task", task), ("status", status)])}}} {jobs}')
+    lines += [
+        '# HELP market_jobs_lag_seconds Wait of the oldest due background job.',
+        '# TYPE market_jobs_lag_seconds gauge',
+    ]
+    for (task, status), (_, oldest) in stats:
+        if status == 'queued':
+            lag = max((now - oldest).total_seconds(), 0.0)
+            lines.append(f'market_jobs_lag_seconds{{{_format_labels([("task", task)])}}} {lag:.3f}')
+    return '\n'.join(lines) + '\n'
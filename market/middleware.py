@@ -0,0 +1,190 @@
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics, routers
+
+logger = logging.getLogger('market.performance')
+
+
+class _QueryTimer:
+    """``execute_wrapper`` that counts queries and remembers the slowest one."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, None)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slowest[0]:
+                self.slowest = (elapsed, sql)
+
+
+class _SyncAndAsyncMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    Under ASGI a sync-only middleware makes Django run the rest of the chain,
+    async views included, in a worker thread per request. Subclasses implement
+    ``handle`` for sync chains and ``__acall__`` for async ones.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+# The timer of the request being handled. The async ORM runs queries on the
+# connections of sync_to_async worker threads, which get a copy of the
+# request's context, so queries are timed through this rather than through
+# wrappers put on the handling thread's connections.
+_request_timer = contextvars.ContextVar('market_request_timer', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """``connection_created`` receiver: time the connection's queries per request."""
+    # A connection object is reused when it reconnects, so add the wrapper once.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class PerformanceMiddleware(_SyncAndAsyncMiddleware):
+    """Measure every request and report it three ways.
+
+    * a ``Server-Timing`` header with total, SQL and serialization time;
+    * a warning on the ``market.performance`` logger, with the slowest SQL
+      statement, when a request takes longer than ``SLOW_REQUEST_THRESHOLD_MS``;
+    * per-endpoint latency histograms served by ``/api/metrics``.
+
+    Serialization time covers rendering of DRF and template responses, which
+    Django does after the view returns.
+    """
+
+    def handle(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        token = _request_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        return self.report(request, response, timer, started)
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        token = _request_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        return self.report(request, response, timer, started)
+
+    def report(self, request, response, timer, started):
+        duration = time.perf_counter() - started
+
+        render_duration = getattr(request, '_render_duration', 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{timer.count} queries";dur={timer.duration * 1000:.1f}',
+            f'render;dur={render_duration * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match else 'unmatched'
+        metrics.observe(endpoint, request.method, duration, timer.count, timer.duration)
+
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500)
+        if duration * 1000 >= threshold:
+            slowest_duration, slowest_sql = timer.slowest
+            logger.warning(
+                'Slow request %s %s -> %s: %.1fms total, %d queries in %.1fms, render %.1fms; '
+                'slowest SQL (%.1fms): %s',
+                request.method, request.path, response.status_code, duration * 1000,
+                timer.count, timer.duration * 1000, render_duration * 1000,
+                slowest_duration * 1000, (slowest_sql or '-')[:1000],
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def record_render(rendered):
+            request._render_duration = time.perf_counter() - started
+
+        response.add_post_render_callback(record_render)
+        return response
+
+
+class ReplicaRoutingMiddleware(_SyncAndAsyncMiddleware):
+    """Route the request's reads with ``market.routers``.
+
+    Safe requests read from a replica unless the client wrote within the last
+    ``REPLICA_PIN_SECONDS``; a request that writes sets a cookie that pins the
+    client to the primary for that long, so it reads its own writes.
+    """
+
+    cookie_name = 'market_primary'
+
+    def handle(self, request):
+        if not routers.replicas():
+            return self.get_response(request)
+        unsafe, token = self.begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end(token)
+        return self.pin(response, wrote or unsafe)
+
+    async def __acall__(self, request):
+        # The routing context variable is copied into the threads the async
+        # ORM runs queries in, so routing works the same way here.
+        if not routers.replicas():
+            return await self.get_response(request)
+        unsafe, token = self.begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end(token)
+        return self.pin(response, wrote or unsafe)
+
+    def begin(self, request):
+        unsafe = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        return unsafe, routers.begin(pinned=unsafe or self.cookie_name in request.COOKIES)
+
+    def pin(self, response, pinned):
+        if pinned:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
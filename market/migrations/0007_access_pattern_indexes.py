@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0006_product_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(condition=models.Q(('order__isnull', True), ('ordered', False)), fields=['user', '-created_at'], name='cartitem_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartitem',
+            index=models.Index(condition=models.Q(('order__isnull', True), ('ordered', False), ('user__isnull', True)), fields=['session_id', '-created_at'], name='cartitem_guest_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('user__isnull', True)), fields=['session_id', '-created_at'], name='order_guest_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['name', 'id'], name='product_approved_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['user', 'name', 'id'], name='product_pending_idx'),
+        ),
+    ]
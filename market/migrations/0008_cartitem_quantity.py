@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:49
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_cart_rows(apps, schema_editor):
+    """Collapse repeated open-cart rows for the same product into one line.
+
+    The earliest row of each group is kept (with its price snapshot) and
+    takes the summed quantity; the rest are deleted.
+    """
+    CartItem = apps.get_model('market', 'CartItem')
+    open_rows = CartItem.objects.filter(order__isnull=True, product__isnull=False)
+    owners = [
+        (open_rows.filter(user__isnull=False), 'user_id'),
+        (open_rows.filter(user__isnull=True), 'session_id'),
+    ]
+    for rows, owner_field in owners:
+        groups = (
+            rows.values(owner_field, 'product_id')
+            .annotate(lines=Count('id'), keep_id=Min('id'), total_quantity=Sum('quantity'))
+            .filter(lines__gt=1)
+            .order_by()
+        )
+        for group in groups:
+            duplicates = rows.filter(**{owner_field: group[owner_field], 'product_id': group['product_id']})
+            CartItem.objects.filter(id=group['keep_id']).update(quantity=group['total_quantity'])
+            duplicates.exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0007_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(merge_duplicate_cart_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('order__isnull', True)), fields=('user', 'product'), name='cartitem_open_user_product_uniq'),
+        ),
+    ]
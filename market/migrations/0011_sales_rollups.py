@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('market', '0010_catalog_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.IntegerField(default=0)),
+                ('artisan', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='market.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['artisan', 'day'], name='salesday_artisan_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesday',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='salesday_product_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:37
+
+from django.db import migrations, models
+import market.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0013_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cartitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=market.models.keep_ordered_lines, to='market.product'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -18,16 +19,66 @@ class Product(models.Model):
         blank=True,
         related_name='approved_products'
     )
+    # Cache key of the local thumbnail of img, '' until one is made (market.images).
+    thumbnail = models.CharField(max_length=64, blank=True, default='', editable=False)
 
     def __str__(self):
         return self.name
 
     class Meta:
-        ordering = ['name']
+        ordering = ['name', 'id']
+        indexes = [
+            # Keyset pagination in get_products seeks on (name, id).
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            # Public catalog: approved rows walked in (name, id) order. Partial
+            # because SQLite filters booleans as a bare column, not "= 1".
+            models.Index(
+                fields=['name', 'id'],
+                condition=models.Q(is_approved=True),
+                name='product_approved_name_idx',
+            ),
+            # Pending submissions per owner (catalog overlay, moderation queue).
+            models.Index(
+                fields=['user', 'name', 'id'],
+                condition=models.Q(is_approved=False),
+                name='product_pending_idx',
+            ),
+            # One index per catalog sort order (market.catalog.SORTS), for the
+            # public and admin classes and for the owner filter. Descending
+            # sorts walk the same indexes backwards.
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_approved=True),
+                name='product_approved_price_idx',
+            ),
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_approved=True),
+                name='product_approved_created_idx',
+            ),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['user', 'name', 'id'], name='product_owner_name_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='product_owner_price_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='product_owner_created_idx'),
+            # Products whose evicted thumbnail is requested (market.images).
+            models.Index(fields=['thumbnail'], name='product_thumbnail_idx'),
+        ]
+
+
+def keep_ordered_lines(collector, field, sub_objs, using):
+    """``on_delete`` of ``CartItem.product``: open cart lines go with the
+    product, lines of placed orders keep their snapshot without it."""
+    open_lines = sub_objs.filter(ordered=False, order__isnull=True)
+    models.CASCADE(collector, field, open_lines, using)
+    models.SET_NULL(collector, field, sub_objs.exclude(ordered=False, order__isnull=True), using)
+
+
+keep_ordered_lines.lazy_sub_objs = True
 
 
 class CartItem(models.Model):
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    product = models.ForeignKey(Product, on_delete=keep_ordered_lines, null=True, blank=True)
     product_name = models.CharField(max_length=200, blank=True, null=True)
     product_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     product_img = models.URLField(max_length=500, blank=True, null=True)
@@ -36,14 +87,37 @@ class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='cart_items')
     ordered = models.BooleanField(default=False)
     order = models.ForeignKey('Order', on_delete=models.CASCADE, null=True, blank=True, related_name='items')
+    quantity = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         name = self.product_name or (self.product.name if self.product else "Unknown product")
         price = self.product_price or (self.product.price if self.product else 0)
-        return f"{name} - {price}"
+        return f"{name} x{self.quantity} - {price}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Open cart of a signed-in user (get_cart, place_order).
+            models.Index(
+                fields=['user', '-created_at'],
+                condition=models.Q(ordered=False, order__isnull=True),
+                name='cartitem_user_open_idx',
+            ),
+            # Open cart of a guest session.
+            models.Index(
+                fields=['session_id', '-created_at'],
+                condition=models.Q(user__isnull=True, ordered=False, order__isnull=True),
+                name='cartitem_guest_open_idx',
+            ),
+        ]
+        constraints = [
+            # One open cart line per product; add_to_cart increments quantity.
+            models.UniqueConstraint(
+                fields=['user', 'product'],
+                condition=models.Q(order__isnull=True),
+                name='cartitem_open_user_product_uniq',
+            ),
+        ]
 
 
 class UserProfile(models.Model):
@@ -59,14 +133,104 @@ def get_or_create_user_profile(user):
     return profile
 
 
+async def aget_or_create_user_profile(user):
+    profile, _ = await UserProfile.objects.aget_or_create(user=user)
+    return profile
+
+
 class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     session_id = models.CharField(max_length=100, blank=True, null=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='orders')
+    # Placed, but its lines are not in the sales rollups yet (market.sales).
+    rollup_pending = models.BooleanField(default=False)
 
     def __str__(self):
         return f"Order #{self.id} - ₹{self.total_amount}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history, newest first (get_orders).
+            models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+            models.Index(
+                fields=['session_id', '-created_at'],
+                condition=models.Q(user__isnull=True),
+                name='order_guest_recent_idx',
+            ),
+        ]
+
+
+class ProductSalesDay(models.Model):
+    """Sales of one product on one day (a rollup maintained by market.sales)."""
+    # Both foreign keys lead the composite indexes below, which serve their lookups.
+    artisan = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sales_days', db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_days', db_index=False)
+    day = models.DateField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Orders that contained the product that day.
+    orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.units} units, ₹{self.revenue}"
+
+    class Meta:
+        constraints = [
+            # The upsert target of market.sales.
+            models.UniqueConstraint(fields=['product', 'day'], name='salesday_product_day_uniq'),
+        ]
+        indexes = [
+            # Artisan dashboard: one artisan's days in a date window.
+            models.Index(fields=['artisan', 'day'], name='salesday_artisan_day_idx'),
+        ]
+
+
+class Job(models.Model):
+    """A queued call of a background task (market.jobs)."""
+    QUEUED = 'queued'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (FAILED, 'Failed')]
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    # When the job is next due: pushed forward while a worker holds it and
+    # between retries.
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.task}{tuple(self.args)} ({self.status}, {self.attempts} attempts)"
+
+    class Meta:
+        indexes = [
+            # Workers claim the queued jobs that are due, oldest first.
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_due_idx'),
+        ]
+
+
+def open_cart_items(user, session_id=None):
+    """Cart rows not yet attached to an order, for a user or a guest session."""
+    if user is not None and user.is_authenticated:
+        return CartItem.objects.filter(user=user, ordered=False, order__isnull=True)
+    return CartItem.objects.filter(session_id=session_id, user__isnull=True, ordered=False, order__isnull=True)
+
+
+def cart_line_total():
+    """Database expression for a cart line: snapshot price x quantity."""
+    return models.ExpressionWrapper(
+        models.F('quantity') * Coalesce('product_price', 'product__price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def order_history(user, session_id=None):
+    """Orders placed by a user or a guest session, newest first."""
+    if user is not None and user.is_authenticated:
+        return Order.objects.filter(user=user)
+    return Order.objects.filter(session_id=session_id, user__isnull=True)
@@ -0,0 +1,92 @@
+"""Send market reads to a read replica and everything else to the primary.
+
+Replicas are the database aliases listed in ``settings.DATABASE_REPLICAS``.
+Routing is decided per request by ``ReplicaRoutingMiddleware``: safe requests
+read market tables from one replica, chosen once per request, while writes,
+unsafe requests and any request within ``REPLICA_PIN_SECONDS`` of the same
+client's last write stay on the primary so people read their own writes.
+
+Outside a request (management commands, the shell) nothing is routed to a
+replica. Sessions and users are always read from the primary: a replica that
+lags behind a login must not log anyone out.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_APPS = {'market'}
+
+
+class _Routing:
+    __slots__ = ('replica', 'pinned', 'wrote')
+
+    def __init__(self, replica, pinned):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar('market_db_routing', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def begin(pinned):
+    """Start routing for one request; pass the result to ``end``."""
+    aliases = replicas()
+    replica = random.choice(aliases) if aliases else None
+    return _routing.set(_Routing(replica, pinned or replica is None))
+
+
+def end(token):
+    """Stop routing and return whether the request wrote to the primary."""
+    state = _routing.get()
+    _routing.reset(token)
+    return state is not None and state.wrote
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Read from the primary inside the block."""
+    state = _routing.get()
+    if not enabled or state is None or state.pinned:
+        yield
+        return
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = False
+
+
+def reading_from_replica():
+    state = _routing.get()
+    return state is not None and not state.pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.pinned or model._meta.app_label not in REPLICA_APPS:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Later reads in this request must see the write.
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema along with their data (see sync_replicas).
+        return db not in replicas()
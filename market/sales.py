@@ -0,0 +1,113 @@
+"""Per-artisan sales rollups: units, revenue and orders per product and day.
+
+``ProductSalesDay`` holds one row per product and day with sales, so the
+artisan dashboard never groups order history. ``place_order`` marks the
+order ``rollup_pending`` and queues ``record_pending``, a background job
+(``market.jobs``) that adds its lines, so checkout does not wait for the
+rollups; dashboards catch up within seconds. ``delete_order`` takes the lines
+out again (``forget_order``), or just clears the mark if they were never
+added. Each is a single set-based upsert, whatever the size of the cart.
+Deleting a product cascades to its rollup rows; its order lines stay, with
+their snapshots and no product, and are left out of the rollups.
+
+Orders changed behind the API's back (bulk loads, the admin, deleting a
+customer) are picked up by ``manage.py rebuild_sales_rollups``.
+"""
+from django.db import connections, router
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import jobs
+from .models import CartItem, Order, ProductSalesDay, cart_line_total
+
+_COLUMNS = ('artisan_id', 'product_id', 'day', 'units', 'revenue', 'orders')
+
+
+def rollup_rows(lines, sign=1):
+    """Group ordered ``lines`` into rows in ``_COLUMNS`` order, scaled by ``sign``."""
+    return (
+        lines.filter(order__isnull=False, product__user__isnull=False)
+        .values('product__user', 'product', day=TruncDate('order__created_at'))
+        .annotate(
+            units=Sum('quantity') * sign,
+            revenue=Sum(cart_line_total()) * sign,
+            orders=Count('order', distinct=True) * sign,
+        )
+        .order_by()
+    )
+
+
+def _upsert(rows):
+    """Add ``rows`` to the rollups with one INSERT ... SELECT ... ON CONFLICT."""
+    using = router.db_for_write(ProductSalesDay)
+    connection = connections[using]
+    select_sql, params = rows.query.get_compiler(using).as_sql()
+    qn = connection.ops.quote_name
+    table = qn(ProductSalesDay._meta.db_table)
+    increments = ', '.join(f'{qn(c)} = {table}.{qn(c)} + excluded.{qn(c)}' for c in ('units', 'revenue', 'orders'))
+    # The WHERE clause of the SELECT keeps SQLite from reading ON CONFLICT as
+    # a join constraint.
+    sql = (
+        f'INSERT INTO {table} ({", ".join(qn(c) for c in _COLUMNS)}) {select_sql} '
+        f'ON CONFLICT ({qn("product_id")}, {qn("day")}) DO UPDATE SET {increments}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def record_order(order):
+    """Add the lines of ``order`` to the rollups."""
+    _upsert(rollup_rows(CartItem.objects.filter(order=order)))
+
+
+def queue_order(order):
+    """Queue adding the lines of ``order``, placed with ``rollup_pending``."""
+    jobs.enqueue(record_pending, order.pk)
+
+
+@jobs.task(atomic=True)
+def record_pending(order_id):
+    """Add the lines of ``order_id`` unless that was done or it was deleted."""
+    if Order.objects.filter(pk=order_id, rollup_pending=True).update(rollup_pending=False):
+        record_order(Order(pk=order_id))
+
+
+def forget_order(order):
+    """Take the lines of ``order`` out again; call before deleting it, in one transaction."""
+    # The mark is only ever cleared, so an order loaded without it was added.
+    if order.rollup_pending and Order.objects.filter(pk=order.pk, rollup_pending=True).update(rollup_pending=False):
+        return
+    lines = CartItem.objects.filter(order=order)
+    _upsert(rollup_rows(lines, sign=-1))
+    ProductSalesDay.objects.filter(
+        product__in=lines.values('product'), day=timezone.localdate(order.created_at), orders__lte=0,
+    ).delete()
+
+
+def rebuild(artisan_id=None):
+    """Recompute the rollups from order history; returns the number of rows.
+
+    Orders still ``rollup_pending`` are left to their jobs.
+    """
+    lines = CartItem.objects.filter(order__rollup_pending=False)
+    existing = ProductSalesDay.objects.all()
+    if artisan_id is not None:
+        lines = lines.filter(product__user_id=artisan_id)
+        existing = existing.filter(artisan_id=artisan_id)
+    existing.delete()
+    _upsert(rollup_rows(lines))
+    return existing.count()
+
+
+def dashboard_rows(artisan_id, start, end):
+    """Daily totals and per-product totals of ``artisan_id`` from ``start`` to ``end``."""
+    window = ProductSalesDay.objects.filter(artisan_id=artisan_id, day__range=(start, end))
+    days = window.values('day').annotate(units=Sum('units'), revenue=Sum('revenue')).order_by('day')
+    products = (
+        window.values('product_id', name=F('product__name'))
+        .annotate(units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders'))
+        .order_by('-revenue', 'product_id')
+    )
+    return days, products
@@ -0,0 +1,120 @@
+"""Full-text product search backed by an SQLite FTS5 index.
+
+``market_product_fts`` is an external-content FTS5 table over
+``market_product.name`` using the trigram tokenizer, so any three-character
+fragment ("terr", "cotta") matches. Triggers on ``market_product`` keep it in
+sync, which also covers ``bulk_create`` and queryset ``update``/``delete``.
+
+Django rebuilds an SQLite table (dropping its triggers) for some schema
+changes, so ``ensure_index`` runs after every ``migrate`` and reinstalls and
+rebuilds anything that is missing.
+"""
+from django.db import connection, connections, router
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'market_product_fts'
+
+# The trigram tokenizer cannot match fragments shorter than this.
+MIN_TERM_LENGTH = 3
+
+# (object name, object type, CREATE statement)
+_SCHEMA = [
+    (
+        FTS_TABLE, 'TABLE',
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"name, content='market_product', content_rowid='id', tokenize='trigram')",
+    ),
+    (
+        f'{FTS_TABLE}_ai', 'TRIGGER',
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON market_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    ),
+    (
+        f'{FTS_TABLE}_ad', 'TRIGGER',
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON market_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END",
+    ),
+    (
+        f'{FTS_TABLE}_au', 'TRIGGER',
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF name ON market_product BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END",
+    ),
+]
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def ensure_index(using=connection, rebuild=False):
+    """Create the FTS table and triggers if missing; rebuild when anything was.
+
+    Returns ``True`` when the index was rebuilt.
+    """
+    if not is_available(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if 'market_product' not in existing:
+            return False
+        missing = [sql for name, _, sql in _SCHEMA if name not in existing]
+        for sql in missing:
+            cursor.execute(sql)
+        if missing or rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            return True
+    return False
+
+
+def drop_index(using=connection):
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for name, kind, _ in reversed(_SCHEMA):
+            cursor.execute(f'DROP {kind} IF EXISTS {name}')
+
+
+def _match_expression(query):
+    """Turn free text into an FTS5 expression: every term must appear."""
+    terms = [t for t in query.split() if len(t) >= MIN_TERM_LENGTH]
+    return ' AND '.join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+def search_product_ids(query, limit, user=None, include_all=False):
+    """Return ids of products matching ``query``, best match first.
+
+    Visibility follows ``get_products``: approved products, plus the user's
+    own pending ones when ``user`` is given, or everything for ``include_all``.
+    Terms shorter than the trigram length fall back to a name prefix match.
+    """
+    expression = _match_expression(query)
+    using = connections[router.db_for_read(Product)]
+    if not is_available(using) or not expression:
+        products = Product.objects.filter(name__istartswith=query.strip())
+        if user is not None and not include_all:
+            products = products.filter(Q(is_approved=True) | Q(user=user))
+        elif not include_all:
+            products = products.filter(is_approved=True)
+        return list(products.order_by('name', 'id').values_list('id', flat=True)[:limit])
+
+    if include_all:
+        visible, visible_params = '', []
+    elif user is not None:
+        visible, visible_params = ' AND (p.is_approved OR p.user_id = %s)', [user.id]
+    else:
+        visible, visible_params = ' AND p.is_approved', []
+
+    # Names that start with the query first, then by bm25 relevance.
+    sql = (
+        f'SELECT p.id FROM {FTS_TABLE} JOIN market_product p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s{visible} '
+        f'ORDER BY p.name LIKE %s DESC, bm25({FTS_TABLE}), p.name, p.id LIMIT %s'
+    )
+    prefix = query.strip().replace('%', '').replace('_', '') + '%'
+    with using.cursor() as cursor:
+        cursor.execute(sql, [expression, *visible_params, prefix, limit])
+        return [row[0] for row in cursor.fetchall()]
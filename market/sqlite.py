@@ -0,0 +1,50 @@
+"""SQLite tuning for several worker processes sharing one database file.
+
+``configure_connection`` runs on ``connection_created`` and applies
+``settings.SQLITE_PRAGMAS`` to every new SQLite connection. ``begin`` starts a
+transaction for ``market.backends.sqlite3``: with ``BEGIN IMMEDIATE`` a
+transaction takes the write lock up front, so two writers can no longer both
+read and then deadlock on upgrading to a write, the cause of "database is
+locked" errors under concurrent checkouts. Lock waits beyond ``busy_timeout``
+are retried a bounded number of times with jittered exponential backoff.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_lock_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def begin(connection, mode, retries=0, backoff=0.05):
+    """Run ``BEGIN <mode>`` on ``connection``, retrying while it is locked."""
+    if mode not in TRANSACTION_MODES:
+        raise ImproperlyConfigured(
+            f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {mode!r}."
+        )
+    for attempt in range(retries + 1):
+        try:
+            connection.cursor().execute(f'BEGIN {mode}')
+            return
+        except OperationalError as e:
+            if attempt == retries or not is_lock_error(e):
+                raise
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+
+class SessionBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('potter', password='pw')
+
+    def _check_auth(self):
+        return self.client.get('/api/auth/check/').json()
+
+    def test_session_from_model_backend_still_resolves(self):
+        # Sessions created before CachedModelBackend name ModelBackend.
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        body = self._check_auth()
+        self.assertTrue(body['authenticated'])
+        self.assertEqual(body['username'], 'potter')
+
+    def test_login_uses_cached_backend(self):
+        self.assertTrue(self.client.login(username='potter', password='pw'))
+        self.assertEqual(self.client.session['_auth_user_backend'], 'market.accounts.CachedModelBackend')
+        self.assertTrue(self._check_auth()['authenticated'])
+
+    def test_register_logs_in(self):
+        response = self.client.post('/register/', {
+            'username': 'weaver', 'email': 'weaver@example.com', 'password': 'pw', 'password2': 'pw',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._check_auth()['username'], 'weaver')
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import include, path
+
+from market import async_views
+from market.models import CartItem, Order, Product, UserProfile
+
+# The sync views under /api/, as urls.py routes them by default, and their
+# async variants under /async/.
+urlpatterns = [
+    path('api/', include('market.urls')),
+    path('async/products/', async_views.get_products),
+    path('async/cart/', async_views.get_cart),
+    path('async/orders/', async_views.get_orders),
+    path('async/bootstrap/', async_views.bootstrap),
+    path('async/auth/check/', async_views.check_auth),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, FAST_JSON_ENDPOINTS=set())
+class AsyncReadViewTests(TestCase):
+    """The async read views answer exactly like their sync counterparts."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        UserProfile.objects.create(user=self.artisan, is_artisan=True)
+        for name, price, approved in [('bowl', '10.50', True), ('jug', '99.99', False), ('mug', '4.00', True)]:
+            Product.objects.create(name=name, price=Decimal(price), img='https://example.com/p.jpg',
+                                   user=self.artisan, is_approved=approved)
+        bowl = Product.objects.get(name='bowl')
+        order = Order.objects.create(total_amount=Decimal('10.50'), user=self.artisan)
+        for order_or_none in (order, None):
+            CartItem.objects.create(product=bowl, product_name='bowl', product_price=bowl.price,
+                                    product_img=bowl.img, user=self.artisan, order=order_or_none,
+                                    ordered=order_or_none is not None)
+
+    async def _get(self, path):
+        sync = await sync_to_async(self.client.get)(f'/api/{path}')
+        asynchronous = await self.async_client.get(f'/async/{path}')
+        self.assertEqual(asynchronous.status_code, sync.status_code)
+        self.assertEqual(asynchronous['Content-Type'], sync['Content-Type'])
+        self.assertEqual(asynchronous.content, sync.content)
+        return sync, asynchronous
+
+    def _login(self, user):
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+
+    async def test_same_bodies_anonymous(self):
+        for path in ('products/?sort=price&limit=1', 'cart/', 'orders/', 'bootstrap/', 'auth/check/'):
+            with self.subTest(path=path):
+                await self._get(path)
+
+    async def test_same_bodies_signed_in(self):
+        await sync_to_async(self._login)(self.artisan)
+        for path in ('products/', 'cart/', 'orders/', 'bootstrap/', 'auth/check/'):
+            with self.subTest(path=path):
+                await self._get(path)
+        body = (await self._get('products/'))[0].json()
+        self.assertEqual([row['name'] for row in body['results']], ['bowl', 'jug', 'mug'])
+
+    async def test_same_etag_and_not_modified(self):
+        sync, asynchronous = await self._get('products/')
+        self.assertEqual(asynchronous['ETag'], sync['ETag'])
+        response = await self.async_client.get('/async/products/', headers={'If-None-Match': sync['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_bad_parameters(self):
+        await self._get('products/?sort=colour')
+        await self._get('bootstrap/?limit=0')
+
+    async def test_rejects_other_methods(self):
+        response = await self.async_client.post('/async/products/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, HEAD')
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from market.models import CartItem, Order, Product
+
+
+@override_settings(FAST_JSON_ENDPOINTS=set())
+class AddToCartTests(TestCase):
+    """One open line per product, its quantity bumped in place."""
+
+    def setUp(self):
+        cache.clear()
+        artisan = User.objects.create_user('potter', password='pw')
+        self.shopper = User.objects.create_user('buyer', password='pw')
+        self.bowl = Product.objects.create(name='bowl', price=Decimal('10.50'), img='https://example.com/p.jpg',
+                                           user=artisan, is_approved=True)
+        self.client.force_login(self.shopper)
+
+    def _add(self, product):
+        return self.client.post('/api/cart/add/', {'product_id': product.id}, content_type='application/json')
+
+    def test_repeated_adds_share_one_line(self):
+        first = self._add(self.bowl).json()
+        second = self._add(self.bowl).json()
+
+        self.assertEqual(first['cart_item_id'], second['cart_item_id'])
+        self.assertEqual((first['quantity'], second['quantity']), (1, 2))
+        cart = self.client.get('/api/cart/').json()
+        self.assertEqual([(item['name'], item['quantity'], item['line_total']) for item in cart['items']],
+                         [('bowl', 2, 21.0)])
+        self.assertEqual(cart['total'], 21.0)
+
+    def test_ordered_line_starts_a_new_one(self):
+        self._add(self.bowl)
+        self.client.post('/api/order/place/', {}, content_type='application/json')
+
+        response = self._add(self.bowl).json()
+
+        self.assertEqual(response['quantity'], 1)
+        self.assertEqual(CartItem.objects.filter(order__isnull=True).get().id, response['cart_item_id'])
+        self.assertEqual(Order.objects.get().items.get().quantity, 1)
+
+    def test_other_users_have_their_own_lines(self):
+        self._add(self.bowl)
+        self.client.force_login(User.objects.create_user('other', password='pw'))
+        self.assertEqual(self._add(self.bowl).json()['quantity'], 1)
+        self.assertEqual(CartItem.objects.count(), 2)
+
+    def test_pending_product_is_refused(self):
+        self.bowl.is_approved = False
+        self.bowl.save()
+        self.assertEqual(self._add(self.bowl).status_code, 403)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_guest_must_sign_in(self):
+        self.client.logout()
+        self.assertEqual(self._add(self.bowl).status_code, 401)
+
+    def test_remove_deletes_the_line(self):
+        line = self._add(self.bowl).json()['cart_item_id']
+        self._add(self.bowl)
+        self.assertEqual(self.client.delete(f'/api/cart/remove/{line}/').status_code, 200)
+        self.assertEqual(self.client.get('/api/cart/').json(), {'items': [], 'total': 0.0})
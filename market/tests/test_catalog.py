@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from market.models import Product
+
+
+@override_settings(FAST_JSON_ENDPOINTS=set())
+class OwnerOverlayPagingTests(TestCase):
+    """An owner's pending products merged into price-sorted catalog pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        other = User.objects.create_user('weaver', password='pw')
+        # float(99.99) sorts below Decimal('99.99'), so rows at that price
+        # sit right at the cursor of the page before.
+        for name, price, owner, approved in [
+            ('bowl', '10.50', other, True),
+            ('vase', '99.99', other, True),
+            ('jug', '99.99', self.artisan, False),
+            ('mug', '99.99', other, True),
+            ('plate', '120.00', self.artisan, False),
+            ('tray', '150.25', other, True),
+        ]:
+            Product.objects.create(name=name, price=Decimal(price), img='https://example.com/p.jpg',
+                                   user=owner, is_approved=approved)
+        self.client.force_login(self.artisan)
+
+    def _walk(self, sort):
+        names, cursor = [], None
+        for _ in range(20):
+            params = {'sort': sort, 'limit': 1}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/products/', params).json()
+            names += [row['name'] for row in body['results']]
+            cursor = body['next']
+            if cursor is None:
+                return names
+        self.fail(f'sort={sort} did not finish paging: {names}')
+
+    def test_ascending_price_keeps_pending_rows(self):
+        expected = [p.name for p in Product.objects.order_by('price', 'id')]
+        self.assertEqual(self._walk('price'), expected)
+
+    def test_descending_price_ends(self):
+        expected = [p.name for p in Product.objects.order_by('-price', '-id')]
+        self.assertEqual(self._walk('-price'), expected)
+
+
+@override_settings(FAST_JSON_ENDPOINTS=set())
+class CatalogInvalidationTests(TestCase):
+    """Product writes outside the API views still invalidate cached pages."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bowl = Product.objects.create(name='bowl', price=Decimal('10.50'), img='https://example.com/p.jpg',
+                                               user=self.artisan, is_approved=True)
+
+    def _names(self):
+        return [row['name'] for row in self.client.get('/api/products/').json()['results']]
+
+    def test_saved_product_invalidates(self):
+        self.assertEqual(self._names(), ['bowl'])
+        self.bowl.name = 'basin'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bowl.save()
+        self.assertEqual(self._names(), ['basin'])
+
+    def test_deleting_owner_invalidates(self):
+        self.assertEqual(self._names(), ['bowl'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.artisan.delete()
+        self.assertEqual(self._names(), [])
+
+    def test_approval_invalidates_owner_overlay(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jug = Product.objects.create(name='jug', price=Decimal('5.00'), img='https://example.com/p.jpg',
+                                         user=self.artisan, is_approved=False)
+        self.client.force_login(self.artisan)
+        self.assertEqual(self._names(), ['bowl', 'jug'])
+        jug.is_approved = True
+        with self.captureOnCommitCallbacks(execute=True):
+            jug.save()
+        body = self.client.get('/api/products/').json()['results']
+        self.assertEqual([(row['name'], row['is_approved']) for row in body], [('bowl', True), ('jug', True)])
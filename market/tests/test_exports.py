@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from market.models import Product
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pw', is_staff=True)
+        artisan = User.objects.create_user('-artisan', password='pw')
+        for name in ('=HYPERLINK("https://example.com","x")', '+1', '@SUM(A1)', 'Plain pot'):
+            Product.objects.create(name=name, price=Decimal('12.50'), img='https://example.com/p.jpg', user=artisan)
+        self.client.force_login(self.admin)
+
+    def _export(self, fmt):
+        response = self.client.get('/api/products/export/', {'format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_escapes_formulas(self):
+        rows = list(csv.DictReader(io.StringIO(self._export('csv'))))
+        self.assertEqual(
+            [row['name'] for row in rows],
+            ['\'=HYPERLINK("https://example.com","x")', "'+1", "'@SUM(A1)", 'Plain pot'],
+        )
+        self.assertEqual({row['owner'] for row in rows}, {"'-artisan"})
+        self.assertEqual({row['price'] for row in rows}, {'12.50'})
+
+    def test_ndjson_keeps_values(self):
+        rows = [json.loads(line) for line in self._export('ndjson').splitlines()]
+        self.assertEqual(rows[0]['name'], '=HYPERLINK("https://example.com","x")')
+        self.assertEqual(rows[0]['owner'], '-artisan')
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from market import fastjson
+from market.models import CartItem, Product
+
+FAST_ENDPOINTS = {'get_products', 'get_cart', 'bootstrap'}
+
+
+class CompileEncoderTests(SimpleTestCase):
+    """Compiled encoders emit what JSONRenderer does for the same values."""
+
+    def _check(self, fields, row, expected):
+        encode = fastjson.compile_encoder(fields)
+        self.assertEqual(fastjson.render([encode(row)]), JSONRenderer().render(expected))
+
+    def test_every_kind(self):
+        when = datetime(2024, 5, 1, 12, 30, 15, 120000, tzinfo=dt_timezone.utc)
+        fields = [
+            ('i', 'int'), ('i?', 'int?'), ('s', 'str'), ('s?', 'str?'), ('f', 'float'), ('f0', 'float0'),
+            ('b', 'bool'), ('d', 'datetime'), ('d?', 'datetime?'),
+        ]
+        self._check(
+            fields,
+            (7, None, 'pot "au" \\ lait ', None, Decimal('0.10'), None, True, when, None),
+            {'i': 7, 'i?': None, 's': 'pot "au" \\ lait ', 's?': None, 'f': 0.1, 'f0': 0.0,
+             'b': True, 'd': when.isoformat(), 'd?': None},
+        )
+        self._check(fields[2:3], ('तंदूर 🏺',), {'s': 'तंदूर 🏺'})
+
+    def test_keys_are_escaped(self):
+        self._check([('a"{b}', 'int')], (1,), {'a"{b}': 1})
+
+    def test_open_object(self):
+        encode = fastjson.compile_encoder([('id', 'int')], close=False)
+        self.assertEqual(json.loads(encode((3,)) + ',"owned":true}'), {'id': 3, 'owned': True})
+
+
+class FastPathResponseTests(TestCase):
+    """The fast-path endpoints answer byte for byte like the regular ones."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        admin = User.objects.create_superuser('admin', password='pw')
+        rows = [
+            ('Terracotta "pot"', '0.10', True, 'a1b2c3'),
+            ('Line\u2028separator\u2029', '1234567.89', True, ''),
+            ('मिट्टी का दीया 🪔', '99.99', False, ''),
+            ('Basket', '15.00', True, ''),
+        ]
+        for name, price, approved, thumbnail in rows:
+            Product.objects.create(
+                name=name, price=Decimal(price), img='https://example.com/p.jpg?a=1&b="2"', user=self.artisan,
+                is_approved=approved, thumbnail=thumbnail,
+                approved_at=timezone.now() if approved else None, approved_by=admin if approved else None,
+            )
+        pot, basket = Product.objects.get(name__startswith='Terracotta'), Product.objects.get(name='Basket')
+        CartItem.objects.create(product=pot, product_name=pot.name, product_price=pot.price,
+                                product_img=pot.img, user=self.artisan, quantity=3)
+        # A line from before the snapshot columns, priced from its product.
+        CartItem.objects.create(product=basket, user=self.artisan)
+        CartItem.objects.create(product=basket, product_name='', session_id='guest', quantity=2)
+
+    def _compare(self, path):
+        with self.settings(FAST_JSON_ENDPOINTS=set()):
+            regular = self.client.get(path)
+        with self.settings(FAST_JSON_ENDPOINTS=FAST_ENDPOINTS):
+            fast = self.client.get(path)
+        self.assertEqual(fast.status_code, regular.status_code)
+        self.assertEqual(fast['Content-Type'], regular['Content-Type'])
+        self.assertEqual(fast.content, regular.content)
+        self.assertEqual(fast.get('ETag'), regular.get('ETag'))
+        return fast
+
+    def _compare_all(self):
+        for path in ('/api/products/', '/api/products/?sort=-price&limit=2', '/api/cart/?session_id=guest',
+                     '/api/cart/', '/api/bootstrap/?limit=3&session_id=guest'):
+            with self.subTest(path=path):
+                self._compare(path)
+
+    def test_anonymous(self):
+        self._compare_all()
+
+    def test_owner(self):
+        self.client.force_login(self.artisan)
+        self._compare_all()
+        body = self._compare('/api/products/').json()
+        self.assertTrue(all(row['owned'] for row in body['results']))
+
+    def test_admin(self):
+        self.client.force_login(User.objects.get(username='admin'))
+        self._compare_all()
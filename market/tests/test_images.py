@@ -0,0 +1,60 @@
+import http.server
+import socket
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from market import images
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'image bytes')
+
+    def log_message(self, *args):
+        pass
+
+
+class FetchUrlTests(SimpleTestCase):
+    def setUp(self):
+        _Handler.requests = 0
+        self.server = http.server.HTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://rebind.example:{self.server.server_port}/p.jpg'
+
+    def _resolve(self, address):
+        """Answer lookups of the test host with ``address``, counting them."""
+        real = socket.getaddrinfo
+        self.lookups = 0
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            if host == 'rebind.example':
+                self.lookups += 1
+                host = address
+            return real(host, port, *args, **kwargs)
+        return mock.patch('socket.getaddrinfo', getaddrinfo)
+
+    def test_private_address_is_refused(self):
+        with self._resolve('127.0.0.1'), self.assertRaisesMessage(images.ImageError, 'non-public'):
+            images.fetch_url(self.url)
+        self.assertEqual(_Handler.requests, 0)
+
+    def test_connects_to_the_checked_address(self):
+        # A second lookup is what DNS rebinding answers differently.
+        with self._resolve('127.0.0.1'), mock.patch.object(images, '_check_address') as check:
+            self.assertEqual(images.fetch_url(self.url), b'image bytes')
+        self.assertEqual(self.lookups, 1)
+        check.assert_called_once_with('rebind.example', '127.0.0.1')
+
+    @override_settings(IMAGE_FETCH_ALLOW_PRIVATE=True)
+    def test_private_address_allowed_by_setting(self):
+        with self._resolve('127.0.0.1'):
+            self.assertEqual(images.fetch_url(self.url), b'image bytes')
@@ -0,0 +1,148 @@
+import io
+import signal
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from market import jobs
+from market.models import Job, Order
+
+
+@jobs.task
+def set_total(order_id, amount):
+    Order.objects.filter(pk=order_id).update(total_amount=Decimal(amount))
+
+
+@jobs.task(max_attempts=2)
+def fail(message):
+    raise RuntimeError(message)
+
+
+@jobs.task(atomic=True)
+def set_total_then_lose_lease(order_id, amount):
+    set_total(order_id, amount)
+    # As if another worker had claimed the job in the meantime.
+    Job.objects.update(claimed_by='elsewhere')
+
+
+class EnqueueTests(TestCase):
+    def test_job_commits_with_the_transaction(self):
+        with transaction.atomic():
+            jobs.enqueue(set_total, 1, '2.00')
+            transaction.set_rollback(True)
+        self.assertFalse(Job.objects.exists())
+
+        jobs.enqueue(set_total, 1, '2.00')
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args, job.status), (set_total.task_name, [1, '2.00'], Job.QUEUED))
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_jobs_run_on_commit(self):
+        order = Order.objects.create(total_amount=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue(set_total, order.pk, '3.50')
+            order.refresh_from_db()
+            self.assertEqual(order.total_amount, 0)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('3.50'))
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_takes_due_jobs_once(self):
+        later = Job.objects.create(task=set_total.task_name, args=[1, '1'], run_at=timezone.now() + timedelta(hours=1))
+        first = Job.objects.create(task=set_total.task_name, args=[1, '1'])
+        second = Job.objects.create(task=set_total.task_name, args=[1, '1'])
+
+        claimed = jobs.claim('w1', 5)
+
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        self.assertEqual({job.attempts for job in claimed}, {1})
+        self.assertTrue(all(job.claimed_by.startswith('w1:') for job in claimed))
+        self.assertEqual(jobs.claim('w2', 5), [])
+        later.refresh_from_db()
+        self.assertEqual(later.attempts, 0)
+
+    def test_retry_failed(self):
+        Job.objects.create(task=fail.task_name, args=['x'], status=Job.FAILED, attempts=2)
+        Job.objects.create(task=set_total.task_name, args=[1, '1'], status=Job.FAILED, attempts=5)
+        self.assertEqual(jobs.retry_failed(fail.task_name), 1)
+        self.assertEqual(jobs.retry_failed(), 1)
+        self.assertEqual(list(Job.objects.values_list('status', 'attempts')), [(Job.QUEUED, 0)] * 2)
+
+
+# jobs.run closes the thread's connections, which a TestCase transaction
+# would not survive.
+class RunTests(TransactionTestCase):
+    def _run_one(self):
+        [job] = jobs.claim('w', 1)
+        return jobs.run(job)
+
+    def test_success_deletes_the_job(self):
+        order = Order.objects.create(total_amount=0)
+        jobs.enqueue(set_total, order.pk, '4.00')
+        self.assertTrue(self._run_one())
+        self.assertFalse(Job.objects.exists())
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal('4.00'))
+
+    def test_failures_back_off_then_stop(self):
+        jobs.enqueue(fail, 'boom')
+        with self.assertLogs('market.jobs', 'WARNING'):
+            self.assertFalse(self._run_one())
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.claimed_by), (Job.QUEUED, 1, ''))
+        self.assertEqual(job.last_error, 'RuntimeError: boom')
+        self.assertGreaterEqual(job.run_at, timezone.now() + timedelta(seconds=jobs.RETRY_BASE - 1))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('market.jobs', 'ERROR'):
+            self.assertFalse(self._run_one())
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        self.assertEqual(jobs.claim('w', 1), [])
+
+    def test_unknown_task_fails_for_good(self):
+        Job.objects.create(task='market.tests.test_jobs.missing', args=[])
+        with self.assertLogs('market.jobs', 'ERROR'):
+            self.assertFalse(self._run_one())
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_atomic_task_rolls_back_when_the_lease_is_lost(self):
+        order = Order.objects.create(total_amount=0)
+        jobs.enqueue(set_total_then_lose_lease, order.pk, '5.00')
+        with self.assertLogs('market.jobs', 'WARNING'):
+            self.assertFalse(self._run_one())
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, 0)
+        self.assertTrue(Job.objects.exists())
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    def setUp(self):
+        # run_jobs installs its own SIGINT and SIGTERM handlers.
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+    def _call(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('run_jobs', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_once_runs_due_jobs_and_exits(self):
+        order = Order.objects.create(total_amount=0)
+        jobs.enqueue(set_total, order.pk, '6.00')
+        jobs.enqueue(set_total, order.pk, '6.00')
+        stdout, _ = self._call('--once', '--workers', '2')
+        self.assertIn('Ran 2 jobs, 0 failed', stdout)
+        self.assertFalse(Job.objects.exists())
+
+    def test_warns_about_a_process_local_cache(self):
+        _, stderr = self._call('--once')
+        self.assertIn('The cache is local to this process', stderr)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_other_caches_need_no_warning(self):
+        _, stderr = self._call('--once')
+        self.assertEqual(stderr, '')
@@ -0,0 +1,107 @@
+import re
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from market import async_views, metrics, views
+from market.models import Product
+
+# The read endpoints as urls.py routes them in ASGI mode.
+urlpatterns = [
+    path('api/products/', async_views.get_products, name='get_products'),
+    path('api/cart/', async_views.get_cart, name='get_cart'),
+    path('api/metrics', views.metrics_view, name='metrics'),
+]
+
+
+def _query_count(response):
+    return int(re.search(r'db;desc="(\d+) queries"', response['Server-Timing'])[1])
+
+
+@override_settings(ROOT_URLCONF=__name__, FAST_JSON_ENDPOINTS=set())
+class AsyncQueryTimingTests(TestCase):
+    """Queries the async ORM runs in worker threads count toward the request."""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user('potter', password='pw')
+        Product.objects.create(name='bowl', price=Decimal('10.50'), img='https://example.com/p.jpg',
+                               user=self.user, is_approved=True)
+
+    async def test_async_view_queries_are_counted(self):
+        response = await self.async_client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(_query_count(response), 0)
+
+    async def test_metrics_count_async_queries(self):
+        await self.async_client.get('/api/products/')
+        body = (await self.async_client.get('/api/metrics')).content.decode()
+        match = re.search(r'market_request_queries_total\{endpoint="get_products",method="GET"\} (\d+)', body)
+        self.assertIsNotNone(match, body)
+        self.assertGreater(int(match[1]), 0)
+
+    def test_sync_client_counts_queries(self):
+        self.client.force_login(self.user)
+        self.assertGreater(_query_count(self.client.get('/api/cart/')), 0)
+
+
+class FastJsonRenderTimingTests(TestCase):
+    """Fast-path bodies are built in the view and still count as render time."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('potter', password='pw')
+        Product.objects.create(name='bowl', price=Decimal('10.50'), img='https://example.com/p.jpg',
+                               user=user, is_approved=True)
+
+    def _render_duration(self, endpoints):
+        with self.settings(FAST_JSON_ENDPOINTS=endpoints):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'render;dur=\d+\.\d')
+        return response.wsgi_request._render_duration
+
+    def test_fast_path_records_render(self):
+        self.assertGreater(self._render_duration({'get_products'}), 0)
+
+    def test_regular_path_records_render(self):
+        self.assertGreater(self._render_duration(set()), 0)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_server_timing(self):
+        response = self.client.get('/api/auth/check/')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;desc="\d+ queries";dur=\d+\.\d, render;dur=\d+\.\d, total;dur=\d+\.\d$',
+        )
+
+    def test_metrics_count_requests_per_endpoint(self):
+        self.client.get('/api/auth/check/')
+        self.client.get('/api/auth/check/')
+        self.client.post('/api/auth/check/')
+        body = self.client.get('/api/metrics').content.decode()
+        self.assertIn('market_request_duration_seconds_count{endpoint="check_auth",method="GET"} 2\n', body)
+        self.assertIn('market_request_duration_seconds_bucket{endpoint="check_auth",method="GET",le="+Inf"} 2\n', body)
+        self.assertIn('market_request_duration_seconds_count{endpoint="check_auth",method="POST"} 1\n', body)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('market.performance', 'WARNING') as logs:
+            self.client.get('/api/auth/check/')
+        [message] = logs.output
+        self.assertIn('Slow request GET /api/auth/check/ -> 200', message)
+        self.assertIn('slowest SQL', message)
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from market.models import Product
+
+
+class BulkModerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        other = User.objects.create_user('weaver', password='pw')
+        self.products = {
+            name: Product.objects.create(name=name, price=Decimal('5.00'), img='https://example.com/p.jpg',
+                                         user=owner, is_approved=approved)
+            for name, owner, approved in [('bowl', self.artisan, False), ('jug', self.artisan, True),
+                                          ('mat', other, False)]
+        }
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+
+    def _post(self, action, body):
+        return self.client.post(f'/api/products/{action}/bulk/', body, content_type='application/json')
+
+    def test_approve_by_ids(self):
+        ids = [self.products['bowl'].id, self.products['jug'].id, 0]
+        body = self._post('approve', {'ids': ids}).json()
+
+        self.assertEqual(body['approved'], 1)
+        self.assertEqual([row['status'] for row in body['results']], ['approved', 'already_approved', 'not_found'])
+        self.assertEqual(set(Product.objects.filter(is_approved=True).values_list('name', flat=True)),
+                         {'bowl', 'jug'})
+        self.assertIsNotNone(Product.objects.get(name='bowl').approved_by)
+
+    def test_approve_by_filter(self):
+        body = self._post('approve', {'filter': {'pending': True, 'owner': 'potter'}}).json()
+        self.assertEqual(body['approved'], 1)
+        self.assertFalse(Product.objects.get(name='mat').is_approved)
+
+    def test_delete_by_ids(self):
+        ids = [self.products['bowl'].id, self.products['mat'].id]
+        body = self._post('delete', {'ids': ids}).json()
+        self.assertEqual(body['deleted'], 2)
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['jug'])
+
+    def test_approval_shows_in_the_cached_catalog(self):
+        admin = User.objects.get(username='admin')
+        self.client.logout()
+        self.assertEqual([row['name'] for row in self.client.get('/api/products/').json()['results']], ['jug'])
+        self.client.force_login(admin)
+        self._post('approve', {'filter': {'pending': True}})
+        self.client.logout()
+        names = [row['name'] for row in self.client.get('/api/products/').json()['results']]
+        self.assertEqual(names, ['bowl', 'jug', 'mat'])
+
+    def test_malformed_bodies(self):
+        for body in ({}, {'ids': [1], 'filter': {'pending': True}}, {'ids': ['1']}, {'filter': {'colour': 'red'}},
+                     {'filter': {'created_before': 'yesterday'}}):
+            with self.subTest(body=body):
+                self.assertEqual(self._post('approve', body).status_code, 400)
+
+    def test_admins_only(self):
+        self.client.force_login(self.artisan)
+        self.assertEqual(self._post('approve', {'ids': [self.products['bowl'].id]}).status_code, 403)
+        self.assertEqual(self._post('delete', {'ids': [self.products['bowl'].id]}).status_code, 403)
+        self.assertEqual(Product.objects.filter(is_approved=False).count(), 2)
@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from market import sales
+from market.models import CartItem, Job, Order, Product
+
+
+@override_settings(FAST_JSON_ENDPOINTS=set())
+class ProductDeletionTests(TestCase):
+    """Deleting a product keeps the lines of placed orders."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        self.shopper = User.objects.create_user('buyer', password='pw')
+        self.bowl = Product.objects.create(name='bowl', price=Decimal('10.50'), img='https://example.com/p.jpg',
+                                           user=self.artisan, is_approved=True)
+        self.client.force_login(self.shopper)
+
+    def _add(self, product):
+        response = self.client.post('/api/cart/add/', {'product_id': product.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_order_lists_line_of_deleted_product(self):
+        self._add(self.bowl)
+        self._add(self.bowl)
+        self.assertEqual(self.client.post('/api/order/place/', {}, content_type='application/json').status_code, 201)
+
+        self.bowl.delete()
+
+        [order] = self.client.get('/api/orders/').json()
+        self.assertEqual(order['items'], [
+            {'id': order['items'][0]['id'], 'name': 'bowl', 'price': 10.5,
+             'img': 'https://example.com/p.jpg', 'quantity': 2},
+        ])
+        self.assertEqual(order['total'], 21.0)
+        self.assertEqual(Order.objects.get().total_amount, Decimal('21.00'))
+
+    def test_open_cart_line_goes_with_product(self):
+        self._add(self.bowl)
+        self.bowl.delete()
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.client.get('/api/cart/').json()['items'], [])
+
+
+@override_settings(FAST_JSON_ENDPOINTS=set())
+class PlaceOrderTests(TestCase):
+    """Checkout attaches the open cart to one new order, priced from snapshots."""
+
+    def setUp(self):
+        cache.clear()
+        artisan = User.objects.create_user('potter', password='pw')
+        self.shopper = User.objects.create_user('buyer', password='pw')
+        self.bowl, self.jug = [
+            Product.objects.create(name=name, price=Decimal(price), img='https://example.com/p.jpg',
+                                   user=artisan, is_approved=True)
+            for name, price in [('bowl', '10.50'), ('jug', '4.25')]
+        ]
+
+    def _place(self, data=None):
+        return self.client.post('/api/order/place/', data or {}, content_type='application/json')
+
+    def test_attaches_open_lines(self):
+        self.client.force_login(self.shopper)
+        for product in (self.bowl, self.bowl, self.jug):
+            self.client.post('/api/cart/add/', {'product_id': product.id}, content_type='application/json')
+        # Lines keep the price they were added at.
+        Product.objects.filter(pk=self.bowl.pk).update(price=Decimal('99.00'))
+
+        response = self._place()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total'], 25.25)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.total_amount, Decimal('25.25'))
+        self.assertTrue(order.rollup_pending)
+        self.assertEqual(
+            sorted(order.items.values_list('product_name', 'quantity', 'ordered')),
+            [('bowl', 2, True), ('jug', 1, True)],
+        )
+        self.assertEqual(self.client.get('/api/cart/').json(), {'items': [], 'total': 0.0})
+        [job] = Job.objects.all()
+        self.assertEqual((job.task, job.args), (sales.record_pending.task_name, [order.pk]))
+
+    def test_earlier_orders_keep_their_lines(self):
+        self.client.force_login(self.shopper)
+        self.client.post('/api/cart/add/', {'product_id': self.bowl.id}, content_type='application/json')
+        first = self._place().json()['order_id']
+        self.client.post('/api/cart/add/', {'product_id': self.jug.id}, content_type='application/json')
+        second = self._place().json()['order_id']
+
+        orders = {order['id']: [item['name'] for item in order['items']]
+                  for order in self.client.get('/api/orders/').json()}
+        self.assertEqual(orders, {first: ['bowl'], second: ['jug']})
+
+    def test_guest_session_checkout(self):
+        CartItem.objects.create(product=self.jug, product_name='jug', product_price=self.jug.price,
+                                product_img=self.jug.img, session_id='guest-1', quantity=2)
+        CartItem.objects.create(product=self.bowl, product_name='bowl', product_price=self.bowl.price,
+                                product_img=self.bowl.img, session_id='guest-2')
+
+        response = self._place({'session_id': 'guest-1'})
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual((order.session_id, order.user, order.total_amount), ('guest-1', None, Decimal('8.50')))
+        self.assertEqual(CartItem.objects.filter(order__isnull=True).get().session_id, 'guest-2')
+
+    def test_empty_cart_is_rejected(self):
+        self.client.force_login(self.shopper)
+        response = self._place()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Cart is empty')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Job.objects.exists())
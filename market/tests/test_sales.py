@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from market import sales
+from market.models import Order, Product, ProductSalesDay, UserProfile
+
+
+@override_settings(JOBS_EAGER=True)
+class SalesRollupTests(TestCase):
+    """Rollups follow placed and deleted orders and agree with a rebuild."""
+
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        UserProfile.objects.create(user=self.artisan, is_artisan=True)
+        other = User.objects.create_user('weaver', password='pw')
+        self.bowl, self.jug, self.mat = [
+            Product.objects.create(name=name, price=Decimal(price), img='https://example.com/p.jpg',
+                                   user=owner, is_approved=True)
+            for name, price, owner in [('bowl', '10.00', self.artisan), ('jug', '4.50', self.artisan),
+                                       ('mat', '7.00', other)]
+        ]
+        self.shopper = User.objects.create_user('buyer', password='pw')
+
+    def _order(self, *products):
+        self.client.force_login(self.shopper)
+        for product in products:
+            self.client.post('/api/cart/add/', {'product_id': product.id}, content_type='application/json')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/order/place/', {}, content_type='application/json').json()['order_id']
+
+    def _dashboard(self):
+        self.client.force_login(self.artisan)
+        return self.client.get('/api/sales/dashboard/').json()
+
+    def _rollups(self):
+        return sorted(ProductSalesDay.objects.values_list('product__name', 'units', 'revenue', 'orders'))
+
+    def test_orders_are_added(self):
+        self._order(self.bowl, self.bowl, self.jug, self.mat)
+        self._order(self.bowl)
+
+        body = self._dashboard()
+
+        self.assertEqual((body['units'], body['revenue']), (4, 34.5))
+        self.assertEqual(body['days'][-1]['units'], 4)
+        self.assertEqual(
+            [(row['name'], row['units'], row['revenue'], row['orders']) for row in body['products']],
+            [('bowl', 3, 30.0, 2), ('jug', 1, 4.5, 1)],
+        )
+        self.assertFalse(Order.objects.filter(rollup_pending=True).exists())
+
+    def test_deleted_orders_are_taken_out(self):
+        first = self._order(self.bowl, self.jug)
+        self._order(self.bowl)
+        self.client.force_login(self.shopper)
+        self.assertEqual(self.client.delete(f'/api/orders/delete/{first}/').status_code, 200)
+
+        self.assertEqual(self._rollups(), [('bowl', 1, Decimal('10.00'), 1)])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self._order(self.bowl, self.jug, self.mat)
+        self._order(self.jug)
+        incremental = self._rollups()
+
+        sales.rebuild()
+
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_customers_have_no_dashboard(self):
+        self.client.force_login(self.shopper)
+        self.assertEqual(self.client.get('/api/sales/dashboard/').status_code, 403)
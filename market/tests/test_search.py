@@ -0,0 +1,60 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from market.models import Product
+
+
+class SearchProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artisan = User.objects.create_user('potter', password='pw')
+        self.basket = Product.objects.create(name='Woven basket', price=Decimal('12.00'),
+                                             img='https://example.com/p.jpg', user=self.artisan, is_approved=True)
+
+    def _search(self, q):
+        response = self.client.get('/api/products/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_skips_ids_deleted_since_the_index_was_read(self):
+        with mock.patch('market.search.search_product_ids', return_value=[self.basket.id + 1000, self.basket.id]):
+            self.assertEqual(self._search('basket'), ['Woven basket'])
+
+    def test_matches_fragments_prefixes_first(self):
+        Product.objects.create(name='Basket weaving kit', price=Decimal('30.00'), img='https://example.com/p.jpg',
+                               user=self.artisan, is_approved=True)
+        Product.objects.create(name='Clay pot', price=Decimal('8.00'), img='https://example.com/p.jpg',
+                               user=self.artisan, is_approved=True)
+        self.assertEqual(self._search('bask'), ['Basket weaving kit', 'Woven basket'])
+        self.assertEqual(self._search('woven bask'), ['Woven basket'])
+
+    def test_short_terms_match_name_prefixes(self):
+        self.assertEqual(self._search('wo'), ['Woven basket'])
+        self.assertEqual(self._search('as'), [])
+
+    def test_index_follows_renames(self):
+        self.basket.name = 'Woven tray'
+        self.basket.save()
+        self.assertEqual(self._search('basket'), [])
+        self.assertEqual(self._search('tray'), ['Woven tray'])
+
+    def test_visibility_matches_the_catalog(self):
+        Product.objects.create(name='Pending basket', price=Decimal('9.00'), img='https://example.com/p.jpg',
+                               user=self.artisan, is_approved=False)
+        self.assertEqual(self._search('basket'), ['Woven basket'])
+
+        self.client.force_login(User.objects.create_user('buyer', password='pw'))
+        self.assertEqual(self._search('basket'), ['Woven basket'])
+
+        self.client.force_login(self.artisan)
+        self.assertEqual(sorted(self._search('basket')), ['Pending basket', 'Woven basket'])
+
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        self.assertEqual(sorted(self._search('basket')), ['Pending basket', 'Woven basket'])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/products/search/', {'q': ' '}).status_code, 400)
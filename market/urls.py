@@ -1,17 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# In ASGI mode the read endpoints are served by their async variants.
+reads = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('products/', views.get_products, name='get_products'),
+    path('products/', reads.get_products, name='get_products'),
+    path('products/search/', views.search_products, name='search_products'),
     path('products/add/', views.add_product, name='add_product'),
     path('products/approve/<int:product_id>/', views.approve_product, name='approve_product'),
+    path('products/approve/bulk/', views.bulk_approve_products, name='bulk_approve_products'),
     path('products/delete/<int:product_id>/', views.delete_product, name='delete_product'),
+    path('products/delete/bulk/', views.bulk_delete_products, name='bulk_delete_products'),
+    path('products/export/', views.export_products, name='export_products'),
+    path('images/<str:key>.webp', views.product_image, name='product_image'),
     path('cart/add/', views.add_to_cart, name='add_to_cart'),
-    path('cart/', views.get_cart, name='get_cart'),
+    path('cart/', reads.get_cart, name='get_cart'),
     path('cart/remove/<int:cart_item_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('order/place/', views.place_order, name='place_order'),
-    path('orders/', views.get_orders, name='get_orders'),
+    path('orders/', reads.get_orders, name='get_orders'),
+    path('orders/export/', views.export_orders, name='export_orders'),
     path('orders/delete/<int:order_id>/', views.delete_order, name='delete_order'),
-    path('auth/check/', views.check_auth, name='check_auth'),
+    path('sales/dashboard/', views.sales_dashboard, name='sales_dashboard'),
+    path('bootstrap/', reads.bootstrap, name='bootstrap'),
+    path('events/', reads.catalog_events, name='catalog_events'),
+    path('auth/check/', reads.check_auth, name='check_auth'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
 
@@ -1,19 +1,34 @@
 from rest_framework.decorators import api_view, authentication_classes
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.contrib.staticfiles.views import serve as staticfiles_serve
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from .models import Product, CartItem, Order, get_or_create_user_profile
+from django.views.decorators.http import require_GET, require_http_methods
+from .models import (
+    Product, CartItem, Order, get_or_create_user_profile, open_cart_items, order_history, cart_line_total,
+)
+from . import accounts, assets, catalog, events, exports, fastjson, images, jobs, metrics, sales, search
+from datetime import timedelta
 from decimal import Decimal
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
 import os
 import json
+import base64
+import binascii
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -26,9 +41,290 @@ def _is_admin(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
 
+PRODUCTS_PAGE_SIZE = 24
+PRODUCTS_MAX_PAGE_SIZE = 100
+
+
+def _parse_page_size(raw):
+    """Clamp the requested page size to ``1..PRODUCTS_MAX_PAGE_SIZE``."""
+    if raw in (None, ''):
+        return PRODUCTS_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, PRODUCTS_MAX_PAGE_SIZE))
+
+
+def _encode_cursor(listing, row):
+    """Encode the last row of a page as an opaque, URL-safe cursor."""
+    value, pk = listing.cursor_for(row)
+    raw = json.dumps([listing.sort, value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, listing):
+    """Decode a cursor from ``_encode_cursor`` into ``(value, id)`` for ``listing``."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if sort != listing.sort or not isinstance(pk, int):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    return listing.parse_cursor(value, pk)
+
+
+def _is_owner_view(user):
+    """Whether ``user`` sees the public catalog plus their own pending overlay."""
+    return user.is_authenticated and not _is_admin(user)
+
+
+def _products_etag(media_type, user, listing, cursor, limit, version, overlay_version=None):
+    """ETag of a ``get_products`` page; ``overlay_version`` is for owner views."""
+    if not user.is_authenticated:
+        return catalog.etag_for(media_type, catalog.PUBLIC, version, listing.key(), cursor, limit)
+    if _is_admin(user):
+        return catalog.etag_for(media_type, catalog.ADMIN, user.id, version, listing.key(), cursor, limit)
+    return catalog.etag_for(
+        media_type, catalog.OWNER, user.id, version, overlay_version, listing.key(), cursor, limit)
+
+
+def _products_rows(user, listing, cursor, limit, version, overlay_version, lean=False):
+    """Up to ``limit + 1`` catalog rows after ``cursor`` as ``user`` sees them."""
+    if not user.is_authenticated:
+        return catalog.page_rows(catalog.PUBLIC, listing, cursor, limit, version, lean)
+    if _is_admin(user):
+        return catalog.page_rows(catalog.ADMIN, listing, cursor, limit, version, lean)
+    return catalog.merge_overlay(
+        catalog.page_rows(catalog.PUBLIC, listing, cursor, limit, version, lean),
+        catalog.owner_overlay(user.id, listing, overlay_version, lean),
+        listing,
+        cursor,
+        limit,
+    )
+
+
+def _products_page(user, listing, rows, limit):
+    """Response body for up to ``limit + 1`` catalog ``rows``."""
+    page = rows[:limit]
+    username = user.username if user.is_authenticated else None
+    products_data = [dict(row, owned=username is not None and row['owner'] == username) for row in page]
+    next_cursor = _encode_cursor(listing, page[-1]) if len(rows) > limit else None
+    return {'results': products_data, 'next': next_cursor}
+
+
+def _fast_json(request, endpoint):
+    """Whether to answer ``endpoint`` through ``market.fastjson``.
+
+    Only for JSON; the browsable API still goes through its renderer.
+    """
+    return fastjson.enabled(endpoint) and request.accepted_renderer.format == 'json'
+
+
+def _products_body(user, listing, rows, limit):
+    """``_products_page`` for lean rows, as fastjson parts."""
+    page = rows[:limit]
+    username = user.username if user.is_authenticated else None
+    results = ','.join([
+        row.json + (',"owned":true}' if username is not None and row.owner == username else ',"owned":false}')
+        for row in page
+    ])
+    next_cursor = _encode_cursor(listing, page[-1]) if len(rows) > limit else None
+    return ('{"results":[', results, '],"next":', fastjson.string(next_cursor), '}')
+
+
+# values_list() columns of a lean cart row, encoded as _cart_item_data's keys.
+CART_ROW_FIELDS = (
+    ('id', 'int'),
+    ('product_id', 'int?'),
+    ('name', 'str?'),
+    ('price', 'float0'),
+    ('img', 'str?'),
+    ('quantity', 'int'),
+    ('line_total', 'float0'),
+)
+_encode_cart_row = fastjson.compile_encoder(CART_ROW_FIELDS)
+
+
+def _lean_cart_rows(cart_items):
+    """Open cart rows as ``CART_ROW_FIELDS`` tuples, snapshots preferred as in ``_cart_item_data``."""
+    return cart_items.values_list(
+        'id',
+        'product_id',
+        Coalesce(NullIf('product_name', Value('')), 'product__name'),
+        Coalesce('product_price', 'product__price'),
+        Coalesce(NullIf('product_img', Value('')), 'product__img'),
+        'quantity',
+        cart_line_total(),
+    )
+
+
+def _cart_body(rows):
+    """The ``get_cart`` body for lean cart rows, as fastjson parts."""
+    total = sum((row[-1] or Decimal('0.00') for row in rows), Decimal('0.00'))
+    items = ','.join([_encode_cart_row(row) for row in rows])
+    return ('{"items":[', items, '],"total":', repr(float(total)), '}')
+
+
+# values of _auth_data, encoded for the lean bootstrap.
+AUTH_FIELDS = (
+    ('authenticated', 'bool'),
+    ('username', 'str?'),
+    ('is_artisan', 'bool'),
+    ('is_admin', 'bool'),
+)
+_encode_auth = fastjson.compile_encoder(AUTH_FIELDS)
+
+
+def _bootstrap_cart(user, session_id, lean):
+    """Open cart rows for the bootstrap state: lean tuples or annotated items."""
+    cart_items = open_cart_items(user, session_id)
+    if lean:
+        return _lean_cart_rows(cart_items)
+    return cart_items.select_related('product').annotate(line_total=cart_line_total())
+
+
+def _bootstrap_body(user, roles, listing, rows, limit, cart_rows, session_id, lean):
+    """The ``bootstrap`` body as bytes, from lean or regular rows."""
+    if lean:
+        return fastjson.render((
+            '{"auth":', _encode_auth(tuple(_auth_data(user, roles).values())),
+            ',"products":', *_products_body(user, listing, rows, limit),
+            ',"cart":', *_cart_body(cart_rows),
+            ',"session_id":', fastjson.string(session_id), '}',
+        ))
+    return JSONRenderer().render({
+        'auth': _auth_data(user, roles),
+        'products': _products_page(user, listing, rows, limit),
+        'cart': _cart_data(cart_rows),
+        'session_id': session_id,
+    })
+
+
+def _bootstrap(request, params, session_id):
+    """The ``bootstrap`` body for ``request.user``; raises ``ValueError`` for bad ``params``."""
+    user = request.user
+    limit = _parse_page_size(params.get('limit'))
+    listing = catalog.Listing.from_params(params)
+    roles = accounts.user_roles(user)
+    version, overlay_version = catalog.versions(user.id if _is_owner_view(user) else None)
+    lean = fastjson.enabled('bootstrap')
+    rows = _products_rows(user, listing, None, limit, version, overlay_version, lean)
+    cart_rows = list(_bootstrap_cart(user, session_id, lean))
+    return fastjson.timed(request, _bootstrap_body, user, roles, listing, rows, limit, cart_rows, session_id, lean)
+
+
+def _cart_item_data(item):
+    """Serialize an open cart row annotated with ``line_total``."""
+    product = item.product
+    price = item.product_price if item.product_price is not None else (product.price if product else None)
+    return {
+        'id': item.id,
+        'product_id': item.product_id,
+        'name': item.product_name or (product.name if product else None),
+        'price': float(price) if price is not None else 0.0,
+        'img': item.product_img or (product.img if product else None),
+        'quantity': item.quantity,
+        'line_total': float(item.line_total or Decimal('0.00')),
+    }
+
+
+def _cart_data(cart_items):
+    """The ``get_cart`` body for open cart rows annotated with ``line_total``."""
+    cart_data = []
+    total = Decimal('0.00')
+    for item in cart_items:
+        cart_data.append(_cart_item_data(item))
+        total += item.line_total or Decimal('0.00')
+    return {'items': cart_data, 'total': float(total)}
+
+
+def _auth_data(user, roles):
+    """The ``check_auth`` body."""
+    return {
+        'authenticated': user.is_authenticated,
+        'username': user.username if user.is_authenticated else None,
+        'is_artisan': roles.is_artisan,
+        'is_admin': roles.is_admin,
+    }
+
+
+def _order_data(order):
+    """Serialize an order whose line items (with products) are prefetched."""
+    items_list = []
+    for item in order.items.all():
+        product = item.product
+        price = item.product_price if item.product_price is not None else (product.price if product else None)
+        items_list.append({
+            'id': item.id,
+            'name': item.product_name or (product.name if product else None),
+            'price': float(price) if price is not None else 0.0,
+            'img': item.product_img or (product.img if product else None),
+            'quantity': item.quantity,
+        })
+    return {
+        'id': order.id,
+        'total': float(order.total_amount),
+        'created_at': order.created_at.isoformat(),
+        'items': items_list
+    }
+
+
+def _order_history_items():
+    # Line items carry name/price/img snapshots taken at add-to-cart time; the
+    # product join only backs rows written before those existed.
+    return Prefetch('items', queryset=CartItem.objects.select_related('product'))
+
+
+# Stands in for the embedded state in the cached index shell.
+BOOTSTRAP_MARKER = 'BOOTSTRAP_STATE'
+
+
+def _index_with_state(request):
+    """The index page with the ``bootstrap`` state of the caller embedded.
+
+    Guests' carts are found by the ``session_id`` cookie the page sets.
+    """
+    shell = assets.shell('index.html', {'bootstrap_state': BOOTSTRAP_MARKER})
+    head, _, tail = shell.variants[None].partition(BOOTSTRAP_MARKER.encode())
+    state = _bootstrap(request, {}, request.COOKIES.get('session_id', 'default'))
+    # No string in the state can close the <script> element it sits in.
+    body = head + state.replace(b'<', b'\\u003c') + tail
+    coding, body = assets.compress_for(request.headers.get('Accept-Encoding', ''), body)
+    response = HttpResponse(body, content_type='text/html; charset=utf-8')
+    if coding:
+        response['Content-Encoding'] = coding
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
 def index(request):
-    """Serve the main index page"""
-    return render(request, 'index.html')
+    """Serve the main index page.
+
+    The page is a shell around the hashed static assets, rendered once per
+    process. Browsers revalidate it on every visit and get a 304 while it is
+    unchanged. With ``BOOTSTRAP_EMBED`` the page carries the caller's
+    ``bootstrap`` state instead, saving a round trip before first paint but
+    never answering 304.
+    """
+    if settings.BOOTSTRAP_EMBED:
+        return _index_with_state(request)
+    shell = assets.shell('index.html')
+    if shell.etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        coding = assets.choose(request.headers.get('Accept-Encoding', ''), shell.variants)
+        response = HttpResponse(shell.variants[coding], content_type='text/html; charset=utf-8')
+        if coding:
+            response['Content-Encoding'] = coding
+    response['ETag'] = shell.etag
+    response['Cache-Control'] = 'no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
 
 
 def login_view(request):
@@ -71,7 +367,8 @@ def register_view(request):
         profile = get_or_create_user_profile(user)
         profile.is_artisan = is_artisan
         profile.save()
-        login(request, user)
+        # Not authenticated through a backend, so name the one to log in with.
+        login(request, user, backend='market.accounts.CachedModelBackend')
         return redirect('index')
     
     return render(request, 'register.html')
@@ -86,29 +383,72 @@ def logout_view(request):
 @api_view(['GET'])
 @authentication_classes([CsrfExemptSessionAuthentication])
 def get_products(request):
-    """Get all products with ownership info"""
-    products = Product.objects.all().select_related('user', 'approved_by')
+    """Get one page of products with ownership info.
 
-    if not request.user.is_authenticated:
-        products = products.filter(is_approved=True)
-    elif not _is_admin(request.user):
-        products = products.filter(Q(is_approved=True) | Q(user=request.user))
-
-    products_data = []
-    for p in products:
-        owned = request.user.is_authenticated and p.user_id == request.user.id
-        products_data.append({
-            'id': p.id,
-            'name': p.name,
-            'price': float(p.price),
-            'img': p.img,
-            'owner': p.user.username if p.user_id else None,
-            'owned': owned,
-             'is_approved': p.is_approved,
-             'approved_at': p.approved_at.isoformat() if p.approved_at else None,
-             'approved_by': p.approved_by.username if p.approved_by else None,
-        })
-    return Response(products_data)
+    Optional filters: ``min_price``/``max_price`` (with a price sort),
+    ``created_after`` (with a ``created_at`` sort) and ``owner``. ``sort`` is
+    one of ``catalog.SORTS``; a leading ``-`` means descending.
+
+    Pages are keyed on ``(sort value, id)`` so every page costs the same index
+    seek regardless of depth. Pass the ``next`` value back as ``?cursor=`` to
+    fetch the following page. Pages come from the versioned catalog cache and
+    carry a strong ETag, so an unchanged catalog answers ``304`` without a
+    query. With ``get_products`` in ``settings.FAST_JSON_ENDPOINTS``, JSON
+    pages are encoded by ``market.fastjson`` from cached row tuples.
+    """
+    try:
+        limit = _parse_page_size(request.GET.get('limit'))
+        listing = catalog.Listing.from_params(request.GET)
+        cursor = _decode_cursor(request.GET.get('cursor'), listing)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    version = catalog.catalog_version()
+    overlay_version = catalog.owner_version(user.id) if _is_owner_view(user) else None
+    etag = _products_etag(request.accepted_renderer.format, user, listing, cursor, limit, version, overlay_version)
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+    lean = _fast_json(request, 'get_products')
+    rows = _products_rows(user, listing, cursor, limit, version, overlay_version, lean)
+    if lean:
+        return fastjson.response(request, _products_body, user, listing, rows, limit, headers={'ETag': etag})
+    return Response(_products_page(user, listing, rows, limit), headers={'ETag': etag})
+
+
+@api_view(['GET'])
+@authentication_classes([CsrfExemptSessionAuthentication])
+def search_products(request):
+    """Search product names, best match first, with get_products visibility."""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({'success': False, 'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = _parse_page_size(request.GET.get('limit'))
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    ids = search.search_product_ids(
+        query,
+        limit,
+        user=user if user.is_authenticated else None,
+        include_all=_is_admin(user),
+    )
+    products = Product.objects.select_related('user', 'approved_by').in_bulk(ids)
+
+    username = user.username if user.is_authenticated else None
+    results = []
+    for pk in ids:
+        if pk not in products:
+            # Deleted since the index was searched.
+            continue
+        row = catalog.serialize_product(products[pk])
+        row['owned'] = username is not None and row['owner'] == username
+        results.append(row)
+    return Response({'results': results})
 
 
 @csrf_exempt
@@ -122,8 +462,8 @@ def add_product(request):
             status=status.HTTP_401_UNAUTHORIZED,
         )
 
-    profile = get_or_create_user_profile(request.user)
-    if not profile.is_artisan and not _is_admin(request.user):
+    roles = accounts.user_roles(request.user)
+    if not roles.is_artisan and not roles.is_admin:
         return Response(
             {'success': False, 'error': 'Only registered village artisans can add products.'},
             status=status.HTTP_403_FORBIDDEN,
@@ -156,6 +496,8 @@ def add_product(request):
             approved_at=timezone.now() if _is_admin(request.user) else None,
             approved_by=request.user if _is_admin(request.user) else None,
         )
+        events.products_saved('product.added', [product])
+        images.schedule([product.id])
         
         return Response({
             'success': True,
@@ -180,14 +522,139 @@ def approve_product(request, product_id):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product.objects.select_related('user'), id=product_id)
     product.is_approved = True
     product.approved_at = timezone.now()
     product.approved_by = request.user
     product.save(update_fields=['is_approved', 'approved_at', 'approved_by'])
+    events.products_saved('product.approved', [product])
+    if not product.thumbnail:
+        images.schedule([product.id])
 
     return Response({'success': True, 'message': 'Product approved.'})
 
+
+BULK_MODERATION_LIMIT = 1000
+
+
+def _bulk_moderation_targets(data):
+    """Resolve a bulk moderation body to ``(requested_ids, queryset)``.
+
+    The body holds either ``ids`` (a list of product ids) or ``filter`` with
+    any of ``pending`` (bool), ``owner`` (username) and ``created_before``
+    (ISO 8601). ``requested_ids`` is ``None`` for filters. Raises
+    ``ValueError`` with a user-facing message for a malformed body.
+    """
+    ids = data.get('ids')
+    filters = data.get('filter')
+    if (ids is None) == (filters is None):
+        raise ValueError('Provide either "ids" or "filter".')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError('"ids" must be a list of product ids.')
+        if len(ids) > BULK_MODERATION_LIMIT:
+            raise ValueError(f'At most {BULK_MODERATION_LIMIT} ids per request.')
+        ids = list(dict.fromkeys(ids))
+        return ids, Product.objects.filter(id__in=ids)
+
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError('"filter" must be a non-empty object.')
+    unknown = set(filters) - {'pending', 'owner', 'created_before'}
+    if unknown:
+        raise ValueError(f'Unsupported filter: {", ".join(sorted(unknown))}.')
+
+    products = Product.objects.all()
+    if 'pending' in filters:
+        if not isinstance(filters['pending'], bool):
+            raise ValueError('"pending" must be true or false.')
+        products = products.filter(is_approved=not filters['pending'])
+    if 'owner' in filters:
+        products = products.filter(user__username=filters['owner'])
+    if 'created_before' in filters:
+        created_before = parse_datetime(str(filters['created_before']))
+        if created_before is None:
+            raise ValueError('"created_before" must be an ISO 8601 datetime.')
+        if timezone.is_naive(created_before):
+            created_before = timezone.make_aware(created_before)
+        products = products.filter(created_at__lt=created_before)
+    return None, products.order_by('id')[:BULK_MODERATION_LIMIT]
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([CsrfExemptSessionAuthentication])
+def bulk_approve_products(request):
+    """Approve many products with one UPDATE (admin only)."""
+    if not _is_admin(request.user):
+        return Response(
+            {'success': False, 'error': 'Only admins can approve products.'},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        requested_ids, products = _bulk_moderation_targets(request.data)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        found = {pk: (is_approved, owner_id) for pk, is_approved, owner_id
+                 in products.values_list('id', 'is_approved', 'user_id')}
+        pending_ids = [pk for pk, (is_approved, _) in found.items() if not is_approved]
+        approved = Product.objects.filter(id__in=pending_ids, is_approved=False).update(
+            is_approved=True,
+            approved_at=timezone.now(),
+            approved_by=request.user,
+        )
+
+    if approved:
+        catalog.bump_catalog_version(*(found[pk][1] for pk in pending_ids))
+        events.products_saved('product.approved', Product.objects.filter(
+            id__in=pending_ids, is_approved=True).select_related('user', 'approved_by'))
+        # Those still without a thumbnail (a failed fetch at add time).
+        images.schedule(pending_ids)
+
+    results = []
+    for pk in (requested_ids if requested_ids is not None else found):
+        if pk not in found:
+            outcome = 'not_found'
+        else:
+            outcome = 'already_approved' if found[pk][0] else 'approved'
+        results.append({'id': pk, 'status': outcome})
+
+    return Response({'success': True, 'approved': approved, 'results': results})
+
+
+@csrf_exempt
+@api_view(['POST'])
+@authentication_classes([CsrfExemptSessionAuthentication])
+def bulk_delete_products(request):
+    """Delete many products in one transaction (admin only)."""
+    if not _is_admin(request.user):
+        return Response(
+            {'success': False, 'error': 'Only admins can delete products in bulk.'},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    try:
+        requested_ids, products = _bulk_moderation_targets(request.data)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        found = {pk: (is_approved, owner_id) for pk, is_approved, owner_id
+                 in products.values_list('id', 'is_approved', 'user_id')}
+        Product.objects.filter(id__in=list(found)).delete()
+
+    if found:
+        events.products_deleted(found)
+
+    results = [
+        {'id': pk, 'status': 'deleted' if pk in found else 'not_found'}
+        for pk in (requested_ids if requested_ids is not None else found)
+    ]
+    return Response({'success': True, 'deleted': len(found), 'results': results})
+
 @csrf_exempt
 @api_view(['POST'])
 @authentication_classes([CsrfExemptSessionAuthentication])
@@ -217,18 +684,32 @@ def add_to_cart(request):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        cart_item = CartItem.objects.create(
-            product=product,
-            product_name=product.name,
-            product_price=product.price,
-            product_img=product.img,
-            user=request.user
-        )
+        # One open line per product: bump its quantity in place, and only
+        # insert when there is no line yet. The partial unique constraint
+        # turns a racing insert into an IntegrityError, retried as a bump.
+        cart_line = open_cart_items(request.user).filter(product=product)
+        with transaction.atomic():
+            if cart_line.update(quantity=F('quantity') + 1):
+                cart_item = cart_line.only('id', 'quantity').get()
+            else:
+                try:
+                    with transaction.atomic():
+                        cart_item = CartItem.objects.create(
+                            product=product,
+                            product_name=product.name,
+                            product_price=product.price,
+                            product_img=product.img,
+                            user=request.user
+                        )
+                except IntegrityError:
+                    cart_line.update(quantity=F('quantity') + 1)
+                    cart_item = cart_line.only('id', 'quantity').get()
         
         return Response({
             'success': True,
             'message': 'Product added to cart',
-            'cart_item_id': cart_item.id
+            'cart_item_id': cart_item.id,
+            'quantity': cart_item.quantity
         }, status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response({
@@ -240,33 +721,17 @@ def add_to_cart(request):
 @api_view(['GET'])
 @authentication_classes([CsrfExemptSessionAuthentication])
 def get_cart(request):
-    """Get all cart items"""
-    if request.user.is_authenticated:
-        cart_items = CartItem.objects.filter(user=request.user, ordered=False, order__isnull=True)
-    else:
-        session_id = request.GET.get('session_id', 'default')
-        cart_items = CartItem.objects.filter(session_id=session_id, user__isnull=True, ordered=False, order__isnull=True)
-    
-    cart_data = []
-    total = Decimal('0.00')
-    
-    for item in cart_items:
-        cart_data.append({
-            'id': item.id,
-            'product_id': item.product.id if item.product else None,
-            'name': item.product_name or (item.product.name if item.product else None),
-            'price': float(item.product_price) if item.product_price is not None else (float(item.product.price) if item.product else 0.0),
-            'img': item.product_img or (item.product.img if item.product else None)
-        })
-        if item.product_price is not None:
-            total += item.product_price
-        elif item.product:
-            total += item.product.price
-    
-    return Response({
-        'items': cart_data,
-        'total': float(total)
-    })
+    """Get all cart items with their line totals (price x quantity)"""
+    if _fast_json(request, 'get_cart'):
+        rows = list(_lean_cart_rows(open_cart_items(request.user, request.GET.get('session_id', 'default'))))
+        return fastjson.response(request, _cart_body, rows)
+
+    cart_items = (
+        open_cart_items(request.user, request.GET.get('session_id', 'default'))
+        .select_related('product')
+        .annotate(line_total=cart_line_total())
+    )
+    return Response(_cart_data(cart_items))
 
 
 @csrf_exempt
@@ -276,7 +741,7 @@ def remove_from_cart(request, cart_item_id):
     """Remove item from cart (supports authenticated users and guest sessions)"""
     try:
         if request.user.is_authenticated:
-            cart_item = get_object_or_404(CartItem, id=cart_item_id, user=request.user)
+            cart_item = get_object_or_404(CartItem, id=cart_item_id, user=request.user, order__isnull=True)
         else:
             session_id = request.GET.get('session_id') or request.data.get('session_id')
             if not session_id:
@@ -288,7 +753,8 @@ def remove_from_cart(request, cart_item_id):
                 CartItem,
                 id=cart_item_id,
                 session_id=session_id,
-                user__isnull=True
+                user__isnull=True,
+                order__isnull=True
             )
 
         cart_item.delete()
@@ -308,12 +774,17 @@ def remove_from_cart(request, cart_item_id):
 @api_view(['POST'])
 @authentication_classes([CsrfExemptSessionAuthentication])
 def place_order(request):
-    """Place an order"""
-    if request.user.is_authenticated:
-        cart_items = CartItem.objects.filter(user=request.user)
-    else:
-        session_id = request.data.get('session_id', 'default')
-        cart_items = CartItem.objects.filter(session_id=session_id, user__isnull=True)
+    """Place an order from the open cart.
+
+    Runs as one transaction with a fixed number of statements whatever the
+    cart size: the cart rows are attached to the new order with a single
+    UPDATE and the total is summed in the database from the line totals
+    (price snapshot x quantity) of exactly the rows that were attached.
+    Cart rows are kept as the order's line items, and the same transaction
+    queues the job that adds them to the sales rollups.
+    """
+    session_id = request.data.get('session_id', 'default')
+    cart_items = open_cart_items(request.user, session_id)
     
     try:
         if not cart_items.exists():
@@ -322,20 +793,25 @@ def place_order(request):
                 'error': 'Cart is empty'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calculate total
-        total = sum(item.product.price for item in cart_items)
-        
-        # Create order
-        session_id = request.data.get('session_id', 'default')
-        order = Order.objects.create(
-            total_amount=total, 
-            session_id=session_id if not request.user.is_authenticated else None,
-            user=request.user if request.user.is_authenticated else None
-        )
-        order.items.set(cart_items)
-        
-        # Delete cart items after order is placed
-        cart_items.delete()
+        with transaction.atomic():
+            order = Order.objects.create(
+                total_amount=Decimal('0.00'),
+                session_id=session_id if not request.user.is_authenticated else None,
+                user=request.user if request.user.is_authenticated else None,
+                rollup_pending=True,
+            )
+            attached = cart_items.update(order=order, ordered=True)
+            if not attached:
+                # The cart was checked out by a concurrent request.
+                transaction.set_rollback(True)
+                return Response({
+                    'success': False,
+                    'error': 'Cart is empty'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            total = order.items.aggregate(total=Sum(cart_line_total()))['total'] or Decimal('0.00')
+            Order.objects.filter(pk=order.pk).update(total_amount=total)
+            sales.queue_order(order)
         
         return Response({
             'success': True,
@@ -354,31 +830,81 @@ def place_order(request):
 @authentication_classes([CsrfExemptSessionAuthentication])
 def get_orders(request):
     """Get all orders for the authenticated user"""
-    if request.user.is_authenticated:
-        orders = Order.objects.filter(user=request.user)
-    else:
-        session_id = request.GET.get('session_id', 'default')
-        orders = Order.objects.filter(session_id=session_id, user__isnull=True)
+    orders = order_history(request.user, request.GET.get('session_id', 'default'))
     
-    orders_data = []
-    for order in orders:
-        items_list = []
-        for item in order.items.all():
-            items_list.append({
-                'id': item.id,
-                'name': item.product.name,
-                'price': float(item.product.price),
-                'img': item.product.img
-            })
-        
-        orders_data.append({
-            'id': order.id,
-            'total': float(order.total_amount),
-            'created_at': order.created_at.isoformat(),
-            'items': items_list
+    # Two queries whatever the history size: orders, then all of their line
+    # items.
+    orders = orders.prefetch_related(_order_history_items())
+    return Response([_order_data(order) for order in orders])
+
+
+SALES_DASHBOARD_DAYS = 30
+SALES_DASHBOARD_MAX_DAYS = 366
+
+
+@api_view(['GET'])
+@authentication_classes([CsrfExemptSessionAuthentication])
+def sales_dashboard(request):
+    """Units and revenue of an artisan's products, per day and per product.
+
+    Covers the last ``days`` days (default 30), today included. Artisans see
+    their own sales and admins pass ``?artisan=<username>``. Reads only the
+    sales rollups (``market.sales``), so the cost depends on the window, not
+    on the size of the order history.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return Response({
+            'success': False,
+            'error': 'Authentication required'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        days = int(request.GET.get('days') or SALES_DASHBOARD_DAYS)
+    except ValueError:
+        return Response({'success': False, 'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    days = max(1, min(days, SALES_DASHBOARD_MAX_DAYS))
+
+    if _is_admin(user) and request.GET.get('artisan'):
+        artisan = get_object_or_404(User, username=request.GET['artisan'])
+    elif accounts.user_roles(user).is_artisan:
+        artisan = user
+    else:
+        return Response({
+            'success': False,
+            'error': 'Only artisans have a sales dashboard'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    day_rows, product_rows = sales.dashboard_rows(artisan.id, start, end)
+
+    by_day = {row['day']: row for row in day_rows}
+    series = []
+    for n in range(days):
+        day = start + timedelta(days=n)
+        row = by_day.get(day)
+        series.append({
+            'day': day.isoformat(),
+            'units': row['units'] if row else 0,
+            'revenue': float(row['revenue']) if row else 0.0,
         })
-    
-    return Response(orders_data)
+    products = [{
+        'product_id': row['product_id'],
+        'name': row['name'],
+        'units': row['units'],
+        'revenue': float(row['revenue']),
+        'orders': row['orders'],
+    } for row in product_rows]
+
+    return Response({
+        'artisan': artisan.username,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'units': sum(row['units'] for row in by_day.values()),
+        'revenue': float(sum((row['revenue'] for row in by_day.values()), Decimal('0.00'))),
+        'days': series,
+        'products': products,
+    })
 
 
 @csrf_exempt
@@ -394,7 +920,9 @@ def delete_order(request, order_id):
     
     try:
         order = get_object_or_404(Order, id=order_id, user=request.user)
-        order.delete()
+        with transaction.atomic():
+            sales.forget_order(order)
+            order.delete()
         
         return Response({
             'success': True,
@@ -407,17 +935,30 @@ def delete_order(request, order_id):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@authentication_classes([CsrfExemptSessionAuthentication])
+def bootstrap(request):
+    """Everything the page needs for first paint, in one response.
+
+    ``auth`` is the ``check_auth`` body, ``products`` the first
+    ``get_products`` page (same query parameters) and ``cart`` the
+    ``get_cart`` body for ``session_id``, which is echoed back. The session,
+    user and roles are looked up once and both catalog versions are read in
+    one cache round trip.
+    """
+    session_id = request.GET.get('session_id', 'default')
+    try:
+        body = _bootstrap(request, request.GET, session_id)
+    except ValueError as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return HttpResponse(body, content_type='application/json')
+
+
 @api_view(['GET'])
 @authentication_classes([CsrfExemptSessionAuthentication])
 def check_auth(request):
-    """Check if user is authenticated"""
-    profile = get_or_create_user_profile(request.user) if request.user.is_authenticated else None
-    return Response({
-        'authenticated': request.user.is_authenticated,
-        'username': request.user.username if request.user.is_authenticated else None,
-        'is_artisan': profile.is_artisan if profile else False,
-        'is_admin': _is_admin(request.user),
-    })
+    """Check if user is authenticated; the session, user and roles come from the cache."""
+    return Response(_auth_data(request.user, accounts.user_roles(request.user)))
 
 
 @csrf_exempt
@@ -437,7 +978,9 @@ def delete_product(request, product_id):
                 'success': False,
                 'error': "You can't delete this item"
             }, status=status.HTTP_403_FORBIDDEN)
+        deleted = {product.id: (product.is_approved, product.user_id)}
         product.delete()
+        events.products_deleted(deleted)
         return Response({
             'success': True,
             'message': 'Product deleted successfully'
@@ -448,3 +991,123 @@ def delete_product(request, product_id):
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
+
+def _export(request, filename, rows_for, columns):
+    """Stream ``rows_for(None)`` to an admin or ``rows_for(user.id)`` to an artisan."""
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in exports.FORMATS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Unsupported format: {fmt}. Use one of {", ".join(exports.FORMATS)}.'
+        }, status=400)
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    if _is_admin(user):
+        queryset = rows_for(None)
+    elif accounts.user_roles(user).is_artisan:
+        queryset = rows_for(user.id)
+    else:
+        return JsonResponse({'success': False, 'error': 'Only admins and artisans can export'}, status=403)
+
+    # Rows are read while the response streams, after the routing middleware
+    # has returned, so exports always read the primary.
+    stream = exports.astream if settings.ASYNC_VIEWS else exports.stream
+    response = StreamingHttpResponse(stream(queryset, columns, fmt), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+@require_GET
+def export_products(request):
+    """Stream products as NDJSON, or as CSV with ``?format=csv``.
+
+    Admins export the whole catalog and artisans their own products.
+    """
+    return _export(request, 'products', exports.products, exports.PRODUCT_COLUMNS)
+
+
+@require_GET
+def export_orders(request):
+    """Stream ordered lines as NDJSON, or as CSV with ``?format=csv``.
+
+    Admins export every line and artisans the lines of their own products.
+    """
+    return _export(request, 'order-lines', exports.order_lines, exports.ORDER_LINE_COLUMNS)
+
+
+@require_GET
+def product_image(request, key):
+    """Serve a product thumbnail from the local image cache.
+
+    Keys are content hashes, so a thumbnail never changes and is cached by
+    browsers for a year. One evicted from the cache redirects to the
+    original image while it is rebuilt.
+    """
+    if not images.KEY_RE.fullmatch(key):
+        raise Http404('No such image')
+    etag = f'"{key}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        data = images.read(key)
+        if data is None:
+            product = Product.objects.filter(thumbnail=key).order_by('id').values_list('id', 'img').first()
+            if product is None:
+                raise Http404('No such image')
+            images.rebuild(product[0])
+            return redirect(product[1])
+        response = HttpResponse(data, content_type=images.CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+def static_asset(request, path):
+    """Serve a collected static file, precompressed when the client allows.
+
+    Hashed names are cached by browsers for a year. Under ``DEBUG`` files
+    not collected yet are served from the app and project static dirs.
+    """
+    asset = assets.find(path, request.headers.get('Accept-Encoding', ''))
+    if asset is None:
+        if settings.DEBUG:
+            return staticfiles_serve(request, path)
+        raise Http404('No such file')
+    mtime = asset.path.stat().st_mtime
+    if not was_modified_since(request.headers.get('If-Modified-Since'), mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(asset.path.read_bytes(), content_type=asset.content_type)
+    response['Last-Modified'] = http_date(mtime)
+    if asset.coding:
+        response['Content-Encoding'] = asset.coding
+    if path.endswith(assets.COMPRESSIBLE):
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = asset.cache_control
+    return response
+
+
+@require_GET
+def catalog_events(request):
+    """Catalog events are only streamed by the ASGI application.
+
+    A 204 tells ``EventSource`` clients not to reconnect, so pages served by
+    the WSGI application simply go without live updates.
+    """
+    return HttpResponse(status=204)
+
+
+def metrics_view(request):
+    """Per-endpoint request metrics and the background job queue in the Prometheus text format.
+
+    Request metrics are per process; the job gauges are read from the
+    database (one query). When ``METRICS_TOKEN`` is set, scrapers must send
+    it as a bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    body = metrics.render_prometheus() + metrics.render_jobs(jobs.queue_stats(), timezone.now())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,564 @@
+// =====================
+// CONFIG & UTILITIES
+// =====================
+
+// API base URL
+const API_BASE = '/api';
+const THEME_KEY = 'vam_theme';
+
+// CSRF helper
+function getCookie(name) {
+  let cookieValue = null;
+  if (document.cookie && document.cookie !== '') {
+    const cookies = document.cookie.split(';');
+    for (let cookie of cookies) {
+      cookie = cookie.trim();
+      if (cookie.startsWith(name + '=')) {
+        cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+        break;
+      }
+    }
+  }
+  return cookieValue;
+}
+const csrftoken = getCookie('csrftoken');
+
+// Session ID
+let sessionId = localStorage.getItem('session_id');
+if (!sessionId) {
+  sessionId = 'session_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
+  localStorage.setItem('session_id', sessionId);
+}
+// Lets the server embed this guest's cart in the page (BOOTSTRAP_EMBED).
+document.cookie = `session_id=${sessionId}; path=/; max-age=31536000; SameSite=Lax`;
+
+// Theme
+let currentTheme = localStorage.getItem(THEME_KEY) || 'light';
+
+// Auth & user state
+let isAuthenticated = false;
+let currentUser = null;
+let isArtisan = false;
+let isAdmin = false;
+
+// Products & cart
+let products = [];
+let filteredProducts = [];
+let nextProductsCursor = null;
+let cartItems = [];
+
+// =====================
+// THEME
+// =====================
+function applyTheme(theme){
+  const body = document.body;
+  const toggleBtn = document.getElementById('themeToggle');
+  if(theme === 'dark'){
+    body.classList.add('dark-mode');
+    toggleBtn.textContent = '🌜 Dark';
+  } else {
+    body.classList.remove('dark-mode');
+    toggleBtn.textContent = '🌞 Light';
+  }
+}
+
+function toggleTheme(){
+  currentTheme = currentTheme === 'dark' ? 'light' : 'dark';
+  localStorage.setItem(THEME_KEY, currentTheme);
+  applyTheme(currentTheme);
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+  const toggleBtn = document.getElementById('themeToggle');
+  if(toggleBtn) toggleBtn.addEventListener('click', toggleTheme);
+  applyTheme(currentTheme);
+});
+
+// =====================
+// AUTH
+// =====================
+function applyAuth(d){
+  isAuthenticated = !!d.authenticated;
+  currentUser = d.username || null;
+  isArtisan = !!d.is_artisan;
+  isAdmin = !!d.is_admin;
+  renderAuthBar();
+  toggleAddProductSection();
+}
+
+async function fetchAuth(){
+  try {
+    const r = await fetch(`${API_BASE}/auth/check/`, { credentials: 'same-origin' });
+    applyAuth(await r.json());
+  } catch(e){
+    applyAuth({});
+  }
+}
+
+function renderAuthBar(){
+  const bar = document.getElementById('authBar');
+  if(!bar) return;
+  if(isAuthenticated){
+    const badges = [];
+    if(isAdmin) badges.push('<span class="badge bg-warning text-dark ms-2">Admin</span>');
+    else if(isArtisan) badges.push('<span class="badge bg-success ms-2">Artisan</span>');
+    bar.innerHTML = `<span class="me-2">Hi, ${currentUser}${badges.join('')}</span>
+                     <a class="btn btn-outline-light btn-sm" href="/logout/">Logout</a>`;
+  } else {
+    bar.innerHTML = `<a class="btn btn-outline-light btn-sm me-2" href="/login/">Login</a>
+                     <a class="btn btn-warning btn-sm" href="/register/">Register</a>`;
+  }
+}
+
+function toggleAddProductSection(){
+  const sec = document.getElementById('addProductSection');
+  const badge = document.getElementById('artisanBadge');
+  const note = document.getElementById('productApprovalNote');
+  const notice = document.getElementById('nonArtisanNotice');
+  const loginAlert = document.getElementById('loginAlert');
+
+  if(!sec) return;
+  if(!isAuthenticated){
+    sec.style.display = 'none';
+    if(notice) notice.style.display = 'block';
+    if(loginAlert) loginAlert.style.display = 'block';
+    return;
+  }
+
+  sec.style.display = isArtisan || isAdmin ? 'block' : 'none';
+  if(notice) notice.style.display = isArtisan || isAdmin ? 'none' : 'block';
+  if(badge) badge.style.display = isArtisan ? 'inline-block' : 'none';
+  if(note){
+    note.textContent = isAdmin
+      ? 'As an admin, your approved products go live immediately.'
+      : 'Products added by artisans require admin approval before they appear in the marketplace.';
+  }
+  if(loginAlert) loginAlert.style.display = 'none';
+}
+
+// =====================
+// PRODUCTS
+// =====================
+async function fetchProductsPage(cursor){
+  const params = new URLSearchParams({ sort: document.getElementById('sortSelect').value });
+  if(cursor) params.set('cursor', cursor);
+  const r = await fetch(`${API_BASE}/products/?${params}`, { credentials: 'same-origin' });
+  return applyProductsPage(await r.json());
+}
+
+function applyProductsPage(data){
+  nextProductsCursor = data.next || null;
+  document.getElementById('loadMoreBtn').style.display = nextProductsCursor ? 'inline-block' : 'none';
+  return data.results || [];
+}
+
+async function loadProductsFromBackend(){
+  try {
+    products = await fetchProductsPage(null);
+    searchProduct();
+  } catch(e){
+    console.error('Error loading products:', e);
+    document.getElementById('productList').innerHTML = '<div class="col-12 text-center text-danger">Error loading products. Refresh the page.</div>';
+  }
+}
+
+function loadProducts(list){
+  const productList = document.getElementById('productList');
+  productList.innerHTML = '';
+  list.forEach(p=>{
+    const canAdd = isAuthenticated && p.is_approved;
+    const loginTooltip = isAuthenticated ? '' : ' title="Login to add items"';
+    const pendingTooltip = !p.is_approved ? ' title="Pending admin approval"' : '';
+    const addDisabledAttr = canAdd ? '' : 'disabled';
+    const showPendingBadge = !p.is_approved ? '<span class="badge bg-warning text-dark ms-2">Pending approval</span>' : '';
+    const ownerLabel = p.owner ? `<small class="text-muted d-block">By ${p.owner}</small>` : '';
+    const approveButton = (!p.is_approved && isAdmin)
+      ? `<button class="btn btn-outline-success btn-sm" onclick="approveProduct(${p.id})">Approve</button>`
+      : '';
+    const deleteButton = p.owned || isAdmin
+      ? `<button class="btn btn-danger btn-sm" onclick="deleteProduct(${p.id})">Delete</button>`
+      : '';
+
+    productList.innerHTML += `
+      <div class="col-md-3">
+        <div class="card h-100">
+          <img src="${p.thumbnail || p.img}" alt="${p.name}" loading="lazy">
+          <div class="card-body">
+            <div class="d-flex justify-content-between align-items-start">
+              <div>
+                <h6 class="mb-0">${p.name} ${showPendingBadge}</h6>
+                ${ownerLabel}
+              </div>
+            </div>
+            <p class="fw-bold mt-2">₹${p.price}</p>
+            <div class="d-grid gap-2">
+              <button class="btn btn-primary btn-sm" ${addDisabledAttr}${loginTooltip || pendingTooltip} onclick="addToCart(${p.id})">
+                ${p.is_approved ? 'Add to Cart' : 'Awaiting Approval'}
+              </button>
+              ${approveButton}
+              ${deleteButton}
+            </div>
+          </div>
+        </div>
+      </div>`;
+  });
+}
+
+async function loadMoreProducts(){
+  if(!nextProductsCursor) return;
+  try {
+    products = products.concat(await fetchProductsPage(nextProductsCursor));
+    searchProduct();
+  } catch(e){
+    console.error('Error loading products:', e);
+  }
+}
+
+let searchTimer = null;
+
+function searchProduct(){
+  const keyword = document.getElementById('searchBox').value.trim();
+  clearTimeout(searchTimer);
+  if(!keyword){
+    filteredProducts = [...products];
+    document.getElementById('loadMoreBtn').style.display = nextProductsCursor ? 'inline-block' : 'none';
+    loadProducts(filteredProducts);
+    return;
+  }
+  searchTimer = setTimeout(async () => {
+    try {
+      const r = await fetch(`${API_BASE}/products/search/?q=${encodeURIComponent(keyword)}`, { credentials: 'same-origin' });
+      const data = await r.json();
+      filteredProducts = data.results || [];
+      document.getElementById('loadMoreBtn').style.display = 'none';
+      loadProducts(filteredProducts);
+    } catch(e){
+      console.error('Error searching products:', e);
+    }
+  }, 200);
+}
+
+async function addProduct(){
+  const name = document.getElementById('newName').value.trim();
+  const price = document.getElementById('newPrice').value;
+  const img = document.getElementById('newImg').value.trim();
+  if(!name || !price || !img){
+    alert('Please enter name, price and image URL');
+    return;
+  }
+
+  try {
+    const res = await fetch(`${API_BASE}/products/add/`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-CSRFToken': csrftoken
+      },
+      credentials: 'same-origin',
+      body: JSON.stringify({ name, price, img })
+    });
+    const data = await res.json();
+    if(data.success){
+      document.getElementById('newName').value='';
+      document.getElementById('newPrice').value='';
+      document.getElementById('newImg').value='';
+      alert(data.message || 'Product submitted for approval');
+      refreshUnlessLive();
+    } else {
+      alert(data.error || 'Failed to add product');
+    }
+  } catch(e){
+    alert('Failed to add product');
+  }
+}
+
+async function deleteProduct(productId){
+  if(!confirm('Are you sure you want to delete this product?')) return;
+  try {
+    const res = await fetch(`${API_BASE}/products/delete/${productId}/`, {
+      method: 'DELETE',
+      headers: { 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin'
+    });
+    const data = await res.json();
+    if(data.success) refreshUnlessLive();
+    else alert(data.error || "You can't delete this item");
+  } catch(e){
+    alert("You can't delete this item");
+  }
+}
+
+async function approveProduct(productId){
+  if(!isAdmin) return alert('Only admins can approve products.');
+  if(!confirm('Approve this artisan product?')) return;
+
+  try {
+    const res = await fetch(`${API_BASE}/products/approve/${productId}/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin'
+    });
+    const data = await res.json();
+    if(data.success){
+      alert('Product approved.');
+      refreshUnlessLive();
+    } else {
+      alert(data.error || 'Failed to approve product.');
+    }
+  } catch(e){
+    alert('Failed to approve product.');
+  }
+}
+
+// =====================
+// CART
+// =====================
+async function addToCart(productId){
+  if(!isAuthenticated) return alert('Please login to add items to your cart.');
+
+  const product = filteredProducts.find(p => p.id === productId) || products.find(p => p.id === productId);
+  if(product && !product.is_approved && !isAdmin){
+    return alert('This item is pending admin approval.');
+  }
+
+  try {
+    const res = await fetch(`${API_BASE}/cart/add/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin',
+      body: JSON.stringify({ product_id: productId, session_id: sessionId })
+    });
+    const data = await res.json();
+    if(data.success) loadCart();
+    else alert('Error adding to cart: ' + (data.error || 'Unknown error'));
+  } catch(e){
+    alert('Error adding to cart. Please try again.');
+  }
+}
+
+async function deleteItem(cartItemId){
+  try {
+    const res = await fetch(`${API_BASE}/cart/remove/${cartItemId}/?session_id=${sessionId}`, {
+      method: 'DELETE',
+      headers: { 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin'
+    });
+    const data = await res.json();
+    if(data.success) loadCart();
+    else alert('Error removing item: ' + (data.error || 'Unknown error'));
+  } catch(e){
+    alert('Error removing item. Please try again.');
+  }
+}
+
+async function loadCart(){
+  try {
+    const res = await fetch(`${API_BASE}/cart/?session_id=${sessionId}`, { credentials: 'same-origin' });
+    applyCart(await res.json());
+  } catch(e){
+    console.error(e);
+    renderCart(0);
+  }
+}
+
+function applyCart(data){
+  cartItems = data.items || [];
+  renderCart(data.total || 0);
+}
+
+function renderCart(total){
+  const cartItemsElement = document.getElementById("cartItems");
+  cartItemsElement.innerHTML = "";
+  if(cartItems.length === 0){
+    cartItemsElement.innerHTML = '<li class="list-group-item text-center text-muted">Your cart is empty</li>';
+  } else {
+    cartItems.forEach(item=>{
+      cartItemsElement.innerHTML += `
+        <li class="list-group-item d-flex justify-content-between align-items-center">
+          ${item.name}${item.quantity > 1 ? ` × ${item.quantity}` : ''}
+          <div>
+            <span class="me-2">₹${item.line_total ?? item.price}</span>
+            <button class="btn btn-danger btn-sm" onclick="deleteItem(${item.id})">❌</button>
+          </div>
+        </li>`;
+    });
+  }
+  document.getElementById("total").innerText = total;
+}
+
+async function placeOrder(){
+  if(cartItems.length === 0) return alert("Your cart is empty!");
+  try {
+    const res = await fetch(`${API_BASE}/order/place/`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin',
+      body: JSON.stringify({ session_id: sessionId })
+    });
+    const data = await res.json();
+    if(data.success){
+      alert(`Order placed successfully!\nOrder ID: #${data.order_id}\nTotal: ₹${data.total}`);
+      cartItems = [];
+      loadCart();
+      loadOrders();
+    } else {
+      alert('Error placing order: ' + (data.error || 'Unknown error'));
+    }
+  } catch(e){
+    alert('Error placing order. Please try again.');
+  }
+}
+
+// =====================
+// ORDERS
+// =====================
+async function loadOrders(){
+  try {
+    const res = await fetch(`${API_BASE}/orders/?session_id=${sessionId}`, { credentials: 'same-origin' });
+    const orders = await res.json();
+    const list = document.getElementById('ordersList');
+    list.innerHTML = '';
+    if(!orders.length){
+      list.innerHTML = '<li class="list-group-item text-center text-muted">No orders yet</li>';
+      return;
+    }
+    orders.forEach(o => {
+      const items = o.items.map(i => `${i.name}${i.quantity > 1 ? ` × ${i.quantity}` : ''} (₹${i.price})`).join(', ');
+      const li = document.createElement('li');
+      li.className = 'list-group-item d-flex justify-content-between align-items-center';
+      li.innerHTML = `<div><strong>#${o.id}</strong> · ₹${o.total} · ${new Date(o.created_at).toLocaleString()}<br><small>${items}</small></div>` +
+                     (isAuthenticated ? `<button class="btn btn-outline-danger btn-sm" onclick="deleteOrder(${o.id})">Delete</button>` : '');
+      list.appendChild(li);
+    });
+  } catch(e){
+    const list = document.getElementById('ordersList');
+    if(list) list.innerHTML = '<li class="list-group-item text-center text-muted">Failed to load orders</li>';
+  }
+}
+
+async function deleteOrder(orderId){
+  if(!confirm('Delete this order?')) return;
+  try {
+    const res = await fetch(`${API_BASE}/orders/delete/${orderId}/`, {
+      method: 'DELETE',
+      headers: { 'X-CSRFToken': csrftoken },
+      credentials: 'same-origin'
+    });
+    const data = await res.json();
+    if(data.success) loadOrders();
+    else alert(data.error || 'Failed to delete order');
+  } catch(e){
+    alert('Failed to delete order');
+  }
+}
+
+// =====================
+// LIVE UPDATES
+// =====================
+// Catalog changes arrive as Server-Sent Events from the ASGI app (the WSGI
+// app answers 204 and the browser stops listening). Events that arrive
+// before the first page is loaded are applied after it.
+let liveSource = null;
+let liveReady = false;
+let liveBacklog = [];
+
+// After a change of our own: the event stream brings it, if it is open.
+function refreshUnlessLive(){
+  if(!liveSource || liveSource.readyState !== EventSource.OPEN) loadProductsFromBackend();
+}
+
+function compareProducts(a, b){
+  const sort = document.getElementById('sortSelect').value;
+  const desc = sort.startsWith('-');
+  const field = desc ? sort.slice(1) : sort;
+  const order = a[field] < b[field] ? -1 : a[field] > b[field] ? 1 : a.id - b.id;
+  return desc ? -order : order;
+}
+
+function renderLiveChange(){
+  // A search shows server results; they are refreshed by the next search.
+  if(!document.getElementById('searchBox').value.trim()) searchProduct();
+}
+
+function upsertProduct(p){
+  p.owned = !!currentUser && p.owner === currentUser;
+  products = products.filter(x => x.id !== p.id);
+  // Past the last loaded product it belongs to a page not loaded yet.
+  const last = products[products.length - 1];
+  if(!nextProductsCursor || !last || compareProducts(p, last) < 0){
+    products.push(p);
+    products.sort(compareProducts);
+  }
+  renderLiveChange();
+}
+
+function removeProduct(id){
+  products = products.filter(p => p.id !== id);
+  renderLiveChange();
+}
+
+function applyLiveEvent(type, data){
+  if(type === 'reset') loadProductsFromBackend();
+  else if(type === 'product.deleted') removeProduct(data.id);
+  else upsertProduct(data);
+}
+
+function listenForCatalogChanges(){
+  if(!window.EventSource) return;
+  liveSource = new EventSource(`${API_BASE}/events/`);
+  ['product.added', 'product.approved', 'product.deleted', 'reset'].forEach(type => {
+    liveSource.addEventListener(type, e => {
+      const data = JSON.parse(e.data);
+      if(liveReady) applyLiveEvent(type, data);
+      else liveBacklog.push([type, data]);
+    });
+  });
+}
+
+function startLiveUpdates(){
+  liveReady = true;
+  liveBacklog.forEach(([type, data]) => applyLiveEvent(type, data));
+  liveBacklog = [];
+}
+
+// =====================
+// INIT
+// =====================
+// Auth, the first catalog page and the cart, embedded in the page by the
+// server or fetched in one request.
+async function loadBootstrap(){
+  const sort = document.getElementById('sortSelect');
+  const embedded = document.getElementById('bootstrapState');
+  // The embedded page is in the default order; browsers may restore another.
+  if(embedded && sort.selectedIndex === 0) return JSON.parse(embedded.textContent);
+  const params = new URLSearchParams({ sort: sort.value, session_id: sessionId });
+  const r = await fetch(`${API_BASE}/bootstrap/?${params}`, { credentials: 'same-origin' });
+  if(!r.ok) throw new Error(`Bootstrap failed with ${r.status}`);
+  return r.json();
+}
+
+async function init(){
+  listenForCatalogChanges();
+  let state;
+  try {
+    state = await loadBootstrap();
+  } catch(e){
+    console.error('Error loading initial state:', e);
+    await fetchAuth();
+    await loadProductsFromBackend();
+    startLiveUpdates();
+    await loadCart();
+    await loadOrders();
+    return;
+  }
+  applyAuth(state.auth);
+  products = applyProductsPage(state.products);
+  searchProduct();
+  startLiveUpdates();
+  // A guest whose cookie did not reach the server got another session's cart.
+  if(state.auth.authenticated || state.session_id === sessionId) applyCart(state.cart);
+  else loadCart();
+  loadOrders();
+}
+
+init();
@@ -1,7 +1,12 @@
 """
 ASGI config for village_market project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``
+and turns on ASGI mode (``settings.ASYNC_VIEWS``), which serves the read
+endpoints with async views and streams catalog events at ``/api/events/``
+(``market.events``). Run it with an ASGI server, for example::
+
+    uvicorn village_market.asgi:application --host 0.0.0.0 --port 8000
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -12,6 +17,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'village_market.settings')
+os.environ.setdefault('MARKET_ASYNC_VIEWS', 'True')
+
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402
+from market.events import CancelOnDisconnect  # noqa: E402
 
-application = get_asgi_application()
+application = CancelOnDisconnect(django_application, [reverse('catalog_events')])
 
@@ -34,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'market.middleware.PerformanceMiddleware',
+    'market.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -67,11 +69,124 @@ WSGI_APPLICATION = 'village_market.wsgi.application'
 # Database (SQLite for simplicity)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'market.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# SQLite profile (market/sqlite.py). "production" applies SQLITE_PRAGMAS to
+# every new connection, keeps connections open between requests and starts
+# transactions with BEGIN IMMEDIATE, retried with backoff while another worker
+# holds the write lock. Production sets SQLITE_PROFILE=production; the default
+# keeps Django's stock behaviour, so development never switches the checked-in
+# db.sqlite3 to WAL.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'default')
+SQLITE_PRAGMAS = {}
+if SQLITE_PROFILE == 'production':
+    SQLITE_PRAGMAS = {
+        'busy_timeout': 5000,  # ms to wait for a lock before failing
+        'journal_mode': 'wal',  # readers and the writer no longer block each other
+        'synchronous': 'normal',  # fsync at checkpoints only; durable enough with WAL
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # KiB
+        'temp_store': 'memory',
+    }
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'begin_retries': 3, 'begin_backoff': 0.05},
+    })
+
+# Read replicas (market/routers.py). DATABASE_REPLICA_FILES is a comma-separated
+# list of SQLite files refreshed from the primary by `manage.py sync_replicas`;
+# catalog and history reads go to them. For 5 seconds after a write
+# (REPLICA_PIN_SECONDS) the writer reads from the primary, so keep the
+# replicas less than that far behind.
+DATABASE_REPLICAS = []
+for _n, _path in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_FILES', '').split(',')), start=1):
+    DATABASES[f'replica{_n}'] = dict(DATABASES['default'], NAME=_path.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{_n}')
+DATABASE_ROUTERS = ['market.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '5'))
+
+# ASGI mode (village_market/asgi.py sets MARKET_ASYNC_VIEWS=1). The catalog,
+# cart, order history and auth check endpoints are served by the async views
+# in market/async_views.py, so one process can hold thousands of idle and
+# keep-alive shoppers. Django opens fresh database connections for every
+# ASGI request, so persistent ones are never reused: close them when the
+# request finishes rather than whenever they are garbage collected.
+ASYNC_VIEWS = os.environ.get('MARKET_ASYNC_VIEWS', 'False') == 'True'
+if ASYNC_VIEWS:
+    for _database in DATABASES.values():
+        _database['CONN_MAX_AGE'] = 0
+
+# Read endpoints (url names) that encode their JSON with market.fastjson
+# instead of model instances and DRF's JSONRenderer. The bytes are the same
+# either way; set FAST_JSON_ENDPOINTS= (empty) to use the regular path.
+FAST_JSON_ENDPOINTS = {
+    name.strip() for name in os.environ.get('FAST_JSON_ENDPOINTS', 'get_products,get_cart,bootstrap').split(',')
+    if name.strip()
+}
+
+# Embed the /api/bootstrap/ state (auth, first catalog page, cart) in the
+# index page, so first paint needs no API round trip. The page is then built
+# per request and can no longer be revalidated with a 304.
+BOOTSTRAP_EMBED = os.environ.get('BOOTSTRAP_EMBED', 'False') == 'True'
+
+# Catalog events (market/events.py), streamed at /api/events/ by the ASGI
+# application. LocalBroadcaster reaches the streams of its own process; with
+# several workers use market.events.CacheBroadcaster and a shared cache
+# backend. Streams end after EVENTS_STREAM_SECONDS and browsers reconnect,
+# which spreads them across workers again.
+EVENT_BROADCASTER = os.environ.get('EVENT_BROADCASTER', 'market.events.LocalBroadcaster')
+EVENTS_STREAM_SECONDS = int(os.environ.get('EVENTS_STREAM_SECONDS', '300'))
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', '0.5'))
+
+# Cache (catalog pages are versioned, see market/catalog.py). Local memory is
+# per process; point DJANGO_CACHE_BACKEND at a shared backend when running
+# several workers so a catalog write invalidates every worker at once.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'village-market'),
+    }
+}
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '3600'))
+# Signed-in users and their roles (market.accounts).
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', '600'))
+
+# Product image thumbnails (market/images.py). IMAGE_FETCHER is the dotted
+# path of the fetch function (empty turns thumbnailing off); fetches are
+# background jobs.
+IMAGE_CACHE_DIR = Path(os.environ.get('IMAGE_CACHE_DIR', BASE_DIR / 'image_cache'))
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_MB', '512')) * 1024 * 1024
+IMAGE_FETCHER = os.environ.get('IMAGE_FETCHER', 'market.images.fetch_url') or None
+# Allow fetching from loopback and private networks (a local test server).
+IMAGE_FETCH_ALLOW_PRIVATE = os.environ.get('IMAGE_FETCH_ALLOW_PRIVATE', 'False') == 'True'
+
+# Background jobs (market/jobs.py), queued in the database and run by
+# `manage.py run_jobs` on JOBS_WORKERS threads, which poll for due jobs every
+# JOBS_POLL_INTERVAL seconds. JOBS_EAGER runs them in the web process once
+# the request commits instead, without retries (development).
+JOBS_EAGER = os.environ.get('JOBS_EAGER', 'False') == 'True'
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', '4'))
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', '1'))
+
+# Sessions are read from the cache. cached_db writes them through to the
+# database too, so they survive a cache restart and a per-process local
+# memory cache; with a shared cache backend, SESSION_ENGINE=
+# django.contrib.sessions.backends.cache drops the writes as well, and
+# ...signed_cookies keeps sessions in the cookie with no storage at all.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+# Logins go through the cached backend. ModelBackend stays listed because
+# sessions store the path of the backend that logged them in, and sessions
+# from before the cached one would otherwise be logged out.
+AUTHENTICATION_BACKENDS = [
+    'market.accounts.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -86,10 +201,16 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 
-# Static files (CSS, JS)
+# Static files (CSS, JS), see market/assets.py. collectstatic names them after
+# their content and writes .br/.gz variants; run it on every deploy. Without
+# DEBUG, the index page cannot render until it has run.
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'market.assets.ManifestStorage'},
+}
 
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -114,6 +235,10 @@ CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
 
+# Performance instrumentation (market.middleware.PerformanceMiddleware)
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '500'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Logging
 LOGGING = {
     'version': 1,
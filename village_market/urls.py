@@ -1,6 +1,7 @@
 """
 URL configuration for village_market project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from market import views as market_views
@@ -11,6 +12,7 @@ urlpatterns = [
     path('login/', market_views.login_view, name='login'),
     path('register/', market_views.register_view, name='register'),
     path('logout/', market_views.logout_view, name='logout'),
+    path(f'{settings.STATIC_URL.lstrip("/")}<path:path>', market_views.static_asset, name='static_asset'),
     path('', market_views.index, name='index'),
 ]
 